@@ -0,0 +1,38 @@
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+
+from app.services.event_log import EventQuery
+
+router = APIRouter(prefix="/api", tags=["events"])
+
+
+@router.get("/events")
+async def list_events(
+    request: Request,
+    role: Optional[str] = None,
+    action: Optional[str] = None,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    path: Optional[str] = None,
+    value: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+) -> dict:
+    query = EventQuery(
+        role=role,
+        action=action,
+        since=since,
+        until=until,
+        path=path,
+        value=value,
+        cursor=cursor,
+        limit=limit,
+        order=order,
+    )
+    try:
+        result = await request.app.state.event_log.query(query)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return {"ok": True, **result}
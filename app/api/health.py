@@ -1,4 +1,4 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
 
 router = APIRouter(prefix="/api", tags=["health"])
 
@@ -6,3 +6,34 @@ router = APIRouter(prefix="/api", tags=["health"])
 @router.get("/health")
 async def health() -> dict:
     return {"ok": True}
+
+
+@router.get("/metrics")
+async def metrics(request: Request) -> dict:
+    state = request.app.state
+    metrics = {
+        "ok": True,
+        "db": state.db.stats(),
+        "compaction": state.compaction.stats(),
+        "telemetry": state.telemetry.stats(),
+        "commands": state.commands.stats(),
+        "command_queues": {
+            "safety": state.safety_commands.stats(),
+            "student": state.student_commands.stats(),
+        },
+        "serial": {
+            "safety": state.serial_safety.stats(),
+            "student": state.serial_student.stats(),
+        },
+    }
+    scheduler = state.scenario_engine.stats()
+    metrics["scenarios"] = {key: scheduler[key] for key in ("pending", "timers", "fired", "wakeups", "jitter", "pid")}
+    replay = state.replay.stats()
+    replay_keys = ("state", "frames", "events", "chunks", "prefetched", "fps", "lag")
+    metrics["replay"] = {key: replay[key] for key in replay_keys}
+    metrics["builds"] = state.builds.stats()
+    if state.flashing.cache:
+        metrics["compile_cache"] = state.flashing.cache.stats()
+    if state.simulator:
+        metrics["simulator"] = state.simulator.stats()
+    return metrics
@@ -37,31 +37,43 @@ async def firmware_upload(
     with temp_path.open("wb") as handle:
         handle.write(await file.read())
 
-    try:
-        await request.app.state.serial_student.stop()
-        result = await request.app.state.flashing.flash_sketch(
-            temp_path,
-            board_fqbn=board_fqbn,
-            sketch_main=sketch_main,
-        )
-    except FileNotFoundError as exc:
-        raise HTTPException(status_code=400, detail=str(exc)) from exc
-    finally:
-        await request.app.state.serial_student.start()
-        if temp_path.exists():
-            temp_path.unlink()
+    job = request.app.state.builds.submit(temp_path, board_fqbn, sketch_main)
 
     await request.app.state.db.insert_event(
         "student",
         "firmware_upload",
-        {"board_fqbn": board_fqbn, "sketch_main": sketch_main},
+        {"board_fqbn": board_fqbn, "sketch_main": sketch_main, "job": job.id},
     )
 
     return {
-        "ok": result.ok,
-        "message": result.message,
-        "compile": {"stdout": result.compile_stdout, "stderr": result.compile_stderr},
-        "upload": {"stdout": result.upload_stdout, "stderr": result.upload_stderr},
+        "ok": True,
+        "job": job.as_dict(),
         "upload_enabled": settings.upload_enabled,
         "student_port": settings.student_port,
     }
+
+
+@router.get("/firmware/jobs")
+async def firmware_jobs(request: Request) -> dict:
+    builds = request.app.state.builds
+    return {"ok": True, "jobs": [job.as_dict() for job in builds.jobs()], "stats": builds.stats()}
+
+
+@router.get("/firmware/jobs/{job_id}")
+async def firmware_job(job_id: int, request: Request) -> dict:
+    job = request.app.state.builds.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="unknown job")
+    return {"ok": True, "job": job.as_dict(output=True), "log": list(job.log)}
+
+
+@router.delete("/firmware/jobs/{job_id}")
+async def firmware_job_cancel(job_id: int, request: Request) -> dict:
+    job = request.app.state.builds.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="unknown job")
+    if job.finished:
+        return JSONResponse(status_code=409, content={"ok": False, "error": f"job already {job.status}"})
+    request.app.state.builds.cancel(job_id)
+    await request.app.state.db.insert_event("student", "firmware_cancel", {"job": job_id})
+    return {"ok": True, "job": job.as_dict()}
@@ -2,6 +2,8 @@ from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
 
+from app.services.command_tracker import CommandResult
+from app.services.pid_control import PidConfig
 from app.services.scenario_engine import RandomScenarioConfig
 
 router = APIRouter(prefix="/api/teacher", tags=["teacher"])
@@ -20,6 +22,16 @@ class RandomHeaterRequest(BaseModel):
     off_max_s: int = Field(ge=1, le=3600)
 
 
+class PidHeaterRequest(BaseModel):
+    field: str = Field(default="t1", pattern="^(t1|t2)$")
+    setpoint: float = Field(ge=0, le=85)
+    kp: float = Field(default=8.0, ge=0)
+    ki: float = Field(default=0.1, ge=0)
+    kd: float = Field(default=0.0, ge=0)
+    max_power: int = Field(default=100, ge=0, le=100)
+    source: str | None = None
+
+
 class DrainValveRequest(BaseModel):
     open: bool
 
@@ -28,17 +40,44 @@ class StudentModeRequest(BaseModel):
     mode: str = Field(pattern="^(baseline|student)$")
 
 
+class ScenarioStep(BaseModel):
+    at: float = Field(ge=0)
+    value: float | None = None
+    ramp_to: float | None = None
+    duration: float = Field(default=0, ge=0)
+    every: float = Field(default=1, gt=0)
+
+
+class ScenarioTimeline(BaseModel):
+    actuator: str = Field(pattern="^(heater|pump|fan|drain_valve)$")
+    steps: list[ScenarioStep] = Field(min_length=1, max_length=10000)
+
+
+class ScenarioRequest(BaseModel):
+    name: str = Field(default="scenario", max_length=100)
+    timelines: list[ScenarioTimeline] = Field(min_length=1, max_length=64)
+
+
 class ActuatorRequest(BaseModel):
     pump: int = Field(ge=0, le=255)
     fan: list[int] = Field(min_length=3, max_length=3)
 
 
+def _command_response(result: CommandResult, wait: bool, body: dict) -> dict | JSONResponse:
+    if not wait:
+        return body
+    body = {**body, "command": result.as_dict()}
+    if not result.ok:
+        return JSONResponse(status_code=504, content={**body, "ok": False, "error": f"command {result.status}"})
+    return body
+
+
 @router.post("/heater/manual")
-async def heater_manual(payload: ManualHeaterRequest, request: Request) -> dict:
+async def heater_manual(payload: ManualHeaterRequest, request: Request, wait: bool = False) -> dict:
     engine = request.app.state.scenario_engine
-    await engine.set_manual(payload.power)
+    result = await engine.set_manual(payload.power, wait)
     await request.app.state.db.insert_event("teacher", "heater_manual", payload.model_dump())
-    return {"ok": True}
+    return _command_response(result, wait, {"ok": True})
 
 
 @router.post("/heater/random")
@@ -61,6 +100,26 @@ async def heater_random(payload: RandomHeaterRequest, request: Request) -> dict:
     return {"ok": True}
 
 
+@router.post("/heater/pid")
+async def heater_pid(payload: PidHeaterRequest, request: Request) -> dict:
+    engine = request.app.state.scenario_engine
+    try:
+        config = PidConfig(
+            field=payload.field,
+            setpoint=payload.setpoint,
+            kp=payload.kp,
+            ki=payload.ki,
+            kd=payload.kd,
+            output_max=payload.max_power,
+            source=payload.source,
+        )
+        control = engine.start_pid(config)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    await request.app.state.db.insert_event("teacher", "heater_pid", payload.model_dump())
+    return {"ok": True, "pid": control.stats()}
+
+
 @router.post("/heater/stop")
 async def heater_stop(request: Request) -> dict:
     engine = request.app.state.scenario_engine
@@ -69,21 +128,52 @@ async def heater_stop(request: Request) -> dict:
     return {"ok": True}
 
 
+@router.get("/scenario")
+async def scenario_status(request: Request) -> dict:
+    return {"ok": True, **request.app.state.scenario_engine.stats()}
+
+
+@router.post("/scenario")
+async def scenario_start(payload: ScenarioRequest, request: Request) -> dict:
+    actuators = {timeline.actuator for timeline in payload.timelines}
+    if actuators & {"pump", "fan"} and request.app.state.student_mode != "baseline":
+        return JSONResponse(
+            status_code=409,
+            content={
+                "ok": False,
+                "error": "Student firmware mode enabled; pump/fan timelines disabled.",
+            },
+        )
+    engine = request.app.state.scenario_engine
+    try:
+        run = engine.start_scenario(payload.name, [timeline.model_dump() for timeline in payload.timelines])
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    await request.app.state.db.insert_event("teacher", "scenario_start", {"run": run.id, **payload.model_dump()})
+    return {"ok": True, "run": run.as_dict()}
+
+
+@router.delete("/scenario/{run_id}")
+async def scenario_cancel(run_id: int, request: Request) -> dict:
+    cancelled = request.app.state.scenario_engine.cancel(run_id)
+    if not cancelled:
+        raise HTTPException(status_code=404, detail="scenario run not found")
+    await request.app.state.db.insert_event("teacher", "scenario_cancel", {"run": run_id})
+    return {"ok": True, "run": cancelled[0].as_dict()}
+
+
 @router.post("/drain_valve")
-async def drain_valve(payload: DrainValveRequest, request: Request) -> dict:
+async def drain_valve(payload: DrainValveRequest, request: Request, wait: bool = False) -> dict:
     simulator = request.app.state.simulator
     if simulator:
         simulator.set_drain_valve(payload.open)
-    seq = request.app.state.safety_seq
-    request.app.state.safety_seq += 1
-    cmd = request.app.state.serial_safety.build_cmd(seq, {"drain_valve": 1 if payload.open else 0})
-    await request.app.state.serial_safety.send_command(cmd)
+    result = await request.app.state.safety_commands.submit({"drain_valve": 1 if payload.open else 0}, wait)
     await request.app.state.db.insert_event("teacher", "drain_valve", payload.model_dump())
-    return {"ok": True, "open": payload.open}
+    return _command_response(result, wait, {"ok": True, "open": payload.open})
 
 
 @router.post("/actuators")
-async def set_actuators(payload: ActuatorRequest, request: Request) -> dict:
+async def set_actuators(payload: ActuatorRequest, request: Request, wait: bool = False) -> dict:
     if request.app.state.student_mode != "baseline":
         return JSONResponse(
             status_code=409,
@@ -97,12 +187,9 @@ async def set_actuators(payload: ActuatorRequest, request: Request) -> dict:
     simulator = request.app.state.simulator
     if simulator:
         simulator.set_actuators(payload.pump, payload.fan)
-    seq = request.app.state.student_seq
-    request.app.state.student_seq += 1
-    cmd = request.app.state.serial_student.build_cmd(seq, {"pump": payload.pump, "fan": payload.fan})
-    await request.app.state.serial_student.send_command(cmd)
+    result = await request.app.state.student_commands.submit({"pump": payload.pump, "fan": payload.fan}, wait)
     await request.app.state.db.insert_event("teacher", "actuators_set", payload.model_dump())
-    return {"ok": True}
+    return _command_response(result, wait, {"ok": True})
 
 
 @router.get("/student_mode")
@@ -116,6 +203,8 @@ async def set_student_mode(payload: StudentModeRequest, request: Request) -> dic
     request.app.state.student_mode = mode
     warning = None
     result = None
+    if mode == "baseline":
+        request.app.state.builds.cancel()
     if mode == "baseline" and request.app.state.config.upload_enabled:
         result = await request.app.state.flashing.flash_baseline()
         if not result.ok:
@@ -130,6 +219,7 @@ async def set_student_mode(payload: StudentModeRequest, request: Request) -> dic
         response["baseline_flash"] = {
             "ok": result.ok,
             "message": result.message,
+            "cached": result.cached,
             "compile": {"stdout": result.compile_stdout, "stderr": result.compile_stderr},
             "upload": {"stdout": result.upload_stdout, "stderr": result.upload_stderr},
         }
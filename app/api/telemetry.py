@@ -0,0 +1,170 @@
+import time
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.services.replay import ReplayQuery
+from app.services.telemetry_export import FORMATS, ExportQuery
+from app.services.telemetry_history import HistoryQuery
+
+router = APIRouter(prefix="/api/telemetry", tags=["telemetry"])
+
+DEFAULT_RANGE_MS = 3600 * 1000
+MAX_LONG_POLL_S = 60
+MAX_REPLAY_SPEED = 1000
+
+
+@router.get("/history")
+async def telemetry_history(
+    request: Request,
+    start: Optional[int] = Query(None, alias="from"),
+    end: Optional[int] = Query(None, alias="to"),
+    fields: Optional[str] = None,
+    max_points: int = Query(1500, ge=1, le=20000),
+    source_device: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|csv)$"),
+) -> StreamingResponse:
+    end_ms = end if end is not None else int(time.time() * 1000)
+    start_ms = start if start is not None else end_ms - DEFAULT_RANGE_MS
+    if start_ms >= end_ms:
+        raise HTTPException(status_code=400, detail="from must be < to")
+    history = request.app.state.history
+    requested = [field.strip() for field in (fields or "").split(",") if field.strip()]
+    try:
+        field_list = history.validate_fields(requested)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    query = HistoryQuery(
+        start_ms=start_ms,
+        end_ms=end_ms,
+        fields=field_list,
+        max_points=max_points,
+        source_device=source_device,
+    )
+    if format == "csv":
+        return StreamingResponse(history.stream_csv(query), media_type="text/csv")
+    return StreamingResponse(history.stream_json(query), media_type="application/json")
+
+
+@router.get("/recent")
+async def telemetry_recent(
+    request: Request,
+    seconds: float = Query(60, gt=0),
+    fields: Optional[str] = None,
+    source_device: Optional[str] = None,
+    max_points: int = Query(2000, ge=1, le=100000),
+) -> dict:
+    ring = request.app.state.telemetry.ring
+    requested = [field.strip() for field in (fields or "").split(",") if field.strip()]
+    try:
+        field_list = request.app.state.history.validate_fields(requested)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    snapshot = ring.snapshot(
+        seconds=seconds,
+        fields=field_list,
+        source=source_device,
+        max_points=max_points,
+    )
+    return {"ok": True, **snapshot}
+
+
+@router.get("/latest")
+async def telemetry_latest(
+    request: Request,
+    fields: Optional[str] = None,
+    source_device: Optional[str] = None,
+    wait: float = Query(0, ge=0, le=MAX_LONG_POLL_S),
+) -> Response:
+    state = request.app.state.telemetry.state
+    requested = [field.strip() for field in (fields or "").split(",") if field.strip()]
+    try:
+        field_list = request.app.state.history.validate_fields(requested)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    known = request.headers.get("if-none-match")
+    if known and wait > 0:
+        await state.wait(known, wait)
+    etag = state.etag
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if known == etag:
+        return Response(status_code=304, headers=headers)
+    snapshot = state.snapshot(fields=field_list, source=source_device)
+    return JSONResponse({"ok": True, **snapshot}, headers=headers)
+
+
+@router.get("/export")
+async def telemetry_export(
+    request: Request,
+    start: Optional[int] = Query(None, alias="from"),
+    end: Optional[int] = Query(None, alias="to"),
+    fields: Optional[str] = None,
+    source_device: Optional[str] = None,
+    format: str = "npz",
+) -> StreamingResponse:
+    end_ms = end if end is not None else int(time.time() * 1000)
+    start_ms = start if start is not None else end_ms - DEFAULT_RANGE_MS
+    if start_ms >= end_ms:
+        raise HTTPException(status_code=400, detail="from must be < to")
+    exporter = request.app.state.exporter
+    requested = [field.strip() for field in (fields or "").split(",") if field.strip()]
+    try:
+        field_list = request.app.state.history.validate_fields(requested)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    query = ExportQuery(
+        start_ms=start_ms,
+        end_ms=end_ms,
+        fields=field_list,
+        source_device=source_device,
+    )
+    try:
+        body = exporter.stream(query, format)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    media_type, extension = FORMATS[format]
+    filename = f"telemetry_{start_ms}_{end_ms}.{extension}"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/replay")
+async def telemetry_replay_start(
+    request: Request,
+    start: int = Query(alias="from"),
+    end: int = Query(alias="to"),
+    source_device: Optional[str] = None,
+    speed: float = Query(1.0, ge=0, le=MAX_REPLAY_SPEED),
+    events: bool = True,
+    rebase: bool = True,
+) -> dict:
+    try:
+        query = ReplayQuery(
+            start_ms=start,
+            end_ms=end,
+            source_device=source_device,
+            speed=speed,
+            events=events,
+            rebase=rebase,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    replay = request.app.state.replay
+    await replay.start(query)
+    return {"ok": True, **replay.stats()}
+
+
+@router.get("/replay")
+async def telemetry_replay_status(request: Request) -> dict:
+    return {"ok": True, **request.app.state.replay.stats()}
+
+
+@router.delete("/replay")
+async def telemetry_replay_stop(request: Request) -> dict:
+    replay = request.app.state.replay
+    await replay.stop()
+    return {"ok": True, **replay.stats()}
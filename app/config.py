@@ -20,11 +20,43 @@ class Settings:
     student_port: str = os.getenv("STUDENT_PORT", "/dev/ttyACM1")
     baudrate: int = int(os.getenv("BAUDRATE", "115200"))
     sim_mode: bool = _env_bool("SIM_MODE", True)
+    sim_stands: int = int(os.getenv("SIM_STANDS", "1"))
+    sim_rate_hz: float = float(os.getenv("SIM_RATE_HZ", "5"))
+    sim_physics_hz: float = float(os.getenv("SIM_PHYSICS_HZ", "50"))
+    sim_time_warp: float = float(os.getenv("SIM_TIME_WARP", "1"))
+    sim_seed: int | None = int(os.environ["SIM_SEED"]) if os.getenv("SIM_SEED") else None
     arduino_cli_path: str = os.getenv("ARDUINO_CLI_PATH", "arduino-cli")
     upload_enabled: bool = _env_bool("UPLOAD_ENABLED", True)
     data_dir: str = os.getenv("DATA_DIR", "/data")
     baseline_fqbn: str = os.getenv("BASELINE_FQBN", "arduino:avr:uno")
     baseline_sketch_main: str | None = os.getenv("BASELINE_SKETCH_MAIN")
+    compile_cache_max_mb: int = int(os.getenv("COMPILE_CACHE_MAX_MB", "256"))
+    build_workers: int = int(os.getenv("BUILD_WORKERS", "2"))
+    db_batch_size: int = int(os.getenv("DB_BATCH_SIZE", "500"))
+    db_flush_interval_ms: int = int(os.getenv("DB_FLUSH_INTERVAL_MS", "250"))
+    db_queue_size: int = int(os.getenv("DB_QUEUE_SIZE", "10000"))
+    db_readers: int = int(os.getenv("DB_READERS", "3"))
+    ws_queue_size: int = int(os.getenv("WS_QUEUE_SIZE", "64"))
+    ws_slow_client_policy: str = os.getenv("WS_SLOW_CLIENT_POLICY", "drop_oldest")
+    ws_keyframe_interval: int = int(os.getenv("WS_KEYFRAME_INTERVAL", "50"))
+    ring_buffer_seconds: int = int(os.getenv("RING_BUFFER_SECONDS", "600"))
+    ring_buffer_rate_hz: float = float(os.getenv("RING_BUFFER_RATE_HZ", "50"))
+    ring_buffer_max_points: int = int(os.getenv("RING_BUFFER_MAX_POINTS", "2000"))
+    ingest_broadcast_queue: int = int(os.getenv("INGEST_BROADCAST_QUEUE", "1024"))
+    ingest_broadcast_overflow: str = os.getenv("INGEST_BROADCAST_OVERFLOW", "drop_oldest")
+    ingest_persist_queue: int = int(os.getenv("INGEST_PERSIST_QUEUE", "8192"))
+    ingest_persist_overflow: str = os.getenv("INGEST_PERSIST_OVERFLOW", "drop_newest")
+    replay_chunk_rows: int = int(os.getenv("REPLAY_CHUNK_ROWS", "2000"))
+    replay_prefetch_chunks: int = int(os.getenv("REPLAY_PREFETCH_CHUNKS", "4"))
+    raw_retention_s: int = int(os.getenv("RAW_RETENTION_S", str(24 * 3600)))
+    agg_1s_retention_s: int = int(os.getenv("AGG_1S_RETENTION_S", str(30 * 24 * 3600)))
+    compaction_interval_s: float = float(os.getenv("COMPACTION_INTERVAL_S", "60"))
+    compaction_batch_rows: int = int(os.getenv("COMPACTION_BATCH_ROWS", "2000"))
+    serial_reconnect_min_ms: int = int(os.getenv("SERIAL_RECONNECT_MIN_MS", "100"))
+    serial_reconnect_max_ms: int = int(os.getenv("SERIAL_RECONNECT_MAX_MS", "1000"))
+    command_ack_timeout_ms: int = int(os.getenv("COMMAND_ACK_TIMEOUT_MS", "500"))
+    command_retries: int = int(os.getenv("COMMAND_RETRIES", "2"))
+    command_coalesce_ms: int = int(os.getenv("COMMAND_COALESCE_MS", "50"))
 
 
 settings = Settings()
@@ -8,19 +8,35 @@ from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
-from app.api import health, student, teacher
+from app.api import events, health, student, teacher, telemetry as telemetry_api
 from app.config import settings
+from app.services.build_jobs import BuildQueue
+from app.services.command_queue import CommandQueue, QueueConfig
+from app.services.command_tracker import AckConfig, CommandTracker
+from app.services.compaction import CompactionConfig, CompactionService
+from app.services.compile_cache import CompileCache
 from app.services.db import get_db
+from app.services.event_log import EventLog
 from app.services.flashing_service import FlashingService
+from app.services.ingest_pipeline import StageConfig
+from app.services.replay import ReplaySource
+from app.services.ring_buffer import TelemetryRingStore
 from app.services.scenario_engine import ScenarioEngine
 from app.services.serial_manager import SerialConfig, SerialManager
+from app.services.sim_clock import Clock, VirtualClock
+from app.services.telemetry_export import TelemetryExporter
+from app.services.telemetry_history import TelemetryHistory
 from app.services.telemetry_service import TelemetryService, TelemetrySimulator
+from app.services.ws_clients import ChannelConfig
+from app.services.ws_protocol import Subscription
 
 app = FastAPI(title="Lab Stand Controller")
 
 app.include_router(health.router)
 app.include_router(teacher.router)
 app.include_router(student.router)
+app.include_router(telemetry_api.router)
+app.include_router(events.router)
 
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
@@ -39,61 +55,225 @@ async def student_ui(request: Request) -> HTMLResponse:
 
 @app.websocket("/ws/telemetry")
 async def telemetry_ws(websocket: WebSocket) -> None:
-    await app.state.telemetry.register(websocket)
+    params = websocket.query_params
+    try:
+        subscription = Subscription.parse(
+            params.get("proto"),
+            params.get("fields"),
+            params.get("delta"),
+            params.get("rate"),
+            params.get("mode"),
+        )
+        backfill_s = float(params.get("backfill") or 0)
+    except ValueError as exc:
+        await websocket.accept()
+        await websocket.close(code=1008, reason=str(exc))
+        return
+    await app.state.telemetry.register(websocket, subscription, backfill_s)
     try:
         while True:
-            await websocket.receive_text()
-    except WebSocketDisconnect:
+            text = await websocket.receive_text()
+            try:
+                message = json.loads(text)
+            except json.JSONDecodeError:
+                continue
+            if not isinstance(message, dict) or message.get("type") != "subscribe":
+                continue
+            try:
+                subscription = Subscription.from_message(message)
+                backfill_s = float(message.get("backfill") or 0)
+            except (TypeError, ValueError) as exc:
+                app.state.telemetry.send_control(websocket, {"type": "error", "error": str(exc)})
+                continue
+            await app.state.telemetry.resubscribe(websocket, subscription, backfill_s)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
         await app.state.telemetry.unregister(websocket)
 
 
+@app.websocket("/ws/build/{job_id}")
+async def build_ws(websocket: WebSocket, job_id: int) -> None:
+    job = app.state.builds.get(job_id)
+    await websocket.accept()
+    if job is None:
+        await websocket.close(code=1008, reason="unknown job")
+        return
+    queue = job.subscribe()
+    try:
+        while True:
+            message = await queue.get()
+            if message is None:
+                break
+            await websocket.send_json(message)
+        await websocket.close()
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        job.unsubscribe(queue)
+
+
 async def _on_serial_message(payload: Dict[str, Any], source_device: str) -> None:
     if payload.get("type") == "telemetry":
         await app.state.telemetry.update(payload, source_device)
     elif payload.get("type") in {"fault", "ack"}:
+        if payload.get("type") == "ack":
+            app.state.commands.on_ack(payload, source_device)
         await app.state.db.insert_event("system", payload.get("type", "serial"), payload)
 
 
+async def _on_replay_event(event: Dict[str, Any]) -> None:
+    app.state.telemetry.broadcast_control({"type": "event", "replay": True, **event})
+
+
+async def _on_serial_state(device: str, transition: Dict[str, Any]) -> None:
+    await app.state.db.insert_event("system", "serial_state", {"device": device, **transition})
+
+
 @app.on_event("startup")
 async def startup() -> None:
     data_dir = Path(settings.data_dir)
     data_dir.mkdir(parents=True, exist_ok=True)
 
     db = get_db(str(data_dir / "db.sqlite"))
-    telemetry = TelemetryService(db)
+    telemetry = TelemetryService(
+        db,
+        ChannelConfig(
+            queue_size=settings.ws_queue_size,
+            slow_client_policy=settings.ws_slow_client_policy,
+            keyframe_interval=settings.ws_keyframe_interval,
+        ),
+        TelemetryRingStore(
+            seconds=settings.ring_buffer_seconds,
+            max_rate_hz=settings.ring_buffer_rate_hz,
+            max_points=settings.ring_buffer_max_points,
+        ),
+        broadcast_stage=StageConfig(
+            maxsize=settings.ingest_broadcast_queue,
+            overflow=settings.ingest_broadcast_overflow,
+        ),
+        persist_stage=StageConfig(
+            maxsize=settings.ingest_persist_queue,
+            overflow=settings.ingest_persist_overflow,
+        ),
+    )
 
     safety_serial = SerialManager(
-        SerialConfig(port=settings.safety_port, baudrate=settings.baudrate, name="safety"),
+        SerialConfig(
+            port=settings.safety_port,
+            baudrate=settings.baudrate,
+            name="safety",
+            reconnect_min_ms=settings.serial_reconnect_min_ms,
+            reconnect_max_ms=settings.serial_reconnect_max_ms,
+        ),
         _on_serial_message,
         sim_mode=settings.sim_mode,
+        on_state=_on_serial_state,
     )
     student_serial = SerialManager(
-        SerialConfig(port=settings.student_port, baudrate=settings.baudrate, name="student"),
+        SerialConfig(
+            port=settings.student_port,
+            baudrate=settings.baudrate,
+            name="student",
+            reconnect_min_ms=settings.serial_reconnect_min_ms,
+            reconnect_max_ms=settings.serial_reconnect_max_ms,
+        ),
         _on_serial_message,
         sim_mode=settings.sim_mode,
+        on_state=_on_serial_state,
     )
 
-    simulator = TelemetrySimulator(telemetry) if settings.sim_mode else None
+    clock = Clock()
+    if settings.sim_mode and (settings.sim_time_warp != 1 or settings.sim_seed is not None):
+        clock = VirtualClock(warp=settings.sim_time_warp)
+    simulator = (
+        TelemetrySimulator(
+            telemetry,
+            stands=settings.sim_stands,
+            rate_hz=settings.sim_rate_hz,
+            seed=settings.sim_seed,
+            clock=clock,
+            physics_hz=settings.sim_physics_hz,
+        )
+        if settings.sim_mode
+        else None
+    )
 
     app.state.db = db
     app.state.telemetry = telemetry
+    app.state.history = TelemetryHistory(db)
+    app.state.exporter = TelemetryExporter(db)
+    app.state.event_log = EventLog(db)
+    app.state.compaction = CompactionService(
+        db,
+        CompactionConfig(
+            raw_retention_s=settings.raw_retention_s,
+            agg_1s_retention_s=settings.agg_1s_retention_s,
+            interval_s=settings.compaction_interval_s,
+            batch_rows=settings.compaction_batch_rows,
+        ),
+    )
     app.state.serial_safety = safety_serial
     app.state.serial_student = student_serial
     app.state.simulator = simulator
-    app.state.scenario_engine = ScenarioEngine(safety_serial, simulator)
-    app.state.flashing = FlashingService()
-    app.state.student_seq = 1
-    app.state.safety_seq = 1
+    app.state.clock = clock
+    app.state.replay = ReplaySource(
+        db,
+        telemetry,
+        clock,
+        simulator,
+        chunk_rows=settings.replay_chunk_rows,
+        prefetch_chunks=settings.replay_prefetch_chunks,
+        on_event=_on_replay_event,
+    )
+    app.state.commands = CommandTracker(
+        AckConfig(timeout_ms=settings.command_ack_timeout_ms, retries=settings.command_retries)
+    )
+    queue_config = QueueConfig(coalesce_ms=settings.command_coalesce_ms)
+    app.state.safety_commands = CommandQueue(safety_serial, app.state.commands, queue_config)
+    app.state.student_commands = CommandQueue(student_serial, app.state.commands, queue_config)
+    app.state.scenario_engine = ScenarioEngine(
+        app.state.safety_commands,
+        simulator,
+        clock,
+        seed=settings.sim_seed,
+        student_commands=app.state.student_commands,
+        telemetry=telemetry,
+    )
+    compile_cache = None
+    if settings.compile_cache_max_mb > 0:
+        compile_cache = CompileCache(data_dir / "build_cache", settings.compile_cache_max_mb * 1024 * 1024)
+    app.state.flashing = FlashingService(compile_cache, student_serial)
+    app.state.builds = BuildQueue(app.state.flashing, workers=settings.build_workers)
     app.state.student_mode = "baseline"
     app.state.config = settings
 
+    await db.start()
+    await telemetry.start()
+    await app.state.compaction.start()
     await safety_serial.start()
     await student_serial.start()
+    await app.state.safety_commands.start()
+    await app.state.student_commands.start()
     if simulator:
         await simulator.start()
+    app.state.baseline_precompile = asyncio.create_task(app.state.flashing.precompile_baseline())
 
 
 @app.on_event("shutdown")
 async def shutdown() -> None:
+    app.state.baseline_precompile.cancel()
+    await app.state.builds.stop()
+    await app.state.scenario_engine.close()
+    await app.state.replay.stop()
+    if app.state.simulator:
+        await app.state.simulator.stop()
+    await app.state.clock.stop()
+    await app.state.safety_commands.stop()
+    await app.state.student_commands.stop()
+    await app.state.commands.stop()
     await app.state.serial_safety.stop()
     await app.state.serial_student.stop()
+    await app.state.telemetry.stop()
+    await app.state.compaction.stop()
+    await app.state.db.stop()
@@ -0,0 +1,211 @@
+import asyncio
+import itertools
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Set
+
+from app.services.flashing_service import FlashingService, FlashResult
+from app.services.ingest_pipeline import LatencyStats
+
+LOG_LINES = 2000
+WAITING = ("queued", "waiting_upload")
+FINISHED = ("done", "failed", "cancelled")
+DURATIONS = ("queued_ms", "compile_ms", "upload_wait_ms", "upload_ms")
+
+
+class BuildJob:
+    def __init__(self, job_id: int, board_fqbn: str, sketch_main: Optional[str]) -> None:
+        self.id = job_id
+        self.board_fqbn = board_fqbn
+        self.sketch_main = sketch_main
+        self.status = "queued"
+        self.position: int | None = None
+        self.message: str | None = None
+        self.result: FlashResult | None = None
+        self.created = time.time()
+        self.marks: Dict[str, float] = {"queued": time.monotonic()}
+        self.log: Deque[Dict[str, str]] = deque(maxlen=LOG_LINES)
+        self.lines = 0
+        self.task: asyncio.Task | None = None
+        self._seq = 0
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def output(self, stream: str, line: str) -> None:
+        entry = {"stream": stream, "line": line}
+        self.log.append(entry)
+        self.lines += 1
+        self.publish({"type": "log", **entry})
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        for entry in self.log:
+            queue.put_nowait({"type": "log", **entry})
+        queue.put_nowait({"type": "status", **self.as_dict()})
+        if self.finished:
+            queue.put_nowait(None)
+        else:
+            self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    def publish(self, message: Dict[str, Any] | None) -> None:
+        for queue in self._subscribers:
+            queue.put_nowait(message)
+
+    def close(self) -> None:
+        self.publish(None)
+        self._subscribers.clear()
+
+    def durations(self) -> Dict[str, float | None]:
+        marks = self.marks
+
+        def span(start: str, end: str) -> float | None:
+            if start not in marks:
+                return None
+            stop = marks.get(end) or marks.get("finished") or time.monotonic()
+            return round((stop - marks[start]) * 1000, 1)
+
+        return {
+            "queued_ms": span("queued", "compiling"),
+            "compile_ms": span("compiling", "waiting_upload"),
+            "upload_wait_ms": span("waiting_upload", "uploading"),
+            "upload_ms": span("uploading", "finished"),
+        }
+
+    def as_dict(self, output: bool = False) -> Dict[str, Any]:
+        result = self.result
+        data: Dict[str, Any] = {
+            "id": self.id,
+            "status": self.status,
+            "position": self.position,
+            "board_fqbn": self.board_fqbn,
+            "sketch_main": self.sketch_main,
+            "ok": result.ok if result else None,
+            "message": self.message,
+            "cached": result.cached if result else False,
+            "created": int(self.created * 1000),
+            "lines": self.lines,
+            **self.durations(),
+        }
+        if output and result:
+            data["compile"] = {"stdout": result.compile_stdout, "stderr": result.compile_stderr}
+            data["upload"] = {"stdout": result.upload_stdout, "stderr": result.upload_stderr}
+        return data
+
+
+class BuildQueue:
+    def __init__(self, flashing: FlashingService, workers: int = 2, history: int = 50) -> None:
+        self._flashing = flashing
+        self.workers = max(1, workers)
+        self._slots = asyncio.Semaphore(self.workers)
+        self._ids = itertools.count(1)
+        self._order = itertools.count()
+        self._jobs: Dict[int, BuildJob] = {}
+        self._finished: Deque[BuildJob] = deque(maxlen=history)
+        self.submitted = 0
+        self.outcomes = {status: 0 for status in FINISHED}
+        self._latency = {name: LatencyStats() for name in DURATIONS}
+
+    def submit(self, file_path: Path, board_fqbn: str, sketch_main: Optional[str]) -> BuildJob:
+        job = BuildJob(next(self._ids), board_fqbn, sketch_main)
+        self._jobs[job.id] = job
+        self.submitted += 1
+        self._transition(job, "queued")
+        job.task = asyncio.create_task(self._run(job, file_path))
+        return job
+
+    def get(self, job_id: int) -> BuildJob | None:
+        job = self._jobs.get(job_id)
+        if job is None:
+            job = next((job for job in self._finished if job.id == job_id), None)
+        return job
+
+    def jobs(self) -> List[BuildJob]:
+        return list(self._jobs.values()) + list(reversed(self._finished))
+
+    def cancel(self, job_id: int | None = None) -> List[BuildJob]:
+        cancelled = [job for job in self._jobs.values() if job_id is None or job.id == job_id]
+        for job in cancelled:
+            job.task.cancel()
+        return cancelled
+
+    async def stop(self) -> None:
+        tasks = [job.task for job in self.cancel()]
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, job: BuildJob, file_path: Path) -> None:
+        try:
+            try:
+                async with self._slots:
+                    self._transition(job, "compiling")
+                    sketch_dir = await asyncio.to_thread(self._flashing.prepare, file_path, job.sketch_main)
+                    file_path.unlink(missing_ok=True)
+                    build = await self._flashing.compile(sketch_dir, job.board_fqbn, job.output)
+                if build.ok:
+                    self._transition(job, "waiting_upload")
+                result = await self._flashing.upload(
+                    sketch_dir,
+                    job.board_fqbn,
+                    build,
+                    job.output,
+                    on_started=lambda: self._transition(job, "uploading"),
+                )
+            finally:
+                file_path.unlink(missing_ok=True)
+        except asyncio.CancelledError:
+            self._finish(job, "cancelled", "cancelled")
+        except Exception as exc:
+            self._finish(job, "failed", str(exc))
+        else:
+            job.result = result
+            self._finish(job, "done" if result.ok else "failed", result.message)
+
+    def _finish(self, job: BuildJob, status: str, message: str) -> None:
+        job.message = message
+        job.marks["finished"] = time.monotonic()
+        self._jobs.pop(job.id, None)
+        self._finished.append(job)
+        self.outcomes[status] += 1
+        for name, value in job.durations().items():
+            if value is not None:
+                self._latency[name].add(value)
+        self._transition(job, status)
+        job.close()
+
+    def _transition(self, job: BuildJob, status: str) -> None:
+        job.status = status
+        job._seq = next(self._order)
+        job.marks.setdefault(status, time.monotonic())
+        changed = {job}
+        for waiting in WAITING:
+            ordered = sorted(
+                (item for item in self._jobs.values() if item.status == waiting),
+                key=lambda item: item._seq,
+            )
+            for index, item in enumerate(ordered, start=1):
+                if item.position != index:
+                    item.position = index
+                    changed.add(item)
+        if job.status not in WAITING:
+            job.position = None
+        for item in changed:
+            item.publish({"type": "status", **item.as_dict()})
+
+    def stats(self) -> Dict[str, Any]:
+        counts = {status: 0 for status in ("queued", "compiling", "waiting_upload", "uploading")}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return {
+            "workers": self.workers,
+            **counts,
+            "submitted": self.submitted,
+            **self.outcomes,
+            **{name: stats.as_dict() for name, stats in self._latency.items()},
+        }
@@ -0,0 +1,177 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Mapping
+
+from app.services.command_tracker import CommandResult, CommandTracker
+from app.services.serial_manager import SerialManager
+
+CRITICAL_KEYS = frozenset({"drain_valve"})
+
+
+@dataclass
+class QueueConfig:
+    coalesce_ms: int = 50
+
+
+class _Batch:
+    def __init__(self, critical: bool) -> None:
+        self.critical = critical
+        self.immediate = critical
+        self.reliable = False
+        self.values: Dict[str, Any] = {}
+        self.commands = 0
+        self.on_sent: List[Callable[[], None]] = []
+        self.result: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class CommandQueue:
+    def __init__(
+        self,
+        manager: SerialManager,
+        tracker: CommandTracker,
+        config: QueueConfig | None = None,
+    ) -> None:
+        self._manager = manager
+        self._tracker = tracker
+        self._config = config or QueueConfig()
+        self._batches: Deque[_Batch] = deque()
+        self._ready: asyncio.Event | None = None
+        self._urgent: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._seq = 0
+        self._last_flush = 0.0
+        self.submitted = 0
+        self.frames = 0
+        self.critical = 0
+        self.overwritten = 0
+        self.coalesced = 0
+        self.replaced = 0
+
+    @property
+    def name(self) -> str:
+        return self._manager.name
+
+    def next_seq(self) -> int:
+        self._seq = self._seq % 65535 + 1
+        return self._seq
+
+    async def start(self) -> None:
+        if self._task:
+            return
+        self._ready = asyncio.Event()
+        self._urgent = asyncio.Event()
+        self._task = asyncio.create_task(self._writer())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        while self._batches:
+            batch = self._batches.popleft()
+            if not batch.result.done():
+                batch.result.set_result(CommandResult(self.name, 0, "cancelled"))
+
+    async def submit(
+        self,
+        values: Mapping[str, Any],
+        wait: bool = False,
+        urgent: bool = False,
+        on_sent: Callable[[], None] | None = None,
+        latest: bool = False,
+    ) -> CommandResult:
+        self.submitted += 1
+        critical = urgent or not CRITICAL_KEYS.isdisjoint(values)
+        tail = self._batches[-1] if self._batches else None
+        previous = next(
+            (batch for batch in reversed(self._batches) if not batch.values.keys().isdisjoint(values)),
+            None,
+        )
+        if latest and not critical and previous is not None and not previous.critical:
+            batch = previous
+            self.replaced += 1
+        elif critical or tail is None or tail.critical:
+            batch = _Batch(critical)
+            self._batches.append(batch)
+        else:
+            batch = tail
+        if batch.values:
+            self.overwritten += len(batch.values.keys() & values.keys())
+        batch.values.update(values)
+        batch.commands += 1
+        batch.reliable = batch.reliable or not latest
+        if on_sent:
+            batch.on_sent.append(on_sent)
+        if critical:
+            self.critical += 1
+        if latest or critical:
+            batch.immediate = True
+            if self._urgent:
+                self._urgent.set()
+        if self._ready:
+            self._ready.set()
+        else:
+            self._flush(self._batches.popleft())
+        if not wait:
+            return CommandResult(self.name, 0, "queued")
+        return await asyncio.shield(batch.result)
+
+    async def _writer(self) -> None:
+        while True:
+            if not self._batches:
+                self._ready.clear()
+                await self._ready.wait()
+            if not any(batch.immediate for batch in self._batches):
+                remaining = self._config.coalesce_ms / 1000 - (time.monotonic() - self._last_flush)
+                if remaining > 0:
+                    self._urgent.clear()
+                    try:
+                        await asyncio.wait_for(self._urgent.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass
+            self._flush(self._batches.popleft())
+
+    def _flush(self, batch: _Batch) -> None:
+        command = SerialManager.build_cmd(self.next_seq(), batch.values)
+        self._last_flush = time.monotonic()
+        self.frames += 1
+        self.coalesced += batch.commands - 1
+        result = self._tracker.dispatch(
+            self._manager,
+            command,
+            self._sent_callback(batch),
+            retries=None if batch.reliable else 0,
+        )
+
+        def resolve(done: asyncio.Future) -> None:
+            if not batch.result.done():
+                batch.result.set_result(done.result())
+
+        if result.done():
+            resolve(result)
+        else:
+            result.add_done_callback(resolve)
+
+    @staticmethod
+    def _sent_callback(batch: _Batch) -> Callable[[], None] | None:
+        if not batch.on_sent:
+            return None
+
+        def sent() -> None:
+            for callback in batch.on_sent:
+                callback()
+
+        return sent
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": len(self._batches),
+            "submitted": self.submitted,
+            "frames": self.frames,
+            "coalesced": self.coalesced,
+            "overwritten_keys": self.overwritten,
+            "critical": self.critical,
+            "replaced": self.replaced,
+            "coalesce_ms": self._config.coalesce_ms,
+        }
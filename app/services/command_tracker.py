@@ -0,0 +1,261 @@
+import asyncio
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Mapping, Tuple
+
+from app.services.serial_manager import SerialManager
+
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+@dataclass
+class AckConfig:
+    timeout_ms: int = 500
+    retries: int = 2
+
+
+@dataclass
+class CommandResult:
+    device: str
+    seq: int
+    status: str
+    attempts: int = 0
+    latency_ms: float | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status in {"acked", "sent", "queued", "simulated", "superseded"}
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "ok": self.ok}
+
+
+class LatencyHistogram:
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS_MS) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, value_ms: float) -> None:
+        index = 0
+        while index < len(self.bounds) and value_ms > self.bounds[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total_ms += value_ms
+        self.max_ms = max(self.max_ms, value_ms)
+
+    def percentile(self, q: float) -> float | None:
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return self.bounds[index] if index < len(self.bounds) else self.max_ms
+        return self.max_ms
+
+    def as_dict(self) -> Dict[str, Any]:
+        labels = [f"le_{bound}" for bound in self.bounds] + ["inf"]
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else None,
+            "max_ms": round(self.max_ms, 3),
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class _DeviceStats:
+    def __init__(self) -> None:
+        self.sent = 0
+        self.acked = 0
+        self.nacked = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.offline = 0
+        self.superseded = 0
+        self.unmatched_acks = 0
+        self.latency = LatencyHistogram()
+
+
+class _Pending:
+    def __init__(
+        self,
+        manager: SerialManager,
+        command: Mapping[str, Any],
+        on_sent: Callable[[], None] | None = None,
+        retries: int = 0,
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        self.manager = manager
+        self.command = command
+        self.on_sent = on_sent
+        self.retries = retries
+        self.ack: asyncio.Future = loop.create_future()
+        self.result: asyncio.Future = loop.create_future()
+        self.sent_at = 0.0
+        self.attempts = 0
+        self.superseded: set[str] = set()
+        self.task: asyncio.Task | None = None
+
+    def retry_values(self) -> Dict[str, Any]:
+        values = self.command.get("set") or {}
+        return {name: value for name, value in values.items() if name not in self.superseded}
+
+
+class CommandTracker:
+    def __init__(self, config: AckConfig | None = None) -> None:
+        self._config = config or AckConfig()
+        self._inflight: Dict[Tuple[str, int], _Pending] = {}
+        self._devices: Dict[str, _DeviceStats] = {}
+
+    def _device(self, name: str) -> _DeviceStats:
+        stats = self._devices.get(name)
+        if stats is None:
+            stats = _DeviceStats()
+            self._devices[name] = stats
+        return stats
+
+    def dispatch(
+        self,
+        manager: SerialManager,
+        command: Mapping[str, Any],
+        on_sent: Callable[[], None] | None = None,
+        retries: int | None = None,
+    ) -> asyncio.Future:
+        device = manager.name
+        seq = int(command["seq"])
+        if manager.simulated or not manager.connected:
+            if not manager.simulated:
+                self._device(device).offline += 1
+            elif on_sent:
+                on_sent()
+            done = asyncio.get_running_loop().create_future()
+            done.set_result(CommandResult(device, seq, "simulated" if manager.simulated else "offline"))
+            return done
+        key = (device, seq)
+        previous = self._inflight.pop(key, None)
+        if previous and previous.task:
+            previous.task.cancel()
+        self._supersede(device, command.get("set") or {})
+        pending = _Pending(manager, command, on_sent, self._config.retries if retries is None else retries)
+        self._inflight[key] = pending
+        pending.task = asyncio.create_task(self._track(key, pending))
+        return pending.result
+
+    def _supersede(self, device: str, values: Mapping[str, Any]) -> None:
+        for key, pending in list(self._inflight.items()):
+            if key[0] != device or pending.command.get("set", {}).keys().isdisjoint(values):
+                continue
+            pending.superseded.update(values)
+            if pending.attempts and not pending.retry_values():
+                del self._inflight[key]
+                self._finish_superseded(key, pending)
+                pending.task.cancel()
+
+    def _finish_superseded(self, key: Tuple[str, int], pending: _Pending) -> None:
+        self._device(key[0]).superseded += 1
+        if not pending.result.done():
+            pending.result.set_result(CommandResult(key[0], key[1], "superseded", attempts=pending.attempts))
+
+    async def send(
+        self,
+        manager: SerialManager,
+        command: Mapping[str, Any],
+        wait: bool = False,
+    ) -> CommandResult:
+        result = self.dispatch(manager, command)
+        if not wait and not result.done():
+            return CommandResult(manager.name, int(command["seq"]), "sent", attempts=1)
+        return await asyncio.shield(result)
+
+    async def _track(self, key: Tuple[str, int], pending: _Pending) -> None:
+        device, seq = key
+        stats = self._device(device)
+        timeout = self._config.timeout_ms / 1000
+        result = CommandResult(device, seq, "timeout")
+        try:
+            for attempt in range(pending.retries + 1):
+                command = pending.command
+                if attempt:
+                    if pending.superseded:
+                        values = pending.retry_values()
+                        if not values:
+                            self._finish_superseded(key, pending)
+                            break
+                        command = {**command, "set": values}
+                    stats.retries += 1
+                pending.attempts = attempt + 1
+                pending.sent_at = time.perf_counter()
+                await pending.manager.send_command(command)
+                stats.sent += 1
+                if pending.on_sent and not attempt:
+                    pending.on_sent()
+                try:
+                    latency_ms, ack = await asyncio.wait_for(asyncio.shield(pending.ack), timeout)
+                except asyncio.TimeoutError:
+                    continue
+                stats.latency.add(latency_ms)
+                acked = ack.get("ok", True) is not False
+                if acked:
+                    stats.acked += 1
+                else:
+                    stats.nacked += 1
+                result = CommandResult(
+                    device,
+                    seq,
+                    "acked" if acked else "nack",
+                    attempts=pending.attempts,
+                    latency_ms=round(latency_ms, 3),
+                )
+                break
+            else:
+                stats.timeouts += 1
+                result.attempts = pending.attempts
+        finally:
+            if self._inflight.get(key) is pending:
+                del self._inflight[key]
+            if not pending.result.done():
+                pending.result.set_result(result)
+
+    def on_ack(self, payload: Mapping[str, Any], device: str) -> bool:
+        seq = payload.get("seq")
+        pending = self._inflight.get((device, int(seq))) if isinstance(seq, int) else None
+        if pending is None:
+            self._device(device).unmatched_acks += 1
+            return False
+        if not pending.ack.done():
+            pending.ack.set_result(((time.perf_counter() - pending.sent_at) * 1000, payload))
+        return True
+
+    async def stop(self) -> None:
+        for pending in list(self._inflight.values()):
+            if pending.task:
+                pending.task.cancel()
+        self._inflight.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        inflight: Dict[str, int] = {}
+        for device, _ in self._inflight:
+            inflight[device] = inflight.get(device, 0) + 1
+        return {
+            name: {
+                "inflight": inflight.get(name, 0),
+                "sent": stats.sent,
+                "acked": stats.acked,
+                "nacked": stats.nacked,
+                "timeouts": stats.timeouts,
+                "retries": stats.retries,
+                "offline": stats.offline,
+                "superseded": stats.superseded,
+                "unmatched_acks": stats.unmatched_acks,
+                "latency": stats.latency.as_dict(),
+            }
+            for name, stats in self._devices.items()
+        }
@@ -0,0 +1,151 @@
+import asyncio
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Any, Dict
+
+from app.services.db import TELEMETRY_FIELDS, Database
+
+
+@dataclass
+class CompactionConfig:
+    raw_retention_s: int
+    agg_1s_retention_s: int
+    interval_s: float
+    batch_rows: int
+    lag_ms: int = 5000
+
+
+def _watermark(conn: sqlite3.Connection, tier: str) -> int | None:
+    row = conn.execute("SELECT watermark FROM compaction_state WHERE tier = ?", (tier,)).fetchone()
+    return row[0] if row else None
+
+
+def _set_watermark(conn: sqlite3.Connection, tier: str, value: int) -> None:
+    conn.execute(
+        "INSERT OR REPLACE INTO compaction_state (tier, watermark) VALUES (?, ?)",
+        (tier, value),
+    )
+
+
+def _aggregate_select(source: str, resolution: int) -> str:
+    columns = []
+    for field in TELEMETRY_FIELDS:
+        if source == "telemetry":
+            columns.append(f"MIN({field}), MAX({field}), AVG({field})")
+        else:
+            columns.append(
+                f"MIN({field}_min), MAX({field}_max), "
+                f"SUM({field}_avg * n) * 1.0 / SUM(CASE WHEN {field}_avg IS NOT NULL THEN n END)"
+            )
+    count = "COUNT(*)" if source == "telemetry" else "SUM(n)"
+    return (
+        f"SELECT (ts / {resolution}) * {resolution}, source_device, {count}, {', '.join(columns)} "
+        f"FROM {source} WHERE ts >= ? AND ts < ? GROUP BY 1, 2"
+    )
+
+
+def _aggregate_insert(target: str) -> str:
+    columns = ", ".join(
+        f"{field}_min, {field}_max, {field}_avg" for field in TELEMETRY_FIELDS
+    )
+    return f"INSERT OR REPLACE INTO {target} (ts, source_device, n, {columns}) "
+
+
+class CompactionService:
+    def __init__(self, db: Database, config: CompactionConfig) -> None:
+        self._db = db
+        self._config = config
+        self._task: asyncio.Task | None = None
+        self._runs = 0
+        self._rolled_chunks = 0
+        self._pruned: Dict[str, int] = {"telemetry": 0, "telemetry_1s": 0}
+        self._last_run_ms = 0.0
+        self._last_error: str | None = None
+
+    async def start(self) -> None:
+        if self._task:
+            return
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as exc:
+                self._last_error = str(exc)
+            await asyncio.sleep(self._config.interval_s)
+
+    async def run_once(self, now_ms: int | None = None) -> None:
+        started = time.perf_counter()
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        horizon = now_ms - self._config.lag_ms
+        await self._rollup("telemetry", "telemetry_1s", 1000, horizon)
+        marks = await self._db.run_write(
+            lambda conn: (_watermark(conn, "telemetry_1s"), _watermark(conn, "telemetry_1m"))
+        )
+        if marks[0] is not None:
+            await self._rollup("telemetry_1s", "telemetry_1m", 60000, min(horizon, marks[0]))
+            marks = await self._db.run_write(
+                lambda conn: (_watermark(conn, "telemetry_1s"), _watermark(conn, "telemetry_1m"))
+            )
+            raw_cutoff = min(now_ms - self._config.raw_retention_s * 1000, marks[0])
+            await self._prune("telemetry", raw_cutoff)
+        if marks[1] is not None:
+            agg_cutoff = min(now_ms - self._config.agg_1s_retention_s * 1000, marks[1])
+            await self._prune("telemetry_1s", agg_cutoff)
+        self._runs += 1
+        self._last_run_ms = (time.perf_counter() - started) * 1000
+
+    async def _rollup(self, source: str, target: str, resolution: int, horizon: int) -> None:
+        horizon = (horizon // resolution) * resolution
+        select_sql = _aggregate_insert(target) + _aggregate_select(source, resolution)
+        batch_rows = self._config.batch_rows
+
+        def step(conn: sqlite3.Connection) -> bool:
+            mark = _watermark(conn, target)
+            if mark is None:
+                row = conn.execute(f"SELECT MIN(ts) FROM {source}").fetchone()
+                if row[0] is None:
+                    return False
+                mark = (row[0] // resolution) * resolution
+            if mark >= horizon:
+                return False
+            row = conn.execute(
+                f"SELECT ts FROM {source} WHERE ts >= ? ORDER BY ts LIMIT 1 OFFSET ?",
+                (mark, batch_rows),
+            ).fetchone()
+            end = horizon
+            if row is not None:
+                end = min(horizon, max(mark + resolution, (row[0] // resolution) * resolution))
+            conn.execute(select_sql, (mark, end))
+            _set_watermark(conn, target, end)
+            return end < horizon
+
+        while await self._db.run_write(step):
+            self._rolled_chunks += 1
+            await asyncio.sleep(0)
+
+    async def _prune(self, table: str, cutoff: int) -> None:
+        limit = self._config.batch_rows
+        sql = f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} WHERE ts < ? LIMIT ?)"
+        while True:
+            deleted = await self._db.run_write(lambda conn: conn.execute(sql, (cutoff, limit)).rowcount)
+            self._pruned[table] += deleted
+            if deleted < limit:
+                return
+            await asyncio.sleep(0)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "runs": self._runs,
+            "rolled_chunks": self._rolled_chunks,
+            "pruned_rows": dict(self._pruned),
+            "last_run_ms": round(self._last_run_ms, 3),
+            "last_error": self._last_error,
+        }
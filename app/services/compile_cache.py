@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+
+def sketch_key(sketch_dir: Path, fqbn: str) -> str:
+    digest = hashlib.sha256()
+    digest.update(fqbn.encode() + b"\0" + sketch_dir.name.encode() + b"\0")
+    for path in sorted(p for p in sketch_dir.rglob("*") if p.is_file()):
+        data = path.read_bytes()
+        digest.update(path.relative_to(sketch_dir).as_posix().encode() + b"\0")
+        digest.update(str(len(data)).encode() + b"\0" + data)
+    return digest.hexdigest()
+
+
+def _dir_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+class CompileCache:
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._pinned: Counter[str] = Counter()
+        self._trash: list[Path] = []
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._load()
+
+    def _load(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        found: list[Tuple[float, str, int]] = []
+        for entry in self.root.iterdir():
+            if entry.name.startswith("."):
+                shutil.rmtree(entry, ignore_errors=True)
+                continue
+            if entry.is_dir() and (entry / "meta.json").exists():
+                found.append((entry.stat().st_mtime, entry.name, _dir_size(entry)))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self._entries.values())
+
+    def lookup(self, key: str) -> Path | None:
+        path = self.root / key
+        if key not in self._entries or not path.is_dir():
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        os.utime(path)
+        self.hits += 1
+        return path
+
+    def pin(self, key: str) -> None:
+        self._pinned[key] += 1
+
+    def unpin(self, key: str) -> None:
+        self._pinned[key] -= 1
+        if self._pinned[key] <= 0:
+            del self._pinned[key]
+            self._evict()
+
+    def staging_dir(self) -> Path:
+        path = self.root / f".build-{uuid.uuid4().hex}"
+        path.mkdir(parents=True)
+        return path
+
+    def place(self, key: str, build_dir: Path, meta: Dict[str, Any]) -> Tuple[Path, int, bool]:
+        target = self.root / key
+        (build_dir / "meta.json").write_text(json.dumps({**meta, "key": key, "created": int(time.time())}))
+        created = False
+        if not target.exists():
+            try:
+                os.replace(build_dir, target)
+                created = True
+            except OSError:
+                pass
+        if not created:
+            shutil.rmtree(build_dir, ignore_errors=True)
+        return target, _dir_size(target), created
+
+    def add(self, key: str, size: int, created: bool) -> None:
+        self.stores += created
+        self._entries[key] = size
+        self._entries.move_to_end(key)
+        self._evict(keep=key)
+
+    def store(self, key: str, build_dir: Path, meta: Dict[str, Any]) -> Path:
+        target, size, created = self.place(key, build_dir, meta)
+        self.add(key, size, created)
+        self.purge()
+        return target
+
+    def discard(self, build_dir: Path) -> None:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+    def purge(self) -> None:
+        while self._trash:
+            shutil.rmtree(self._trash.pop(), ignore_errors=True)
+
+    def _evict(self, keep: str | None = None) -> None:
+        total = self.total_bytes
+        for key in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep or key in self._pinned:
+                continue
+            total -= self._entries.pop(key)
+            trash = self.root / f".evicted-{uuid.uuid4().hex}"
+            try:
+                os.replace(self.root / key, trash)
+            except OSError:
+                continue
+            self._trash.append(trash)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "pinned": len(self._pinned),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+        }
@@ -1,10 +1,18 @@
+import concurrent.futures
 import json
 import os
+import queue
 import sqlite3
 import asyncio
+import threading
 import time
+from collections import deque
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
-from typing import Any, Dict
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Sequence, Tuple, TypeVar
+
+from app.config import settings
 
 
 @dataclass
@@ -26,15 +34,151 @@ class TelemetryRecord:
     source_device: str
 
 
+TELEMETRY_FIELDS = (
+    "t1",
+    "t2",
+    "t3",
+    "p1",
+    "p2",
+    "flow",
+    "heater",
+    "pump",
+    "fan1",
+    "fan2",
+    "fan3",
+    "fault",
+    "drain_valve",
+)
+
+AGGREGATE_TIERS = (("telemetry_1m", 60000), ("telemetry_1s", 1000))
+
+T = TypeVar("T")
+
+TELEMETRY_INSERT_SQL = """
+    INSERT INTO telemetry (
+        ts, t1, t2, t3, p1, p2, flow, heater, pump, fan1, fan2, fan3, fault, drain_valve, source_device
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+EVENT_INSERT_SQL = "INSERT INTO events (ts, role, action, payload_json) VALUES (?, ?, ?, ?)"
+
+_RATE_WINDOW_S = 10.0
+
+
+class ReaderPool:
+    def __init__(self, db_path: str, size: int) -> None:
+        self._uri = Path(db_path).resolve().as_uri() + "?mode=ro"
+        self._size = max(1, size)
+        self._executor: concurrent.futures.ThreadPoolExecutor | None = None
+        self._idle: List[sqlite3.Connection] = []
+        self._available: asyncio.Semaphore | None = None
+        self._waits = 0
+        self._timings: Dict[str, Dict[str, float]] = {}
+
+    def open(self) -> None:
+        if self._executor:
+            return
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self._size,
+            thread_name_prefix="db-reader",
+        )
+        for _ in range(self._size):
+            conn = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+            conn.execute("PRAGMA query_only=ON")
+            self._idle.append(conn)
+        self._available = asyncio.Semaphore(self._size)
+
+    def close(self) -> None:
+        if not self._executor:
+            return
+        self._executor.shutdown(wait=True)
+        self._executor = None
+        for conn in self._idle:
+            conn.close()
+        self._idle = []
+        self._available = None
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[sqlite3.Connection]:
+        if self._available is None:
+            self.open()
+        if self._available.locked():
+            self._waits += 1
+        async with self._available:
+            conn = self._idle.pop()
+            try:
+                yield conn
+            finally:
+                self._idle.append(conn)
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def record(self, label: str, db_ms: float, wall_ms: float, rows: int) -> None:
+        timing = self._timings.setdefault(
+            label,
+            {
+                "count": 0,
+                "rows": 0,
+                "db_ms_total": 0.0,
+                "db_ms_last": 0.0,
+                "db_ms_max": 0.0,
+                "wall_ms_max": 0.0,
+            },
+        )
+        timing["count"] += 1
+        timing["rows"] += rows
+        timing["db_ms_total"] += db_ms
+        timing["db_ms_last"] = db_ms
+        timing["db_ms_max"] = max(timing["db_ms_max"], db_ms)
+        timing["wall_ms_max"] = max(timing["wall_ms_max"], wall_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self._size,
+            "busy": self._size - len(self._idle) if self._executor else 0,
+            "lease_waits": self._waits,
+            "queries": {
+                label: {key: round(value, 3) for key, value in timing.items()}
+                for label, timing in self._timings.items()
+            },
+        }
+
+
 class Database:
-    def __init__(self, db_path: str) -> None:
+    def __init__(
+        self,
+        db_path: str,
+        batch_size: int = 500,
+        flush_interval_ms: int = 250,
+        queue_size: int = 10000,
+        readers: int = 3,
+    ) -> None:
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
         self._conn = sqlite3.connect(db_path, check_same_thread=False)
-        self._lock = asyncio.Lock()
+        self._batch_size = max(1, batch_size)
+        self._flush_interval = max(0, flush_interval_ms) / 1000.0
+        self._queue: "queue.Queue[Tuple[str, Any]]" = queue.Queue(maxsize=queue_size)
+        self._writer: threading.Thread | None = None
+        self._stats_lock = threading.Lock()
+        self._rows_written = 0
+        self._events_written = 0
+        self._batches = 0
+        self._last_batch = 0
+        self._max_batch = 0
+        self._last_commit_ms = 0.0
+        self._max_commit_ms = 0.0
+        self._queue_full_waits = 0
+        self._write_errors = 0
+        self._recent_batches: deque[Tuple[float, int]] = deque()
         self._init_schema()
+        self._readers = ReaderPool(db_path, readers)
 
     def _init_schema(self) -> None:
         cur = self._conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
         cur.execute(
             """
             CREATE TABLE IF NOT EXISTS telemetry (
@@ -67,6 +211,38 @@ class Database:
             """
         )
         self._ensure_columns(cur)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_telemetry_ts ON telemetry (ts)")
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_telemetry_source_ts ON telemetry (source_device, ts)"
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_events_ts ON events (ts)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_events_role_ts ON events (role, ts)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_events_action_ts ON events (action, ts)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_events_fault_ts ON events (ts) WHERE action = 'fault'")
+        aggregate_columns = ", ".join(
+            f"{field}_min REAL, {field}_max REAL, {field}_avg REAL" for field in TELEMETRY_FIELDS
+        )
+        for table, _ in AGGREGATE_TIERS:
+            cur.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    ts INTEGER,
+                    source_device TEXT,
+                    n INTEGER,
+                    {aggregate_columns},
+                    UNIQUE (source_device, ts)
+                )
+                """
+            )
+            cur.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_ts ON {table} (ts)")
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS compaction_state (
+                tier TEXT PRIMARY KEY,
+                watermark INTEGER
+            )
+            """
+        )
         self._conn.commit()
 
     def _ensure_columns(self, cur: sqlite3.Cursor) -> None:
@@ -77,49 +253,214 @@ class Database:
         if "drain_valve" not in columns:
             cur.execute("ALTER TABLE telemetry ADD COLUMN drain_valve INTEGER")
 
-    async def insert_telemetry(self, record: TelemetryRecord) -> None:
-        async with self._lock:
-            await asyncio.to_thread(self._insert_telemetry_sync, record)
+    async def start(self) -> None:
+        self._readers.open()
+        if self._writer and self._writer.is_alive():
+            return
+        self._writer = threading.Thread(target=self._writer_loop, name="db-writer", daemon=True)
+        self._writer.start()
 
-    def _insert_telemetry_sync(self, record: TelemetryRecord) -> None:
-        cur = self._conn.cursor()
-        cur.execute(
-            """
-            INSERT INTO telemetry (
-                ts, t1, t2, t3, p1, p2, flow, heater, pump, fan1, fan2, fan3, fault, drain_valve, source_device
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
+    async def stop(self) -> None:
+        if not self._writer:
+            return
+        await self._enqueue(("stop", None))
+        await asyncio.to_thread(self._writer.join)
+        self._writer = None
+        await asyncio.to_thread(self._readers.close)
+
+    async def flush(self) -> None:
+        done = threading.Event()
+        await self._enqueue(("flush", done))
+        if self._writer and self._writer.is_alive():
+            await asyncio.to_thread(done.wait)
+
+    async def insert_telemetry(self, record: TelemetryRecord) -> None:
+        await self._enqueue(
             (
-                record.ts,
-                record.t1,
-                record.t2,
-                record.t3,
-                record.p1,
-                record.p2,
-                record.flow,
-                record.heater,
-                record.pump,
-                record.fan1,
-                record.fan2,
-                record.fan3,
-                record.fault,
-                record.drain_valve,
-                record.source_device,
-            ),
+                "telemetry",
+                (
+                    record.ts,
+                    record.t1,
+                    record.t2,
+                    record.t3,
+                    record.p1,
+                    record.p2,
+                    record.flow,
+                    record.heater,
+                    record.pump,
+                    record.fan1,
+                    record.fan2,
+                    record.fan3,
+                    record.fault,
+                    record.drain_valve,
+                    record.source_device,
+                ),
+            )
         )
-        self._conn.commit()
 
     async def insert_event(self, role: str, action: str, payload: Dict[str, Any]) -> None:
-        async with self._lock:
-            await asyncio.to_thread(self._insert_event_sync, role, action, payload)
+        await self._enqueue(("event", (int(time.time() * 1000), role, action, json.dumps(payload))))
 
-    def _insert_event_sync(self, role: str, action: str, payload: Dict[str, Any]) -> None:
-        cur = self._conn.cursor()
-        cur.execute(
-            "INSERT INTO events (ts, role, action, payload_json) VALUES (?, ?, ?, ?)",
-            (int(time.time() * 1000), role, action, json.dumps(payload)),
-        )
-        self._conn.commit()
+    async def run_write(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        await self._enqueue(("call", (fn, future)))
+        return await asyncio.wrap_future(future)
+
+    async def _enqueue(self, item: Tuple[str, Any]) -> None:
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._queue_full_waits += 1
+            await asyncio.to_thread(self._queue.put, item)
+
+    async def iter_query(
+        self,
+        sql: str,
+        params: Sequence[Any] = (),
+        chunk_size: int = 500,
+        label: str = "query",
+    ) -> AsyncIterator[List[Tuple[Any, ...]]]:
+        readers = self._readers
+        async with readers.lease() as conn:
+            started = time.perf_counter()
+            db_time = 0.0
+            total_rows = 0
+            cur = await readers.run(conn.execute, sql, tuple(params))
+            db_time += time.perf_counter() - started
+            try:
+                while True:
+                    fetch_started = time.perf_counter()
+                    rows = await readers.run(cur.fetchmany, chunk_size)
+                    db_time += time.perf_counter() - fetch_started
+                    if not rows:
+                        break
+                    total_rows += len(rows)
+                    yield rows
+            finally:
+                cur.close()
+                readers.record(
+                    label,
+                    db_time * 1000,
+                    (time.perf_counter() - started) * 1000,
+                    total_rows,
+                )
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._stats_lock:
+            while self._recent_batches and now - self._recent_batches[0][0] > _RATE_WINDOW_S:
+                self._recent_batches.popleft()
+            recent_rows = sum(rows for _, rows in self._recent_batches)
+        written = self._rows_written + self._events_written
+        return {
+            "queue_depth": self._queue.qsize(),
+            "queue_full_waits": self._queue_full_waits,
+            "rows_written": self._rows_written,
+            "events_written": self._events_written,
+            "rows_per_sec": round(recent_rows / _RATE_WINDOW_S, 2),
+            "batches": self._batches,
+            "last_batch_size": self._last_batch,
+            "max_batch_size": self._max_batch,
+            "avg_batch_size": round(written / self._batches, 2) if self._batches else 0.0,
+            "last_commit_ms": round(self._last_commit_ms, 3),
+            "max_commit_ms": round(self._max_commit_ms, 3),
+            "write_errors": self._write_errors,
+            "batch_size_limit": self._batch_size,
+            "flush_interval_ms": int(self._flush_interval * 1000),
+            "readers": self._readers.stats(),
+        }
+
+    def _writer_loop(self) -> None:
+        telemetry_rows: List[Tuple[Any, ...]] = []
+        event_rows: List[Tuple[Any, ...]] = []
+        waiters: List[threading.Event] = []
+        calls: List[Tuple[Callable[[sqlite3.Connection], Any], concurrent.futures.Future]] = []
+        deadline: float | None = None
+        stopping = False
+        while not stopping:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            while item is not None:
+                kind, data = item
+                if kind == "telemetry":
+                    telemetry_rows.append(data)
+                elif kind == "event":
+                    event_rows.append(data)
+                elif kind == "call":
+                    calls.append(data)
+                elif kind == "flush":
+                    waiters.append(data)
+                elif kind == "stop":
+                    stopping = True
+                if len(telemetry_rows) + len(event_rows) >= self._batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    item = None
+            pending = len(telemetry_rows) + len(event_rows)
+            if pending and deadline is None:
+                deadline = time.monotonic() + self._flush_interval
+            due = deadline is not None and time.monotonic() >= deadline
+            if pending and (pending >= self._batch_size or due or waiters or calls or stopping):
+                self._write_batch(telemetry_rows, event_rows)
+                telemetry_rows = []
+                event_rows = []
+                deadline = None
+            for fn, future in calls:
+                self._run_call(fn, future)
+            calls = []
+            for waiter in waiters:
+                waiter.set()
+            waiters = []
+
+    def _run_call(
+        self,
+        fn: Callable[[sqlite3.Connection], Any],
+        future: concurrent.futures.Future,
+    ) -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = fn(self._conn)
+            self._conn.commit()
+        except Exception as exc:
+            self._conn.rollback()
+            future.set_exception(exc)
+            return
+        future.set_result(result)
+
+    def _write_batch(
+        self,
+        telemetry_rows: List[Tuple[Any, ...]],
+        event_rows: List[Tuple[Any, ...]],
+    ) -> None:
+        started = time.perf_counter()
+        try:
+            cur = self._conn.cursor()
+            if telemetry_rows:
+                cur.executemany(TELEMETRY_INSERT_SQL, telemetry_rows)
+            if event_rows:
+                cur.executemany(EVENT_INSERT_SQL, event_rows)
+            self._conn.commit()
+        except sqlite3.Error:
+            self._conn.rollback()
+            self._write_errors += 1
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        size = len(telemetry_rows) + len(event_rows)
+        with self._stats_lock:
+            self._rows_written += len(telemetry_rows)
+            self._events_written += len(event_rows)
+            self._batches += 1
+            self._last_batch = size
+            self._max_batch = max(self._max_batch, size)
+            self._last_commit_ms = elapsed_ms
+            self._max_commit_ms = max(self._max_commit_ms, elapsed_ms)
+            self._recent_batches.append((time.monotonic(), len(telemetry_rows)))
 
 
 _db_instance: Database | None = None
@@ -128,5 +469,11 @@ _db_instance: Database | None = None
 def get_db(db_path: str) -> Database:
     global _db_instance
     if _db_instance is None:
-        _db_instance = Database(db_path)
+        _db_instance = Database(
+            db_path,
+            batch_size=settings.db_batch_size,
+            flush_interval_ms=settings.db_flush_interval_ms,
+            queue_size=settings.db_queue_size,
+            readers=settings.db_readers,
+        )
     return _db_instance
@@ -0,0 +1,93 @@
+import time
+from typing import Any, Dict, List, Mapping, Set
+
+from app.services.db import TELEMETRY_FIELDS
+from app.services.ws_protocol import DECIMATION_MODES, flatten
+
+
+class _Window:
+    def __init__(self) -> None:
+        self.count = 0
+        self.sums: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self.mins: Dict[str, float] = {}
+        self.maxs: Dict[str, float] = {}
+
+    def add(self, values: Mapping[str, Any]) -> None:
+        self.count += 1
+        for field in TELEMETRY_FIELDS:
+            value = values.get(field)
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                continue
+            self.sums[field] = self.sums.get(field, 0.0) + value
+            self.counts[field] = self.counts.get(field, 0) + 1
+            if field not in self.mins or value < self.mins[field]:
+                self.mins[field] = value
+            if field not in self.maxs or value > self.maxs[field]:
+                self.maxs[field] = value
+
+
+class RateTier:
+    def __init__(self, rate: float, mode: str) -> None:
+        if mode not in DECIMATION_MODES:
+            raise ValueError(f"unknown decimation mode: {mode}")
+        self.rate = rate
+        self.mode = mode
+        self.groups: Set[Any] = set()
+        self.latest_by_source: Dict[str, Dict[str, Any]] = {}
+        self._interval = 1.0 / rate if rate > 0 else 0.0
+        self._last_emit: Dict[str, float] = {}
+        self._windows: Dict[str, _Window] = {}
+        self.frames_in = 0
+        self.frames_out = 0
+
+    def push(self, payload: Dict[str, Any], source: str, now: float | None = None) -> Dict[str, Any] | None:
+        self.frames_in += 1
+        if self._interval <= 0:
+            self.latest_by_source[source] = payload
+            self.frames_out += 1
+            return payload
+        now = time.monotonic() if now is None else now
+        window = None
+        if self.mode != "latest":
+            window = self._windows.setdefault(source, _Window())
+            window.add(flatten(payload))
+        last = self._last_emit.get(source)
+        if last is not None and now - last < self._interval:
+            return None
+        self._last_emit[source] = now if last is None or now - last > 2 * self._interval else last + self._interval
+        output = payload if window is None else self._summarize(payload, window)
+        self._windows.pop(source, None)
+        self.latest_by_source[source] = output
+        self.frames_out += 1
+        return output
+
+    def _summarize(self, payload: Dict[str, Any], window: _Window) -> Dict[str, Any]:
+        output: Dict[str, Any] = {
+            "type": payload.get("type", "telemetry"),
+            "ts": payload.get("ts"),
+            "window": window.count,
+            "mode": self.mode,
+        }
+        if self.mode == "mean":
+            for field, total in window.sums.items():
+                output[field] = round(total / window.counts[field], 4)
+        else:
+            values = flatten(payload)
+            for field in window.sums:
+                output[field] = values.get(field)
+                output[f"{field}_min"] = window.mins[field]
+                output[f"{field}_max"] = window.maxs[field]
+        fan: List[Any] = [output.get(f"fan{i}") for i in (1, 2, 3)]
+        if any(value is not None for value in fan):
+            output["fan"] = fan
+        return output
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate": self.rate,
+            "mode": self.mode,
+            "groups": len(self.groups),
+            "frames_in": self.frames_in,
+            "frames_out": self.frames_out,
+        }
@@ -0,0 +1,98 @@
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+
+from app.services.db import Database
+
+_JSON_PATH = re.compile(r"^\$(\.[A-Za-z_][A-Za-z0-9_]*|\[\d+\])+$")
+
+
+@dataclass
+class EventQuery:
+    role: str | None = None
+    action: str | None = None
+    since: int | None = None
+    until: int | None = None
+    path: str | None = None
+    value: str | None = None
+    cursor: str | None = None
+    limit: int = 100
+    order: str = "desc"
+
+
+class EventLog:
+    def __init__(self, db: Database) -> None:
+        self._db = db
+
+    @staticmethod
+    def parse_cursor(cursor: str) -> Tuple[int, int]:
+        try:
+            ts, rowid = cursor.split(":", 1)
+            return int(ts), int(rowid)
+        except ValueError as exc:
+            raise ValueError("invalid cursor") from exc
+
+    def build_sql(self, query: EventQuery) -> Tuple[str, List[Any]]:
+        where: List[str] = []
+        params: List[Any] = []
+        if query.role:
+            where.append("role = ?")
+            params.append(query.role)
+        if query.action == "fault":
+            where.append("action = 'fault'")
+        elif query.action:
+            where.append("action = ?")
+            params.append(query.action)
+        if query.since is not None:
+            where.append("ts >= ?")
+            params.append(query.since)
+        if query.until is not None:
+            where.append("ts < ?")
+            params.append(query.until)
+        if query.path:
+            if not _JSON_PATH.match(query.path):
+                raise ValueError("invalid json path")
+            if query.value is None:
+                where.append("json_extract(payload_json, ?) IS NOT NULL")
+                params.append(query.path)
+            else:
+                try:
+                    value = json.loads(query.value)
+                except json.JSONDecodeError:
+                    value = query.value
+                if isinstance(value, bool):
+                    value = int(value)
+                where.append("json_extract(payload_json, ?) = ?")
+                params.extend([query.path, value])
+        descending = query.order == "desc"
+        if query.cursor:
+            ts, rowid = self.parse_cursor(query.cursor)
+            where.append("(ts, rowid) < (?, ?)" if descending else "(ts, rowid) > (?, ?)")
+            params.extend([ts, rowid])
+        direction = "DESC" if descending else "ASC"
+        sql = "SELECT rowid, ts, role, action, payload_json FROM events"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY ts {direction}, rowid {direction} LIMIT ?"
+        params.append(query.limit)
+        return sql, params
+
+    async def query(self, query: EventQuery) -> Dict[str, Any]:
+        sql, params = self.build_sql(query)
+        events = []
+        async for rows in self._db.iter_query(sql, params, chunk_size=query.limit, label="events"):
+            for rowid, ts, role, action, payload_json in rows:
+                events.append(
+                    {
+                        "id": rowid,
+                        "ts": ts,
+                        "role": role,
+                        "action": action,
+                        "payload": json.loads(payload_json) if payload_json else None,
+                    }
+                )
+        next_cursor = None
+        if len(events) == query.limit:
+            next_cursor = f"{events[-1]['ts']}:{events[-1]['id']}"
+        return {"events": events, "next_cursor": next_cursor}
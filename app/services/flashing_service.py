@@ -1,14 +1,22 @@
 import asyncio
+import contextlib
 import os
 import shutil
-import subprocess
+import signal
+import tempfile
 import time
 import zipfile
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Callable, Dict, Optional
 
 from app.config import settings
+from app.services.compile_cache import CompileCache, sketch_key
+from app.services.serial_manager import SerialManager
+
+OUTPUT_LINE_LIMIT = 1 << 20
+
+OutputCallback = Callable[[str, str], None]
 
 
 @dataclass
@@ -19,34 +27,58 @@ class FlashResult:
     upload_stdout: str
     upload_stderr: str
     message: str
+    cached: bool = False
+
+
+@dataclass
+class BuildResult:
+    ok: bool
+    stdout: str
+    stderr: str
+    input_dir: Path | None = None
+    cached: bool = False
+    key: str | None = None
 
 
 class FlashingService:
-    def __init__(self) -> None:
-        self._lock = asyncio.Lock()
+    def __init__(self, cache: CompileCache | None = None, serial: SerialManager | None = None) -> None:
+        self._upload_lock = asyncio.Lock()
+        self._cache = cache
+        self._serial = serial
+
+    @property
+    def cache(self) -> CompileCache | None:
+        return self._cache
 
     async def flash_sketch(
         self,
         file_path: Path,
         board_fqbn: str,
         sketch_main: Optional[str],
+        on_output: OutputCallback | None = None,
     ) -> FlashResult:
-        async with self._lock:
-            workdir = self._prepare_workspace(file_path)
-            sketch_dir = self._resolve_sketch_dir(workdir, sketch_main)
-            compile_cmd = [
-                settings.arduino_cli_path,
-                "compile",
-                "--fqbn",
-                board_fqbn,
-                str(sketch_dir),
-            ]
-            compile_stdout, compile_stderr, compile_ok = await self._run_cmd(compile_cmd)
-            if not compile_ok:
+        sketch_dir = self.prepare(file_path, sketch_main)
+        build = await self.compile(sketch_dir, board_fqbn, on_output)
+        return await self.upload(sketch_dir, board_fqbn, build, on_output)
+
+    def prepare(self, file_path: Path, sketch_main: Optional[str]) -> Path:
+        workdir = self._prepare_workspace(file_path)
+        return self._resolve_sketch_dir(workdir, sketch_main)
+
+    async def upload(
+        self,
+        sketch_dir: Path,
+        board_fqbn: str,
+        build: BuildResult,
+        on_output: OutputCallback | None = None,
+        on_started: Callable[[], None] | None = None,
+    ) -> FlashResult:
+        try:
+            if not build.ok:
                 return FlashResult(
                     ok=False,
-                    compile_stdout=compile_stdout,
-                    compile_stderr=compile_stderr,
+                    compile_stdout=build.stdout,
+                    compile_stderr=build.stderr,
                     upload_stdout="",
                     upload_stderr="",
                     message="compile failed",
@@ -54,11 +86,12 @@ class FlashingService:
             if not settings.upload_enabled:
                 return FlashResult(
                     ok=True,
-                    compile_stdout=compile_stdout,
-                    compile_stderr=compile_stderr,
+                    compile_stdout=build.stdout,
+                    compile_stderr=build.stderr,
                     upload_stdout="",
                     upload_stderr="",
                     message="upload disabled by configuration",
+                    cached=build.cached,
                 )
             upload_cmd = [
                 settings.arduino_cli_path,
@@ -67,17 +100,69 @@ class FlashingService:
                 settings.student_port,
                 "--fqbn",
                 board_fqbn,
-                str(sketch_dir),
             ]
-            upload_stdout, upload_stderr, upload_ok = await self._run_cmd(upload_cmd)
+            if build.input_dir is not None:
+                upload_cmd += ["--input-dir", str(build.input_dir)]
+            upload_cmd.append(str(sketch_dir))
+            async with self._upload_lock:
+                async with self._serial.released() if self._serial else contextlib.nullcontext():
+                    if on_started:
+                        on_started()
+                    upload_stdout, upload_stderr, upload_ok = await self._run_cmd(upload_cmd, on_output)
             return FlashResult(
                 ok=upload_ok,
-                compile_stdout=compile_stdout,
-                compile_stderr=compile_stderr,
+                compile_stdout=build.stdout,
+                compile_stderr=build.stderr,
                 upload_stdout=upload_stdout,
                 upload_stderr=upload_stderr,
                 message="uploaded" if upload_ok else "upload failed",
+                cached=build.cached,
             )
+        finally:
+            self.release(build)
+
+    def release(self, build: BuildResult) -> None:
+        if build.key is not None and self._cache is not None:
+            self._cache.unpin(build.key)
+            build.key = None
+
+    async def compile(
+        self,
+        sketch_dir: Path,
+        board_fqbn: str,
+        on_output: OutputCallback | None = None,
+    ) -> BuildResult:
+        compile_cmd = [settings.arduino_cli_path, "compile", "--fqbn", board_fqbn]
+        if self._cache is None:
+            stdout, stderr, ok = await self._run_cmd(compile_cmd + [str(sketch_dir)], on_output)
+            return BuildResult(ok, stdout, stderr)
+        key = await asyncio.to_thread(sketch_key, sketch_dir, board_fqbn)
+        cached = self._cache.lookup(key)
+        if cached is not None:
+            self._cache.pin(key)
+            return BuildResult(True, "", "", cached, cached=True, key=key)
+        build_dir = self._cache.staging_dir()
+        try:
+            stdout, stderr, ok = await self._run_cmd(
+                compile_cmd + ["--output-dir", str(build_dir), str(sketch_dir)],
+                on_output,
+            )
+        except BaseException:
+            self._cache.discard(build_dir)
+            raise
+        if not ok or not any(build_dir.iterdir()):
+            self._cache.discard(build_dir)
+            return BuildResult(ok, stdout, stderr)
+        input_dir, size, created = await asyncio.to_thread(
+            self._cache.place,
+            key,
+            build_dir,
+            {"fqbn": board_fqbn, "sketch": sketch_dir.name},
+        )
+        self._cache.add(key, size, created)
+        self._cache.pin(key)
+        await asyncio.to_thread(self._cache.purge)
+        return BuildResult(True, stdout, stderr, input_dir, key=key)
 
     async def flash_baseline(self) -> FlashResult:
         baseline_file = self._find_baseline_file()
@@ -96,10 +181,35 @@ class FlashingService:
             sketch_main=settings.baseline_sketch_main,
         )
 
+    async def precompile_baseline(self) -> FlashResult:
+        baseline_file = self._find_baseline_file()
+        if baseline_file is None:
+            return FlashResult(
+                ok=False,
+                compile_stdout="",
+                compile_stderr="",
+                upload_stdout="",
+                upload_stderr="",
+                message="baseline firmware not provided",
+            )
+        sketch_dir = self.prepare(baseline_file, settings.baseline_sketch_main)
+        build = await self.compile(sketch_dir, settings.baseline_fqbn)
+        self.release(build)
+        return FlashResult(
+            ok=build.ok,
+            compile_stdout=build.stdout,
+            compile_stderr=build.stderr,
+            upload_stdout="",
+            upload_stderr="",
+            message="baseline precompiled" if build.ok else "compile failed",
+            cached=build.cached,
+        )
+
     def _prepare_workspace(self, file_path: Path) -> Path:
         ts = int(time.time() * 1000)
-        base = Path(settings.data_dir) / "uploads" / "student" / str(ts)
-        base.mkdir(parents=True, exist_ok=True)
+        root = Path(settings.data_dir) / "uploads" / "student"
+        root.mkdir(parents=True, exist_ok=True)
+        base = Path(tempfile.mkdtemp(prefix=f"{ts}-", dir=root))
         if file_path.suffix.lower() == ".zip":
             with zipfile.ZipFile(file_path, "r") as zf:
                 zf.extractall(base)
@@ -142,9 +252,36 @@ class FlashingService:
         shutil.move(str(sketch), str(target_path))
         return target_dir
 
-    async def _run_cmd(self, cmd: list[str]) -> tuple[str, str, bool]:
-        def _run() -> tuple[str, str, bool]:
-            proc = subprocess.run(cmd, capture_output=True, text=True)
-            return proc.stdout, proc.stderr, proc.returncode == 0
+    async def _run_cmd(
+        self,
+        cmd: list[str],
+        on_output: OutputCallback | None = None,
+    ) -> tuple[str, str, bool]:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=OUTPUT_LINE_LIMIT,
+            start_new_session=True,
+        )
+        output: Dict[str, list[str]] = {"stdout": [], "stderr": []}
+
+        async def _pump(stream_name: str, stream: asyncio.StreamReader) -> None:
+            async for raw in stream:
+                line = raw.decode(errors="replace")
+                output[stream_name].append(line)
+                if on_output:
+                    on_output(stream_name, line.rstrip("\r\n"))
 
-        return await asyncio.to_thread(_run)
+        try:
+            await asyncio.gather(_pump("stdout", proc.stdout), _pump("stderr", proc.stderr))
+            returncode = await proc.wait()
+        except BaseException:
+            if proc.returncode is None:
+                try:
+                    os.killpg(proc.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                await proc.wait()
+            raise
+        return "".join(output["stdout"]), "".join(output["stderr"]), returncode == 0
@@ -0,0 +1,123 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Generic, Tuple, TypeVar
+
+OVERFLOW_POLICIES = {"drop_oldest", "drop_newest", "block"}
+
+T = TypeVar("T")
+
+
+@dataclass
+class StageConfig:
+    maxsize: int = 1024
+    overflow: str = "drop_oldest"
+
+    def __post_init__(self) -> None:
+        if self.overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"unknown overflow policy: {self.overflow}")
+
+
+class LatencyStats:
+    def __init__(self) -> None:
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = 0.0
+
+    def add(self, value_ms: float) -> None:
+        self.count += 1
+        self.total_ms += value_ms
+        self.last_ms = value_ms
+        if value_ms > self.max_ms:
+            self.max_ms = value_ms
+
+    def as_dict(self) -> Dict[str, float]:
+        avg = self.total_ms / self.count if self.count else 0.0
+        return {
+            "avg_ms": round(avg, 3),
+            "max_ms": round(self.max_ms, 3),
+            "last_ms": round(self.last_ms, 3),
+        }
+
+
+class PipelineStage(Generic[T]):
+    def __init__(self, name: str, handler: Callable[[T], Awaitable[None]], config: StageConfig) -> None:
+        self.name = name
+        self._handler = handler
+        self._config = config
+        self._queue: asyncio.Queue[Tuple[float, T]] | None = None
+        self._task: asyncio.Task | None = None
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.wait = LatencyStats()
+        self.service = LatencyStats()
+
+    def start(self) -> None:
+        if self._task:
+            return
+        self._queue = asyncio.Queue(maxsize=max(1, self._config.maxsize))
+        self._task = asyncio.create_task(self._worker())
+
+    async def stop(self, drain: bool = True) -> None:
+        if not self._task or not self._queue:
+            return
+        if drain:
+            await self._queue.join()
+        self._task.cancel()
+        self._task = None
+        self._queue = None
+
+    async def put(self, item: T) -> bool:
+        queue = self._queue
+        if queue is None:
+            await self._run(time.perf_counter(), item)
+            return True
+        entry = (time.perf_counter(), item)
+        try:
+            queue.put_nowait(entry)
+            return True
+        except asyncio.QueueFull:
+            pass
+        if self._config.overflow == "block":
+            await queue.put(entry)
+            return True
+        self.dropped += 1
+        if self._config.overflow == "drop_newest":
+            return False
+        queue.get_nowait()
+        queue.task_done()
+        queue.put_nowait(entry)
+        return True
+
+    async def _worker(self) -> None:
+        queue = self._queue
+        while True:
+            enqueued, item = await queue.get()
+            try:
+                await self._run(enqueued, item)
+            finally:
+                queue.task_done()
+
+    async def _run(self, enqueued: float, item: T) -> None:
+        started = time.perf_counter()
+        self.wait.add((started - enqueued) * 1000)
+        try:
+            await self._handler(item)
+        except Exception:
+            self.errors += 1
+        self.service.add((time.perf_counter() - started) * 1000)
+        self.processed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": self._queue.qsize() if self._queue else 0,
+            "maxsize": self._config.maxsize,
+            "overflow": self._config.overflow,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "wait": self.wait.as_dict(),
+            "service": self.service.as_dict(),
+        }
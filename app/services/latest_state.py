@@ -0,0 +1,72 @@
+import asyncio
+import os
+import time
+from typing import Any, Dict, Mapping, Sequence, Tuple
+
+from app.services.db import TELEMETRY_FIELDS
+from app.services.ws_protocol import flatten
+
+
+class LatestState:
+    def __init__(self, fields: Sequence[str] = TELEMETRY_FIELDS) -> None:
+        self.fields = tuple(fields)
+        self.version = 0
+        self._epoch = os.urandom(4).hex()
+        self._values: Dict[str, Tuple[Any, int, str]] = {}
+        self._by_source: Dict[str, Dict[str, Tuple[Any, int, str]]] = {}
+        self._sources: Dict[str, Dict[str, Any]] = {}
+        self._changed = asyncio.Event()
+
+    @property
+    def etag(self) -> str:
+        return f'"{self._epoch}-{self.version}"'
+
+    def update(self, payload: Mapping[str, Any], source: str) -> None:
+        ts = payload.get("ts")
+        ts = int(ts) if ts is not None else int(time.time() * 1000)
+        values = flatten(payload)
+        own = self._by_source.setdefault(source, {})
+        for field in self.fields:
+            if field in values:
+                entry = (values[field], ts, source)
+                own[field] = entry
+                self._values[field] = entry
+        info = self._sources.setdefault(source, {"frames": 0})
+        info["ts"] = ts
+        info["frames"] += 1
+        self.version += 1
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait(self, etag: str, timeout: float) -> bool:
+        if etag != self.etag:
+            return True
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def snapshot(self, fields: Sequence[str] | None = None, source: str | None = None) -> Dict[str, Any]:
+        values: Dict[str, Any] = {}
+        field_ts: Dict[str, int] = {}
+        field_source: Dict[str, str] = {}
+        current = self._by_source.get(source, {}) if source else self._values
+        for field in fields or self.fields:
+            entry = current.get(field)
+            if entry is None:
+                continue
+            values[field], field_ts[field], field_source[field] = entry
+        sources = {
+            name: dict(info)
+            for name, info in self._sources.items()
+            if not source or name == source
+        }
+        return {
+            "version": self.version,
+            "ts": max(field_ts.values(), default=None),
+            "values": values,
+            "field_ts": field_ts,
+            "field_source": field_source,
+            "sources": sources,
+        }
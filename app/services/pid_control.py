@@ -0,0 +1,110 @@
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Mapping
+
+from app.services.command_tracker import LatencyHistogram
+from app.services.ingest_pipeline import LatencyStats
+
+PID_FIELDS = ("t1", "t2")
+
+
+@dataclass
+class PidConfig:
+    field: str = "t1"
+    setpoint: float = 40.0
+    kp: float = 8.0
+    ki: float = 0.1
+    kd: float = 0.0
+    output_min: float = 0.0
+    output_max: float = 100.0
+    source: str | None = None
+
+    def __post_init__(self) -> None:
+        if self.field not in PID_FIELDS:
+            raise ValueError(f"unsupported PID field: {self.field}")
+        if self.output_min > self.output_max:
+            raise ValueError("output_min must be <= output_max")
+
+
+class Pid:
+    def __init__(self, config: PidConfig) -> None:
+        self.config = config
+        self.integral = 0.0
+        self.error = 0.0
+        self.output = 0.0
+        self.saturated = False
+        self._last_measurement: float | None = None
+        self._last_ts: float | None = None
+
+    def update(self, measurement: float, ts: float) -> float:
+        config = self.config
+        error = config.setpoint - measurement
+        dt = ts - self._last_ts if self._last_ts is not None else 0.0
+        derivative = 0.0
+        integral = self.integral
+        if dt > 0:
+            integral += config.ki * error * dt
+            if self._last_measurement is not None:
+                derivative = -(measurement - self._last_measurement) / dt
+        unclamped = config.kp * error + integral + config.kd * derivative
+        output = min(config.output_max, max(config.output_min, unclamped))
+        self.saturated = output != unclamped
+        if not self.saturated or (unclamped > output) != (error > 0):
+            self.integral = min(config.output_max, max(config.output_min, integral))
+        if dt > 0 or self._last_ts is None:
+            self._last_ts = ts
+            self._last_measurement = measurement
+        self.error = error
+        self.output = output
+        return output
+
+
+class PidControl:
+    def __init__(self, config: PidConfig, source: str) -> None:
+        self.pid = Pid(config)
+        self.source = source
+        self.active = True
+        self.frames = 0
+        self.commands = 0
+        self.skipped = 0
+        self.latency = LatencyHistogram()
+        self.compute = LatencyStats()
+
+    @property
+    def config(self) -> PidConfig:
+        return self.pid.config
+
+    def sample(self, payload: Mapping[str, Any], source: str) -> int | None:
+        if source != self.source or payload.get("type", "telemetry") != "telemetry":
+            return None
+        value = payload.get(self.config.field)
+        if not isinstance(value, (int, float)):
+            self.skipped += 1
+            return None
+        started = time.perf_counter()
+        ts = payload.get("ts")
+        output = self.pid.update(float(value), ts / 1000 if isinstance(ts, (int, float)) else time.monotonic())
+        self.frames += 1
+        self.compute.add((time.perf_counter() - started) * 1000)
+        return int(round(output))
+
+    def sent(self, arrived: float) -> None:
+        self.commands += 1
+        self.latency.add((time.perf_counter() - arrived) * 1000)
+
+    def stats(self) -> Dict[str, Any]:
+        pid = self.pid
+        return {
+            "active": self.active,
+            "source": self.source,
+            "config": asdict(self.config),
+            "error": round(pid.error, 3),
+            "integral": round(pid.integral, 3),
+            "output": round(pid.output, 3),
+            "saturated": pid.saturated,
+            "frames": self.frames,
+            "commands": self.commands,
+            "skipped": self.skipped,
+            "compute": self.compute.as_dict(),
+            "latency": self.latency.as_dict(),
+        }
@@ -0,0 +1,249 @@
+import asyncio
+import json
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Tuple
+
+from app.services.db import TELEMETRY_FIELDS, Database
+from app.services.ingest_pipeline import LatencyStats
+from app.services.sim_clock import Clock
+from app.services.telemetry_service import TelemetryService, TelemetrySimulator
+
+TELEMETRY_SQL = (
+    "SELECT rowid, ts, " + ", ".join(TELEMETRY_FIELDS) + ", source_device FROM telemetry "
+    "WHERE ts >= ? AND ts < ? AND (ts > ? OR rowid > ?){source} ORDER BY ts, rowid LIMIT ?"
+)
+EVENTS_SQL = (
+    "SELECT rowid, ts, role, action, payload_json FROM events "
+    "WHERE ts >= ? AND ts < ? AND (ts > ? OR rowid > ?) ORDER BY ts, rowid LIMIT ?"
+)
+YIELD_EVERY_ROWS = 256
+
+
+@dataclass
+class ReplayQuery:
+    start_ms: int
+    end_ms: int
+    source_device: str | None = None
+    speed: float = 1.0
+    events: bool = True
+    rebase: bool = True
+
+    def __post_init__(self) -> None:
+        if self.end_ms <= self.start_ms:
+            raise ValueError("end must be after start")
+        if self.speed < 0:
+            raise ValueError("speed must be >= 0")
+
+
+def _telemetry_payload(row: Tuple[Any, ...]) -> Tuple[Dict[str, Any], str]:
+    values = dict(zip(TELEMETRY_FIELDS, row[2:-1]))
+    payload: Dict[str, Any] = {"type": "telemetry", "ver": "0.1", "ts": row[1]}
+    fan = [values.pop("fan1"), values.pop("fan2"), values.pop("fan3")]
+    payload.update((field, value) for field, value in values.items() if value is not None)
+    if any(value is not None for value in fan):
+        payload["fan"] = fan
+    return payload, row[-1]
+
+
+class ReplaySource:
+    def __init__(
+        self,
+        db: Database,
+        telemetry: TelemetryService,
+        clock: Clock | None = None,
+        simulator: TelemetrySimulator | None = None,
+        chunk_rows: int = 2000,
+        prefetch_chunks: int = 4,
+        on_event: Callable[[Dict[str, Any]], Awaitable[None]] | None = None,
+    ) -> None:
+        self._db = db
+        self._telemetry = telemetry
+        self._clock = clock or Clock()
+        self._simulator = simulator
+        self._chunk_rows = chunk_rows
+        self._prefetch_chunks = prefetch_chunks
+        self._on_event = on_event
+        self._task: asyncio.Task | None = None
+        self._producers: List[asyncio.Task] = []
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self.query: ReplayQuery | None = None
+        self.state = "idle"
+        self.error: str | None = None
+        self.recent_events: Deque[Dict[str, Any]] = deque(maxlen=20)
+        self._reset()
+
+    def _reset(self) -> None:
+        self.frames = 0
+        self.events = 0
+        self.chunks = 0
+        self.position_ms: int | None = None
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.lag = LatencyStats()
+        self.recent_events.clear()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self, query: ReplayQuery) -> None:
+        await self.stop()
+        self._reset()
+        self.query = query
+        self.state = "running"
+        self.error = None
+        if self._simulator:
+            await self._simulator.stop()
+        self._task = asyncio.create_task(self._run(query))
+
+    async def stop(self) -> None:
+        if self.running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def wait(self) -> None:
+        if self._task:
+            await asyncio.shield(self._task)
+
+    async def _prefetch(self, name: str, sql: str, params: Tuple[Any, ...]) -> None:
+        queue = self._queues[name]
+        last_ts, end_ms = params[:2]
+        last_rowid = -1
+        try:
+            while True:
+                rows: List[Tuple[Any, ...]] = []
+                async for chunk in self._db.iter_query(
+                    sql,
+                    (last_ts, end_ms, last_ts, last_rowid, *params[2:], self._chunk_rows),
+                    chunk_size=self._chunk_rows,
+                    label="replay",
+                ):
+                    rows.extend(chunk)
+                if not rows:
+                    break
+                self.chunks += 1
+                await queue.put(rows)
+                last_rowid, last_ts = rows[-1][0], rows[-1][1]
+                if len(rows) < self._chunk_rows:
+                    break
+        except Exception as exc:
+            await queue.put(exc)
+            return
+        await queue.put(None)
+
+    async def _rows(self, name: str) -> AsyncIterator[Tuple[Any, ...]]:
+        queue = self._queues[name]
+        while True:
+            rows = await queue.get()
+            if rows is None:
+                return
+            if isinstance(rows, Exception):
+                raise rows
+            for row in rows:
+                yield row
+
+    async def _run(self, query: ReplayQuery) -> None:
+        clock = self._clock
+        source_filter = " AND source_device = ?" if query.source_device else ""
+        telemetry_params: Tuple[Any, ...] = (query.start_ms, query.end_ms)
+        if query.source_device:
+            telemetry_params += (query.source_device,)
+        self._queues = {"telemetry": asyncio.Queue(self._prefetch_chunks)}
+        self._producers = [
+            asyncio.create_task(
+                self._prefetch("telemetry", TELEMETRY_SQL.format(source=source_filter), telemetry_params)
+            )
+        ]
+        if query.events:
+            self._queues["events"] = asyncio.Queue(self._prefetch_chunks)
+            self._producers.append(
+                asyncio.create_task(self._prefetch("events", EVENTS_SQL, (query.start_ms, query.end_ms)))
+            )
+        streams = {name: self._rows(name) for name in self._queues}
+        self.started_at = time.time()
+        emitted = 0
+        try:
+            heads = {name: await anext(stream, None) for name, stream in streams.items()}
+            origin = clock.monotonic()
+            base_ms = int(clock.time() * 1000)
+            scale = 1 / query.speed if query.speed > 0 else 1.0
+            while True:
+                pending = [(row[1], name) for name, row in heads.items() if row is not None]
+                if not pending:
+                    break
+                ts, name = min(pending, key=lambda item: (item[0], item[1] != "telemetry"))
+                row = heads[name]
+                if query.speed > 0:
+                    delay = origin + (ts - query.start_ms) / 1000 / query.speed - clock.monotonic()
+                    if delay > 0.001:
+                        await clock.sleep(delay)
+                    elif delay < 0:
+                        self.lag.add(-delay * 1000)
+                emitted += 1
+                if not emitted % YIELD_EVERY_ROWS:
+                    await asyncio.sleep(0)
+                self.position_ms = ts
+                if query.rebase:
+                    ts = base_ms + int((ts - query.start_ms) * scale)
+                if name == "telemetry":
+                    payload, source = _telemetry_payload(row)
+                    payload["ts"] = ts
+                    await self._telemetry.update(payload, source, persist=False)
+                    self.frames += 1
+                else:
+                    await self._emit_event(row, ts)
+                heads[name] = await anext(streams[name], None)
+            self.state = "done"
+        except asyncio.CancelledError:
+            self.state = "cancelled"
+            raise
+        except Exception as exc:
+            self.state = "error"
+            self.error = str(exc)
+        finally:
+            self.finished_at = time.time()
+            for producer in self._producers:
+                producer.cancel()
+            self._producers = []
+            if self._simulator:
+                await self._simulator.start()
+
+    async def _emit_event(self, row: Tuple[Any, ...], ts: int) -> None:
+        try:
+            payload = json.loads(row[4]) if row[4] else {}
+        except json.JSONDecodeError:
+            payload = {"raw": row[4]}
+        event = {"ts": ts, "role": row[2], "action": row[3], "payload": payload}
+        self.events += 1
+        self.recent_events.append(event)
+        if self._on_event:
+            await self._on_event(event)
+
+    def stats(self) -> Dict[str, Any]:
+        query = self.query
+        progress = None
+        if query and self.position_ms is not None:
+            progress = round((self.position_ms - query.start_ms) / (query.end_ms - query.start_ms), 4)
+        if self.state == "done":
+            progress = 1.0
+        elapsed = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0.0
+        return {
+            "state": self.state,
+            "error": self.error,
+            "query": asdict(query) if query else None,
+            "frames": self.frames,
+            "events": self.events,
+            "chunks": self.chunks,
+            "prefetched": {name: queue.qsize() for name, queue in self._queues.items()},
+            "position_ms": self.position_ms,
+            "progress": progress,
+            "fps": round(self.frames / elapsed, 1) if elapsed > 0 else 0.0,
+            "lag": self.lag.as_dict(),
+            "recent_events": list(self.recent_events),
+        }
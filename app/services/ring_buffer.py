@@ -0,0 +1,96 @@
+import math
+import time
+from typing import Any, Dict, List, Mapping, Sequence, Tuple
+
+import numpy as np
+
+from app.services.db import TELEMETRY_FIELDS
+from app.services.ws_protocol import flatten
+
+
+class TelemetryRing:
+    def __init__(self, capacity: int, fields: Sequence[str] = TELEMETRY_FIELDS) -> None:
+        self.capacity = max(1, capacity)
+        self.fields = tuple(fields)
+        self._index = {field: i for i, field in enumerate(self.fields)}
+        self._ts = np.zeros(self.capacity, dtype=np.int64)
+        self._values = np.full((len(self.fields), self.capacity), np.nan, dtype=np.float64)
+        self._head = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, ts: int, values: Mapping[str, Any]) -> None:
+        slot = self._head
+        self._ts[slot] = ts
+        column = self._values[:, slot]
+        for field, i in self._index.items():
+            value = values.get(field)
+            column[i] = value if isinstance(value, (int, float)) else np.nan
+        self._head = (slot + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def window(self, since_ms: int | None = None) -> Tuple[np.ndarray, np.ndarray]:
+        if self._size < self.capacity:
+            order = np.arange(self._size)
+        else:
+            order = (np.arange(self.capacity) + self._head) % self.capacity
+        ts = self._ts[order]
+        values = self._values[:, order]
+        if since_ms is not None:
+            start = int(np.searchsorted(ts, since_ms, side="left"))
+            ts = ts[start:]
+            values = values[:, start:]
+        return ts, values
+
+
+def _column(values: np.ndarray) -> List[Any]:
+    return [None if math.isnan(value) else value for value in values.tolist()]
+
+
+class TelemetryRingStore:
+    def __init__(self, seconds: int, max_rate_hz: float, max_points: int = 2000) -> None:
+        self.seconds = seconds
+        self.max_points = max_points
+        self._capacity = max(1, int(seconds * max_rate_hz))
+        self._rings: Dict[str, TelemetryRing] = {}
+
+    def append(self, payload: Mapping[str, Any], source: str) -> None:
+        ring = self._rings.get(source)
+        if ring is None:
+            ring = TelemetryRing(self._capacity)
+            self._rings[source] = ring
+        ts = payload.get("ts")
+        ring.append(int(ts) if ts is not None else int(time.time() * 1000), flatten(payload))
+
+    def sources(self) -> List[str]:
+        return list(self._rings)
+
+    def snapshot(
+        self,
+        seconds: float | None = None,
+        fields: Sequence[str] | None = None,
+        source: str | None = None,
+        max_points: int | None = None,
+        now_ms: int | None = None,
+    ) -> Dict[str, Any]:
+        seconds = self.seconds if seconds is None else min(seconds, self.seconds)
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        since_ms = now_ms - int(seconds * 1000)
+        limit = max_points or self.max_points
+        fields = tuple(fields or TELEMETRY_FIELDS)
+        result: Dict[str, Any] = {}
+        for name, ring in self._rings.items():
+            if source and name != source:
+                continue
+            ts, values = ring.window(since_ms)
+            if len(ts) > limit:
+                stride = math.ceil(len(ts) / limit)
+                ts = ts[::-1][::stride][::-1]
+                values = values[:, ::-1][:, ::stride][:, ::-1]
+            columns: Dict[str, Any] = {"ts": ts.tolist()}
+            for field in fields:
+                columns[field] = _column(values[ring.fields.index(field)])
+            result[name] = columns
+        return {"type": "backfill", "seconds": seconds, "fields": list(fields), "sources": result}
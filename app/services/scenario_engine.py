@@ -1,11 +1,14 @@
-import asyncio
 import random
 import time
 from dataclasses import dataclass
-from typing import Optional
+from typing import Any, Dict, Iterator, List, Mapping, Sequence
 
-from app.services.serial_manager import SerialManager
-from app.services.telemetry_service import TelemetrySimulator
+from app.services.command_queue import CommandQueue
+from app.services.command_tracker import CommandResult
+from app.services.pid_control import PidConfig, PidControl
+from app.services.sim_clock import Clock
+from app.services.telemetry_service import TelemetryService, TelemetrySimulator
+from app.services.timeline import Setpoint, TimelineRun, TimelineScheduler, compile_timeline
 
 
 @dataclass
@@ -19,37 +22,119 @@ class RandomScenarioConfig:
 
 
 class ScenarioEngine:
-    def __init__(self, serial_manager: SerialManager, simulator: TelemetrySimulator | None) -> None:
-        self._serial = serial_manager
+    def __init__(
+        self,
+        commands: CommandQueue,
+        simulator: TelemetrySimulator | None,
+        clock: Clock | None = None,
+        seed: int | None = None,
+        student_commands: CommandQueue | None = None,
+        telemetry: TelemetryService | None = None,
+    ) -> None:
+        self._commands = commands
+        self._student_commands = student_commands
+        self._telemetry = telemetry
         self._simulator = simulator
-        self._task: Optional[asyncio.Task] = None
-        self._seq = 1
+        self._clock = clock or Clock()
+        self._rng = random.Random(seed)
+        self._pump = 0
+        self._fan = 0
+        self.scheduler = TimelineScheduler(self._clock, self._apply)
+        self.pid: PidControl | None = None
 
-    async def set_manual(self, power: int) -> None:
-        await self.stop()
-        await self._send_heater(power)
+    async def set_manual(self, power: int, wait: bool = False) -> CommandResult:
+        self._release_heater()
+        return await self._send_heater(power, wait)
 
-    async def start_random(self, config: RandomScenarioConfig) -> None:
-        await self.stop()
-        self._task = asyncio.create_task(self._random_loop(config))
+    async def start_random(self, config: RandomScenarioConfig) -> TimelineRun:
+        self._release_heater()
+        return self.scheduler.start("random", [self._random_timeline(config)], {"heater"})
+
+    def start_scenario(self, name: str, timelines: Sequence[Mapping[str, Any]]) -> TimelineRun:
+        compiled: List[List[Setpoint]] = []
+        actuators = set()
+        for timeline in timelines:
+            actuator = timeline.get("actuator", "")
+            if actuator in {"pump", "fan"} and self._student_commands is None:
+                raise ValueError(f"actuator {actuator} is not available")
+            compiled.append(compile_timeline(actuator, timeline.get("steps") or []))
+            actuators.add(actuator)
+        if "heater" in actuators:
+            self._stop_pid()
+        return self.scheduler.start(name, compiled, actuators)
+
+    def start_pid(self, config: PidConfig) -> PidControl:
+        if self._telemetry is None:
+            raise ValueError("telemetry stream is not available")
+        self._release_heater()
+        self.pid = PidControl(config, config.source or ("simulator" if self._simulator else "safety"))
+        self._telemetry.subscribe(self._on_frame)
+        return self.pid
+
+    def _stop_pid(self) -> None:
+        if self.pid and self.pid.active:
+            self.pid.active = False
+            self._telemetry.unsubscribe(self._on_frame)
+
+    def _release_heater(self) -> None:
+        self._stop_pid()
+        self.scheduler.cancel(actuator="heater")
+
+    async def _on_frame(self, payload: Dict[str, Any], source: str) -> None:
+        arrived = time.perf_counter()
+        control = self.pid
+        if control is None or not control.active:
+            return
+        power = control.sample(payload, source)
+        if power is None:
+            return
+        if self._simulator:
+            self._simulator.set_heater(power)
+        await self._commands.submit({"heater": power}, latest=True, on_sent=lambda: control.sent(arrived))
+
+    def cancel(self, run_id: int | None = None) -> List[TimelineRun]:
+        return self.scheduler.cancel(run_id)
 
     async def stop(self) -> None:
-        if self._task:
-            self._task.cancel()
-            self._task = None
+        self._stop_pid()
+        self.scheduler.cancel()
         await self._send_heater(0)
 
-    async def _random_loop(self, config: RandomScenarioConfig) -> None:
+    async def close(self) -> None:
+        self._stop_pid()
+        await self.scheduler.stop()
+
+    def _random_timeline(self, config: RandomScenarioConfig) -> Iterator[Setpoint]:
+        at = 0.0
         while True:
-            power = random.randint(config.min_power, config.max_power)
-            await self._send_heater(power)
-            await asyncio.sleep(random.uniform(config.on_min_s, config.on_max_s))
-            await self._send_heater(0)
-            await asyncio.sleep(random.uniform(config.off_min_s, config.off_max_s))
+            yield Setpoint(at, "heater", self._rng.randint(config.min_power, config.max_power))
+            at += self._rng.uniform(config.on_min_s, config.on_max_s)
+            yield Setpoint(at, "heater", 0)
+            at += self._rng.uniform(config.off_min_s, config.off_max_s)
 
-    async def _send_heater(self, power: int) -> None:
+    async def _apply(self, setpoint: Setpoint) -> None:
+        value = setpoint.value
+        if setpoint.actuator == "heater":
+            await self._send_heater(value)
+        elif setpoint.actuator == "drain_valve":
+            if self._simulator:
+                self._simulator.set_drain_valve(bool(value))
+            await self._commands.submit({"drain_valve": value})
+        else:
+            if setpoint.actuator == "pump":
+                self._pump = value
+                values: Dict[str, Any] = {"pump": value}
+            else:
+                self._fan = value
+                values = {"fan": [value] * 3}
+            if self._simulator:
+                self._simulator.set_actuators(self._pump, [self._fan] * 3)
+            await self._student_commands.submit(values)
+
+    async def _send_heater(self, power: int, wait: bool = False) -> CommandResult:
         if self._simulator:
             self._simulator.set_heater(power)
-        cmd = SerialManager.build_cmd(self._seq, {"heater": power})
-        self._seq += 1
-        await self._serial.send_command(cmd)
+        return await self._commands.submit({"heater": power}, wait)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.scheduler.stats(), "pid": self.pid.stats() if self.pid else None}
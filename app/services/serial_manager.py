@@ -1,10 +1,15 @@
 import asyncio
-import json
+import os
 import time
+from collections import deque
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
-from typing import Any, Awaitable, Callable, Dict, Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, Tuple
 
 import serial
+from serial.tools import list_ports
+
+from app.services.serial_protocol import StreamDecoder
 
 
 @dataclass
@@ -12,6 +17,30 @@ class SerialConfig:
     port: str
     baudrate: int
     name: str
+    reconnect_min_ms: int = 100
+    reconnect_max_ms: int = 1000
+    watchdog_ms: int = 1000
+
+
+def _port_identity(path: str) -> Tuple[str | None, Tuple[int, int] | None]:
+    try:
+        stat = os.stat(path)
+        node = (stat.st_rdev, stat.st_ino)
+    except OSError:
+        node = None
+    serial_number = None
+    for port in list_ports.comports():
+        if port.device == path:
+            serial_number = port.serial_number
+            break
+    return serial_number, node
+
+
+def _find_by_serial_number(serial_number: str) -> str | None:
+    for port in list_ports.comports():
+        if port.serial_number == serial_number:
+            return port.device
+    return None
 
 
 class SerialManager:
@@ -20,62 +49,306 @@ class SerialManager:
         config: SerialConfig,
         on_message: Callable[[Dict[str, Any], str], Awaitable[None]],
         sim_mode: bool,
+        on_state: Callable[[str, Dict[str, Any]], Awaitable[None]] | None = None,
     ) -> None:
         self._config = config
         self._on_message = on_message
+        self._on_state = on_state
         self._sim_mode = sim_mode
         self._serial: Optional[serial.Serial] = None
         self._task: Optional[asyncio.Task] = None
+        self._supervisor: Optional[asyncio.Task] = None
         self._lock = asyncio.Lock()
+        self._port_lock = asyncio.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._fd: Optional[int] = None
+        self._decoder = StreamDecoder()
+        self._inbox: asyncio.Queue[Dict[str, Any]] | None = None
+        self._outbox = bytearray()
+        self._writing = False
+        self._lost: asyncio.Event | None = None
+        self._resume: asyncio.Event | None = None
+        self._path = config.port
+        self._serial_number: str | None = None
+        self._node: Tuple[int, int] | None = None
+        self.mode = "off"
+        self.state = "idle"
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.connects = 0
+        self.disconnects = 0
+        self.reenumerations = 0
+        self.open_failures = 0
+        self.downtime_ms = 0.0
+        self._down_since: float | None = None
+        self.transitions: Deque[Dict[str, Any]] = deque(maxlen=20)
+
+    @property
+    def name(self) -> str:
+        return self._config.name
+
+    @property
+    def simulated(self) -> bool:
+        return self._sim_mode
+
+    @property
+    def connected(self) -> bool:
+        return self.state == "connected"
 
     async def start(self) -> None:
-        if self._sim_mode:
+        if self._sim_mode or self._supervisor:
             return
+        self._loop = asyncio.get_running_loop()
+        self._lost = asyncio.Event()
+        self._resume = asyncio.Event()
+        self._resume.set()
+        self._supervisor = asyncio.create_task(self._supervise())
+
+    async def stop(self) -> None:
+        if self._supervisor:
+            self._supervisor.cancel()
+            self._supervisor = None
+        await self._detach()
+        self._set_state("idle", "stopped")
+
+    @asynccontextmanager
+    async def released(self) -> AsyncIterator[None]:
+        if self._supervisor is None:
+            yield
+            return
+        self._resume.clear()
+        self._lost.set()
+        async with self._port_lock:
+            self._set_state("released", "released")
+            try:
+                yield
+            finally:
+                self._resume.set()
+
+    async def _supervise(self) -> None:
+        delay = self._config.reconnect_min_ms / 1000
+        while True:
+            await self._resume.wait()
+            async with self._port_lock:
+                if not self._resume.is_set():
+                    continue
+                if self.state != "disconnected":
+                    self._set_state("connecting", None)
+                port = await self._open()
+                if port is not None:
+                    delay = self._config.reconnect_min_ms / 1000
+                    self._attach(port)
+                    self._set_state("connected", self._path)
+                    reason = await self._watch()
+                    await self._detach()
+                    if self._resume.is_set():
+                        self._set_state("disconnected", reason)
+                    continue
+            self.open_failures += 1
+            self._set_state("disconnected", "open failed")
+            try:
+                await asyncio.wait_for(self._lost.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            self._lost.clear()
+            delay = min(delay * 2, self._config.reconnect_max_ms / 1000)
+
+    async def _open(self) -> serial.Serial | None:
+        path = self._config.port
+        if self._serial_number and not os.path.exists(path):
+            path = await asyncio.to_thread(_find_by_serial_number, self._serial_number) or path
         try:
-            self._serial = serial.Serial(self._config.port, self._config.baudrate, timeout=1)
-        except serial.SerialException:
-            self._serial = None
+            port = await asyncio.to_thread(
+                serial.Serial,
+                path,
+                self._config.baudrate,
+                timeout=0,
+                write_timeout=0,
+            )
+        except (serial.SerialException, OSError, ValueError):
+            return None
+        serial_number, node = await asyncio.to_thread(_port_identity, path)
+        if self._node is not None and (node != self._node or path != self._path):
+            self.reenumerations += 1
+        self._path = path
+        self._node = node
+        self._serial_number = serial_number or self._serial_number
+        return port
+
+    async def _watch(self) -> str:
+        while True:
+            if not self._resume.is_set():
+                return "released"
+            try:
+                await asyncio.wait_for(self._lost.wait(), self._config.watchdog_ms / 1000)
+                return "lost"
+            except asyncio.TimeoutError:
+                pass
+            try:
+                stat = os.stat(self._path)
+            except OSError:
+                return "device removed"
+            if self._node is not None and (stat.st_rdev, stat.st_ino) != self._node:
+                return "re-enumerated"
+
+    def _attach(self, port: serial.Serial) -> None:
+        self._serial = port
+        self._lost.clear()
+        self._decoder = StreamDecoder()
+        self._outbox.clear()
+        try:
+            fd = port.fileno()
+            self._loop.add_reader(fd, self._on_readable)
+        except (AttributeError, NotImplementedError, OSError, ValueError):
+            self._fd = None
+            port.timeout = 1
+            port.write_timeout = None
+            self.mode = "thread"
+            self._task = asyncio.create_task(self._read_loop())
             return
-        self._task = asyncio.create_task(self._read_loop())
+        self._fd = fd
+        self.mode = "fd"
+        self._inbox = asyncio.Queue()
+        self._task = asyncio.create_task(self._dispatch_loop())
 
-    async def stop(self) -> None:
+    async def _detach(self) -> None:
+        self._release_fd()
         if self._task:
             self._task.cancel()
+            self._task = None
+        self._inbox = None
+        self._writing = False
+        self.mode = "off"
         if self._serial:
-            await asyncio.to_thread(self._serial.close)
+            port = self._serial
+            await asyncio.to_thread(port.close)
+            self._serial = None
 
-    async def _read_loop(self) -> None:
-        buffer = ""
+    def _set_state(self, state: str, reason: str | None) -> None:
+        if state == self.state:
+            return
+        previous = self.state
+        self.state = state
+        if state == "connected":
+            self.connects += 1
+            if self._down_since is not None:
+                self.downtime_ms += (time.monotonic() - self._down_since) * 1000
+                self._down_since = None
+        elif previous == "connected":
+            self.disconnects += 1
+            self._down_since = time.monotonic()
+        elif state in {"connecting", "disconnected"} and self._down_since is None:
+            self._down_since = time.monotonic()
+        transition = {"ts": int(time.time() * 1000), "from": previous, "to": state, "reason": reason}
+        self.transitions.append(transition)
+        if self._on_state and state in {"connected", "disconnected", "released"}:
+            asyncio.ensure_future(self._on_state(self.name, transition))
+
+    def _release_fd(self) -> None:
+        if self._fd is None or self._loop is None:
+            return
+        self._loop.remove_reader(self._fd)
+        self._loop.remove_writer(self._fd)
+        self._fd = None
+
+    def _on_readable(self) -> None:
+        try:
+            data = os.read(self._fd, 4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._release_fd()
+            self._lost.set()
+            return
+        self._feed(data)
+
+    def _feed(self, data: bytes) -> None:
+        self.bytes_in += len(data)
+        for payload in self._decoder.feed(data):
+            self._inbox.put_nowait(payload)
+
+    async def _dispatch_loop(self) -> None:
+        inbox = self._inbox
         while True:
-            if not self._serial:
-                await asyncio.sleep(1)
-                continue
+            payload = await inbox.get()
             try:
-                data = await asyncio.to_thread(self._serial.read, 256)
-            except serial.SerialException:
-                await asyncio.sleep(1)
+                await self._on_message(payload, self._config.name)
+            except Exception:
                 continue
+
+    async def _read_loop(self) -> None:
+        port = self._serial
+        while True:
+            try:
+                data = await asyncio.to_thread(port.read, max(1, port.in_waiting))
+            except (serial.SerialException, OSError):
+                self._lost.set()
+                return
             if not data:
-                await asyncio.sleep(0.05)
                 continue
-            buffer += data.decode(errors="ignore")
-            while "\n" in buffer:
-                line, buffer = buffer.split("\n", 1)
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    payload = json.loads(line)
-                except json.JSONDecodeError:
-                    continue
+            self.bytes_in += len(data)
+            for payload in self._decoder.feed(data):
                 await self._on_message(payload, self._config.name)
 
     async def send_command(self, payload: Dict[str, Any]) -> None:
         if self._sim_mode or not self._serial:
             return
-        message = json.dumps(payload) + "\n"
-        async with self._lock:
-            await asyncio.to_thread(self._serial.write, message.encode())
+        message = self._decoder.encode_command(payload)
+        if self._fd is None:
+            async with self._lock:
+                try:
+                    await asyncio.to_thread(self._serial.write, message)
+                except (serial.SerialException, OSError):
+                    self._lost.set()
+                    return
+            self.bytes_out += len(message)
+            return
+        self._outbox += message
+        if not self._writing:
+            self._on_writable()
+
+    def _on_writable(self) -> None:
+        if self._fd is None:
+            return
+        try:
+            written = os.write(self._fd, self._outbox)
+        except BlockingIOError:
+            written = 0
+        except OSError:
+            self._outbox.clear()
+            self._lost.set()
+            written = 0
+        if written:
+            del self._outbox[:written]
+            self.bytes_out += written
+        if self._outbox and not self._writing:
+            self._loop.add_writer(self._fd, self._on_writable)
+            self._writing = True
+        elif not self._outbox and self._writing:
+            self._loop.remove_writer(self._fd)
+            self._writing = False
+
+    def stats(self) -> Dict[str, Any]:
+        downtime = self.downtime_ms
+        if self._down_since is not None:
+            downtime += (time.monotonic() - self._down_since) * 1000
+        return {
+            "port": self._path,
+            "state": self.state,
+            "mode": self.mode,
+            "connects": self.connects,
+            "disconnects": self.disconnects,
+            "reenumerations": self.reenumerations,
+            "open_failures": self.open_failures,
+            "downtime_ms": round(downtime, 1),
+            "transitions": list(self.transitions),
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "write_backlog": len(self._outbox),
+            **self._decoder.stats(),
+        }
 
     @staticmethod
     def build_cmd(seq: int, payload: Dict[str, Any]) -> Dict[str, Any]:
@@ -0,0 +1,294 @@
+import binascii
+import json
+import struct
+import time
+from typing import Any, Dict, List, Mapping
+
+PROTOCOL_JSON = "0.1"
+PROTOCOL_BINARY = "0.2"
+
+VERSION = 2
+KIND_TELEMETRY = 1
+KIND_ACK = 2
+KIND_FAULT = 3
+KIND_CMD = 16
+
+MAX_LINE_BYTES = 4096
+MAX_FRAME_BYTES = 256
+BINARY_FALLBACK_FAILURES = 8
+
+HEADER = struct.Struct("<BBHQH")
+BODY = struct.Struct("<hhhhhHBBBBBBB")
+ACK_BODY = struct.Struct("<B")
+FAULT_BODY = struct.Struct("<H")
+CRC = struct.Struct("<H")
+
+FIELDS = ("t1", "t2", "t3", "p1", "p2", "flow", "heater", "pump", "fan1", "fan2", "fan3", "fault", "drain_valve")
+SCALE = {"t1": 100, "t2": 100, "t3": 100, "p1": 1000, "p2": 1000, "flow": 100}
+
+
+class CrcError(ValueError):
+    pass
+
+
+def crc16(data: bytes) -> int:
+    return binascii.crc_hqx(data, 0xFFFF)
+
+
+def cobs_encode(data: bytes) -> bytes:
+    out = bytearray(b"\x00")
+    code_index = 0
+    code = 1
+    for byte in data:
+        if byte:
+            out.append(byte)
+            code += 1
+        if not byte or code == 0xFF:
+            out[code_index] = code
+            code_index = len(out)
+            out.append(0)
+            code = 1
+    out[code_index] = code
+    return bytes(out)
+
+
+def cobs_decode(data: bytes) -> bytes:
+    out = bytearray()
+    i = 0
+    size = len(data)
+    while i < size:
+        code = data[i]
+        end = i + code
+        if not code or end > size:
+            raise ValueError("invalid COBS block")
+        out += data[i + 1:end]
+        i = end
+        if code < 0xFF and i < size:
+            out.append(0)
+    return bytes(out)
+
+
+def _pack_values(values: Mapping[str, Any]) -> bytes:
+    mask = 0
+    numbers = []
+    for index, field in enumerate(FIELDS):
+        value = values.get(field)
+        if value is None:
+            numbers.append(0)
+            continue
+        mask |= 1 << index
+        numbers.append(round(value * SCALE[field]) if field in SCALE else int(value))
+    return struct.pack("<H", mask) + BODY.pack(*numbers)
+
+
+def encode_frame(kind: int, seq: int, ts: int, body: bytes, mask: int = 0) -> bytes:
+    raw = HEADER.pack(VERSION, kind, seq % 65536, ts, mask) + body
+    return cobs_encode(raw + CRC.pack(crc16(raw))) + b"\x00"
+
+
+def encode_values(kind: int, seq: int, ts: int, values: Mapping[str, Any]) -> bytes:
+    flat = dict(values)
+    fan = flat.get("fan")
+    if isinstance(fan, (list, tuple)):
+        for i, value in enumerate(fan[:3]):
+            flat[f"fan{i + 1}"] = value
+    packed = _pack_values(flat)
+    (mask,) = struct.unpack_from("<H", packed)
+    return encode_frame(kind, seq, ts, packed[2:], mask)
+
+
+def encode_telemetry(payload: Mapping[str, Any], seq: int = 0) -> bytes:
+    ts = payload.get("ts")
+    return encode_values(KIND_TELEMETRY, seq, int(ts if ts is not None else time.time() * 1000), payload)
+
+
+def encode_command(command: Mapping[str, Any]) -> bytes:
+    ts = command.get("ts")
+    return encode_values(
+        KIND_CMD,
+        int(command.get("seq", 0)),
+        int(ts if ts is not None else time.time() * 1000),
+        command.get("set") or {},
+    )
+
+
+def decode_frame(frame: bytes) -> Dict[str, Any]:
+    raw = cobs_decode(frame)
+    if len(raw) < HEADER.size + CRC.size:
+        raise ValueError("short frame")
+    (crc,) = CRC.unpack_from(raw, len(raw) - CRC.size)
+    raw = raw[: -CRC.size]
+    if crc16(raw) != crc:
+        raise CrcError("crc mismatch")
+    version, kind, seq, ts, mask = HEADER.unpack_from(raw)
+    if version != VERSION:
+        raise ValueError(f"unsupported version: {version}")
+    body = raw[HEADER.size:]
+    payload: Dict[str, Any] = {"ver": PROTOCOL_BINARY, "ts": ts, "seq": seq}
+    if kind in (KIND_TELEMETRY, KIND_CMD):
+        values = dict(zip(FIELDS, BODY.unpack(body)))
+        payload["type"] = "telemetry" if kind == KIND_TELEMETRY else "cmd"
+        target = payload if kind == KIND_TELEMETRY else payload.setdefault("set", {})
+        for index, field in enumerate(FIELDS):
+            if not mask & (1 << index) or field.startswith("fan"):
+                continue
+            value = values[field]
+            target[field] = value / SCALE[field] if field in SCALE else value
+        if mask & 0b11100000000:
+            target["fan"] = [values[f"fan{i}"] if mask & (1 << (7 + i)) else None for i in (1, 2, 3)]
+    elif kind == KIND_ACK:
+        (ok,) = ACK_BODY.unpack(body)
+        payload.update(type="ack", ok=bool(ok))
+    elif kind == KIND_FAULT:
+        (code,) = FAULT_BODY.unpack(body)
+        payload.update(type="fault", code=code, fault=1)
+    else:
+        raise ValueError(f"unknown frame kind: {kind}")
+    return payload
+
+
+class LineFramer:
+    def __init__(self, max_line: int = MAX_LINE_BYTES) -> None:
+        self._buffer = bytearray()
+        self._max_line = max_line
+        self.overflows = 0
+
+    def feed(self, data: bytes, delimiter: bytes = b"\n") -> List[bytes]:
+        buffer = self._buffer
+        scan = len(buffer)
+        buffer += data
+        lines: List[bytes] = []
+        start = 0
+        while True:
+            end = buffer.find(delimiter, scan)
+            if end < 0:
+                break
+            line = bytes(buffer[start:end])
+            if delimiter == b"\n":
+                line = line.strip()
+            if line:
+                lines.append(line)
+            start = scan = end + 1
+        if start:
+            del buffer[:start]
+        if len(buffer) > self._max_line:
+            self.overflows += 1
+            buffer.clear()
+        return lines
+
+    def clear(self) -> None:
+        self._buffer.clear()
+
+    def adopt(self, other: "LineFramer") -> None:
+        self._buffer[:] = other._buffer
+        other.clear()
+
+
+class StreamDecoder:
+    def __init__(self) -> None:
+        self.protocol: str | None = None
+        self._lines = LineFramer()
+        self._frames = LineFramer(MAX_FRAME_BYTES)
+        self._probe_lines = LineFramer()
+        self._probe_frames = LineFramer(MAX_FRAME_BYTES)
+        self._probing_frames = False
+        self._binary_failures = 0
+        self.frames = 0
+        self.parse_errors = 0
+        self.crc_errors = 0
+        self.resyncs = 0
+
+    @property
+    def overflows(self) -> int:
+        return self._lines.overflows + self._frames.overflows
+
+    def feed(self, data: bytes) -> List[Dict[str, Any]]:
+        if self.protocol == PROTOCOL_BINARY:
+            overflows = self._frames.overflows
+            payloads = self._decode_frames(self._frames.feed(data, b"\x00"))
+            self.resyncs += self._frames.overflows - overflows
+            if self._binary_failures >= BINARY_FALLBACK_FAILURES:
+                self._switch(PROTOCOL_JSON)
+                return payloads
+            return payloads + self._decode_lines(self._probe_lines.feed(data), probing=True)
+        payloads = self._decode_lines(self._lines.feed(data))
+        if self._probing_frames or b"\x00" in data:
+            self._probing_frames = True
+            payloads += self._decode_frames(self._probe_frames.feed(data, b"\x00"), probing=True)
+        return payloads
+
+    def _switch(self, protocol: str) -> None:
+        if self.protocol is not None:
+            self.resyncs += 1
+        self.protocol = protocol
+        self._binary_failures = 0
+        self._probing_frames = False
+        if protocol == PROTOCOL_BINARY:
+            self._frames.adopt(self._probe_frames)
+            self._lines.clear()
+        else:
+            self._lines.adopt(self._probe_lines)
+            self._frames.clear()
+            self._probe_frames.clear()
+        self._probe_lines.clear()
+
+    def _decode_lines(self, lines: List[bytes], probing: bool = False) -> List[Dict[str, Any]]:
+        payloads: List[Dict[str, Any]] = []
+        for line in lines:
+            try:
+                payload = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                payload = None
+            if not isinstance(payload, dict):
+                if not probing:
+                    self.parse_errors += 1
+                continue
+            if probing:
+                self._switch(PROTOCOL_JSON)
+                probing = False
+            elif self._probing_frames:
+                self._probing_frames = False
+                self._probe_frames.clear()
+            self.protocol = PROTOCOL_JSON
+            self.frames += 1
+            payloads.append(payload)
+        return payloads
+
+    def _decode_frames(self, frames: List[bytes], probing: bool = False) -> List[Dict[str, Any]]:
+        payloads: List[Dict[str, Any]] = []
+        for frame in frames:
+            try:
+                payload = decode_frame(frame)
+            except CrcError:
+                if not probing:
+                    self.crc_errors += 1
+            except (ValueError, struct.error):
+                if not probing:
+                    self.parse_errors += 1
+            else:
+                if probing:
+                    self._switch(PROTOCOL_BINARY)
+                    probing = False
+                self._binary_failures = 0
+                self.frames += 1
+                payloads.append(payload)
+                continue
+            if not probing:
+                self.resyncs += 1
+                self._binary_failures += 1
+        return payloads
+
+    def encode_command(self, command: Mapping[str, Any]) -> bytes:
+        if self.protocol == PROTOCOL_BINARY:
+            return encode_command(command)
+        return (json.dumps(command) + "\n").encode()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "protocol": self.protocol,
+            "frames": self.frames,
+            "parse_errors": self.parse_errors,
+            "crc_errors": self.crc_errors,
+            "resyncs": self.resyncs,
+            "overflows": self.overflows,
+        }
@@ -0,0 +1,134 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, Dict, List, Set, Tuple
+
+SETTLE_SPINS = 100
+SETTLE_TIMEOUT_S = 1.0
+
+
+class Clock:
+    virtual = False
+    warp = 1.0
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def time(self) -> float:
+        return time.time()
+
+    async def sleep(self, seconds: float) -> None:
+        await asyncio.sleep(seconds)
+
+    async def stop(self) -> None:
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"virtual": False, "warp": 1.0}
+
+
+class VirtualClock(Clock):
+    virtual = True
+
+    def __init__(self, warp: float = 0.0, start: float | None = None) -> None:
+        self.warp = warp
+        self._epoch = time.time() if start is None else start
+        self._now = 0.0
+        self._sleepers: List[Tuple[float, int, asyncio.Future, asyncio.Task | None]] = []
+        self._order = itertools.count()
+        self._sleeping: Set[asyncio.Task] = set()
+        self._woken: List[asyncio.Task] = []
+        self._changed: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self.advances = 0
+        self.settle_timeouts = 0
+
+    def monotonic(self) -> float:
+        return self._now
+
+    def time(self) -> float:
+        return self._epoch + self._now
+
+    async def sleep(self, seconds: float) -> None:
+        loop = asyncio.get_running_loop()
+        if self._task is None:
+            self._changed = asyncio.Event()
+            self._task = loop.create_task(self._run())
+        task = asyncio.current_task()
+        future = loop.create_future()
+        heapq.heappush(self._sleepers, (self._now + max(0.0, seconds), next(self._order), future, task))
+        if task is not None:
+            self._sleeping.add(task)
+        self._changed.set()
+        try:
+            await future
+        finally:
+            self._sleeping.discard(task)
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        while self._sleepers:
+            future = heapq.heappop(self._sleepers)[2]
+            if not future.done():
+                future.cancel()
+
+    async def _settle(self) -> None:
+        spins = 0
+        started = time.monotonic()
+        while True:
+            await asyncio.sleep(0 if spins < SETTLE_SPINS else 0.001)
+            spins += 1
+            busy = [task for task in self._woken if not task.done() and task not in self._sleeping]
+            if not busy:
+                break
+            if time.monotonic() - started > SETTLE_TIMEOUT_S:
+                self.settle_timeouts += 1
+                break
+        self._woken = []
+
+    async def _run(self) -> None:
+        real_anchor = time.monotonic()
+        virtual_anchor = self._now
+        while True:
+            await self._settle()
+            while self._sleepers and self._sleepers[0][2].done():
+                heapq.heappop(self._sleepers)
+            if not self._sleepers:
+                self._changed.clear()
+                await self._changed.wait()
+                real_anchor = time.monotonic()
+                virtual_anchor = self._now
+                continue
+            deadline = self._sleepers[0][0]
+            if self.warp > 0:
+                delay = real_anchor + (deadline - virtual_anchor) / self.warp - time.monotonic()
+                if delay > 0:
+                    self._changed.clear()
+                    try:
+                        await asyncio.wait_for(self._changed.wait(), delay)
+                        continue
+                    except asyncio.TimeoutError:
+                        pass
+            self._now = max(self._now, deadline)
+            self.advances += 1
+            while self._sleepers and self._sleepers[0][0] <= self._now:
+                _, _, future, task = heapq.heappop(self._sleepers)
+                if future.done():
+                    continue
+                future.set_result(None)
+                if task is not None:
+                    self._sleeping.discard(task)
+                    self._woken.append(task)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "virtual": True,
+            "warp": self.warp,
+            "now_s": round(self._now, 6),
+            "advances": self.advances,
+            "sleepers": len(self._sleepers),
+            "settle_timeouts": self.settle_timeouts,
+        }
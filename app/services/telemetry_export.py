@@ -0,0 +1,201 @@
+import asyncio
+import csv
+import io
+import shutil
+import tempfile
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from app.services.db import TELEMETRY_FIELDS, Database
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+REAL_FIELDS = {"t1", "t2", "t3", "p1", "p2", "flow"}
+
+FORMATS = {
+    "npz": ("application/octet-stream", "npz"),
+    "csv": ("text/csv", "csv"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+@dataclass
+class ExportQuery:
+    start_ms: int
+    end_ms: int
+    fields: Sequence[str] = TELEMETRY_FIELDS
+    source_device: str | None = None
+
+    @property
+    def columns(self) -> Tuple[str, ...]:
+        return ("ts",) + tuple(self.fields) + ("source_device",)
+
+
+class _ChunkSink(io.RawIOBase):
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _column_dtype(column: str) -> np.dtype:
+    if column == "ts":
+        return np.dtype("<i8")
+    if column == "source_device":
+        return np.dtype("<i2")
+    if column in REAL_FIELDS:
+        return np.dtype("<f8")
+    return np.dtype("<f4")
+
+
+class TelemetryExporter:
+    def __init__(self, db: Database, chunk_rows: int = 20000) -> None:
+        self._db = db
+        self._chunk_rows = chunk_rows
+
+    @staticmethod
+    def available_formats() -> List[str]:
+        if pa is None:
+            return ["npz", "csv"]
+        return list(FORMATS)
+
+    def _sql(self, query: ExportQuery) -> Tuple[str, List[Any]]:
+        where = "ts >= ? AND ts < ?"
+        params: List[Any] = [query.start_ms, query.end_ms]
+        if query.source_device:
+            where += " AND source_device = ?"
+            params.append(query.source_device)
+        sql = f"SELECT {', '.join(query.columns)} FROM telemetry WHERE {where} ORDER BY ts"
+        return sql, params
+
+    async def _chunks(self, query: ExportQuery) -> AsyncIterator[List[Tuple[Any, ...]]]:
+        sql, params = self._sql(query)
+        async for rows in self._db.iter_query(sql, params, chunk_size=self._chunk_rows, label="export"):
+            yield rows
+
+    def stream(self, query: ExportQuery, fmt: str) -> AsyncIterator[bytes]:
+        if fmt not in self.available_formats():
+            raise ValueError(f"unsupported export format: {fmt}")
+        if fmt == "csv":
+            return self._stream_csv(query)
+        if fmt == "npz":
+            return self._stream_npz(query)
+        return self._stream_arrow(query, parquet=fmt == "parquet")
+
+    async def _stream_csv(self, query: ExportQuery) -> AsyncIterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(query.columns)
+        yield buffer.getvalue().encode()
+        async for rows in self._chunks(query):
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(rows)
+            yield buffer.getvalue().encode()
+
+    async def _stream_npz(self, query: ExportQuery) -> AsyncIterator[bytes]:
+        workdir = Path(tempfile.mkdtemp(prefix="export-"))
+        try:
+            labels: Dict[str, int] = {}
+            columns = query.columns
+            handles = {column: (workdir / f"{column}.bin").open("wb") for column in columns}
+            count = 0
+            try:
+                async for rows in self._chunks(query):
+                    await asyncio.to_thread(self._spill_chunk, columns, rows, handles, labels)
+                    count += len(rows)
+            finally:
+                for handle in handles.values():
+                    handle.close()
+            archive = workdir / "export.npz"
+            await asyncio.to_thread(self._write_npz, columns, workdir, archive, count, labels)
+            with archive.open("rb") as handle:
+                while True:
+                    data = await asyncio.to_thread(handle.read, 1 << 20)
+                    if not data:
+                        break
+                    yield data
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    @staticmethod
+    def _spill_chunk(
+        columns: Sequence[str],
+        rows: List[Tuple[Any, ...]],
+        handles: Dict[str, Any],
+        labels: Dict[str, int],
+    ) -> None:
+        for name, values in zip(columns, zip(*rows)):
+            if name == "source_device":
+                values = [labels.setdefault(value or "", len(labels)) for value in values]
+            np.asarray(values, dtype=_column_dtype(name)).tofile(handles[name])
+
+    @staticmethod
+    def _write_npz(
+        columns: Sequence[str],
+        workdir: Path,
+        archive: Path,
+        count: int,
+        labels: Dict[str, int],
+    ) -> None:
+        with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_STORED) as zf:
+            for name in columns:
+                header = {
+                    "descr": np.lib.format.dtype_to_descr(_column_dtype(name)),
+                    "fortran_order": False,
+                    "shape": (count,),
+                }
+                with zf.open(f"{name}.npy", "w", force_zip64=True) as member:
+                    np.lib.format.write_array_header_2_0(member, header)
+                    with (workdir / f"{name}.bin").open("rb") as spill:
+                        shutil.copyfileobj(spill, member, 1 << 20)
+            ordered = sorted(labels, key=labels.__getitem__)
+            with zf.open("source_device_labels.npy", "w") as member:
+                np.lib.format.write_array(member, np.array(ordered, dtype=str))
+
+    async def _stream_arrow(self, query: ExportQuery, parquet: bool) -> AsyncIterator[bytes]:
+        schema = pa.schema(
+            [("ts", pa.int64())]
+            + [(field, pa.float64() if field in REAL_FIELDS else pa.int32()) for field in query.fields]
+            + [("source_device", pa.dictionary(pa.int32(), pa.string()))]
+        )
+        sink = _ChunkSink()
+        if parquet:
+            writer = pq.ParquetWriter(sink, schema, compression="zstd")
+        else:
+            writer = pa_ipc.new_stream(sink, schema)
+        try:
+            async for rows in self._chunks(query):
+                columns = list(zip(*rows))
+                batch = pa.record_batch(
+                    [pa.array(values, type=schema.field(i).type) for i, values in enumerate(columns[:-1])]
+                    + [pa.array(columns[-1], type=pa.string()).dictionary_encode()],
+                    schema=schema,
+                )
+                await asyncio.to_thread(writer.write_batch, batch)
+                data = sink.drain()
+                if data:
+                    yield data
+        finally:
+            writer.close()
+        yield sink.drain()
@@ -0,0 +1,146 @@
+import csv
+import io
+import json
+import math
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+from app.services.db import AGGREGATE_TIERS, TELEMETRY_FIELDS, Database
+
+
+@dataclass
+class HistoryQuery:
+    start_ms: int
+    end_ms: int
+    fields: List[str]
+    max_points: int
+    source_device: str | None = None
+
+    @property
+    def bucket_ms(self) -> int:
+        span = max(1, self.end_ms - self.start_ms)
+        return max(1, math.ceil(span / max(1, self.max_points)))
+
+
+class TelemetryHistory:
+    def __init__(self, db: Database) -> None:
+        self._db = db
+
+    @staticmethod
+    def validate_fields(fields: List[str]) -> List[str]:
+        unknown = [field for field in fields if field not in TELEMETRY_FIELDS]
+        if unknown:
+            raise ValueError(f"unknown fields: {', '.join(unknown)}")
+        return fields or list(TELEMETRY_FIELDS)
+
+    async def plan(self, query: HistoryQuery) -> List[Tuple[str, int, int]]:
+        marks: Dict[str, int] = {}
+        async for rows in self._db.iter_query(
+            "SELECT tier, watermark FROM compaction_state",
+            label="history_plan",
+        ):
+            marks.update(rows)
+        tables = [table for table, _ in AGGREGATE_TIERS] + ["telemetry"]
+        floors: Dict[str, float] = {}
+        async for rows in self._db.iter_query(
+            " UNION ALL ".join(f"SELECT '{table}', MIN(ts) FROM {table}" for table in tables),
+            label="history_plan",
+        ):
+            floors.update((table, floor) for table, floor in rows if floor is not None)
+        if floors:
+            earliest = min(floors.values())
+            floors = {table: -math.inf if floor == earliest else floor for table, floor in floors.items()}
+        tiers = [(table, resolution, floors.get(table), marks.get(table)) for table, resolution in AGGREGATE_TIERS]
+        tiers.append(("telemetry", 0, floors.get("telemetry"), None))
+        points = {query.start_ms, query.end_ms}
+        for _, _, floor, mark in tiers:
+            points.update(
+                point for point in (floor, mark) if point is not None and query.start_ms < point < query.end_ms
+            )
+        bounds = sorted(points)
+        segments: List[Tuple[str, int, int]] = []
+        for lower, upper in zip(bounds, bounds[1:]):
+            table = self._tier_at(tiers, lower, query.bucket_ms)
+            if segments and segments[-1][0] == table:
+                segments[-1] = (table, segments[-1][1], upper)
+            else:
+                segments.append((table, lower, upper))
+        return segments
+
+    @staticmethod
+    def _tier_at(tiers: List[Tuple[str, int, float | None, int | None]], ts: int, bucket_ms: int) -> str:
+        covering = [
+            (table, resolution)
+            for table, resolution, floor, mark in tiers
+            if floor is not None and floor <= ts and (mark is None or ts < mark)
+        ]
+        for table, resolution in covering:
+            if resolution <= bucket_ms:
+                return table
+        return covering[-1][0] if covering else "telemetry"
+
+    async def build_sql(self, query: HistoryQuery) -> Tuple[List[str], str, List[Any]]:
+        columns = ["ts", "source_device", "n"]
+        select = ["MIN(ts)", "source_device", "SUM(n)"]
+        for field in query.fields:
+            columns.extend([field, f"{field}_min", f"{field}_max"])
+            select.extend(
+                [
+                    f"SUM({field}_avg * n) * 1.0 / SUM(CASE WHEN {field}_avg IS NOT NULL THEN n END)",
+                    f"MIN({field}_min)",
+                    f"MAX({field}_max)",
+                ]
+            )
+        sources = []
+        params: List[Any] = []
+        for table, lower, upper in await self.plan(query):
+            if table == "telemetry":
+                parts = ["ts", "source_device", "1 AS n"]
+                for field in query.fields:
+                    parts.append(f"{field} AS {field}_min, {field} AS {field}_max, {field} AS {field}_avg")
+            else:
+                parts = ["ts", "source_device", "n"]
+                for field in query.fields:
+                    parts.append(f"{field}_min, {field}_max, {field}_avg")
+            where = "ts >= ? AND ts < ?"
+            params.extend([lower, upper])
+            if query.source_device:
+                where += " AND source_device = ?"
+                params.append(query.source_device)
+            sources.append(f"SELECT {', '.join(parts)} FROM {table} WHERE {where}")
+        sql = (
+            f"SELECT {', '.join(select)} FROM ({' UNION ALL '.join(sources)}) "
+            "GROUP BY (ts - ?) / ?, source_device "
+            "ORDER BY 1, source_device"
+        )
+        params.extend([query.start_ms, query.bucket_ms])
+        return columns, sql, params
+
+    async def stream_json(self, query: HistoryQuery) -> AsyncIterator[str]:
+        columns, sql, params = await self.build_sql(query)
+        header = {
+            "from": query.start_ms,
+            "to": query.end_ms,
+            "bucket_ms": query.bucket_ms,
+            "columns": columns,
+        }
+        yield json.dumps(header)[:-1] + ', "points": ['
+        first = True
+        async for rows in self._db.iter_query(sql, params, label="history"):
+            parts = [json.dumps(dict(zip(columns, row))) for row in rows]
+            chunk = ",".join(parts)
+            yield chunk if first else "," + chunk
+            first = False
+        yield "]}"
+
+    async def stream_csv(self, query: HistoryQuery) -> AsyncIterator[str]:
+        columns, sql, params = await self.build_sql(query)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        yield buffer.getvalue()
+        async for rows in self._db.iter_query(sql, params, label="history"):
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(rows)
+            yield buffer.getvalue()
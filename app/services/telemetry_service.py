@@ -1,37 +1,192 @@
 import asyncio
-import math
-import random
 import time
-from typing import Any, Dict, Set
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+import numpy as np
 
 from fastapi import WebSocket
 
 from app.services.db import Database, TelemetryRecord
+from app.services.decimation import RateTier
+from app.services.ingest_pipeline import LatencyStats, PipelineStage, StageConfig
+from app.services.latest_state import LatestState
+from app.services.ring_buffer import TelemetryRingStore
+from app.services.sim_clock import Clock
+from app.services.ws_clients import ChannelConfig, ClientChannel, SubscriptionGroup
+from app.services.ws_protocol import Subscription, encode_json
 
 
 class TelemetryService:
-    def __init__(self, db: Database) -> None:
+    def __init__(
+        self,
+        db: Database,
+        channel_config: ChannelConfig | None = None,
+        ring: TelemetryRingStore | None = None,
+        broadcast_stage: StageConfig | None = None,
+        persist_stage: StageConfig | None = None,
+    ) -> None:
         self._db = db
+        self._ring = ring
+        self._broadcast_stage: PipelineStage[Tuple[Dict[str, Any], str]] = PipelineStage(
+            "broadcast",
+            self._broadcast_item,
+            broadcast_stage or StageConfig(maxsize=1024, overflow="drop_oldest"),
+        )
+        self._persist_stage: PipelineStage[Tuple[Dict[str, Any], str]] = PipelineStage(
+            "persist",
+            self._persist_item,
+            persist_stage or StageConfig(maxsize=8192, overflow="drop_newest"),
+        )
         self._latest: Dict[str, Any] | None = None
-        self._clients: Set[WebSocket] = set()
-        self._lock = asyncio.Lock()
+        self._state = LatestState()
+        self._subscribers: List[Callable[[Dict[str, Any], str], Awaitable[None]]] = []
+        self._latest_by_source: Dict[str, Dict[str, Any]] = {}
+        self._channel_config = channel_config or ChannelConfig()
+        self._clients: Dict[WebSocket, ClientChannel] = {}
+        self._groups: Dict[Subscription, SubscriptionGroup] = {}
+        self._tiers: Dict[Tuple[float, str], RateTier] = {}
+        self._frames = 0
+        self._dropped_closed = 0
+        self._slow_disconnects = 0
 
     def latest(self) -> Dict[str, Any] | None:
         return self._latest
 
-    async def register(self, websocket: WebSocket) -> None:
+    @property
+    def state(self) -> LatestState:
+        return self._state
+
+    @property
+    def ring(self) -> TelemetryRingStore | None:
+        return self._ring
+
+    async def register(
+        self,
+        websocket: WebSocket,
+        subscription: Subscription | None = None,
+        backfill_s: float = 0,
+    ) -> None:
         await websocket.accept()
-        async with self._lock:
-            self._clients.add(websocket)
-        if self._latest:
-            await websocket.send_json(self._latest)
+        subscription = subscription or Subscription()
+        channel = ClientChannel(websocket, self._channel_config, self._on_channel_closed, subscription)
+        self._clients[websocket] = channel
+        channel.start()
+        self._attach(channel)
+        self._send_backfill(channel, backfill_s)
+
+    async def resubscribe(
+        self,
+        websocket: WebSocket,
+        subscription: Subscription,
+        backfill_s: float = 0,
+    ) -> None:
+        channel = self._clients.get(websocket)
+        if channel is None:
+            return
+        if channel.subscription != subscription:
+            self._detach(channel)
+            channel.subscription = subscription
+            self._attach(channel)
+        self._send_backfill(channel, backfill_s)
+
+    def _send_backfill(self, channel: ClientChannel, backfill_s: float) -> None:
+        if self._ring is None or backfill_s <= 0:
+            return
+        fields = channel.subscription.fields or None
+        channel.offer(encode_json(self._ring.snapshot(seconds=backfill_s, fields=fields)))
+
+    def send_control(self, websocket: WebSocket, message: Dict[str, Any]) -> None:
+        channel = self._clients.get(websocket)
+        if channel:
+            channel.offer(encode_json(message))
+
+    def broadcast_control(self, message: Dict[str, Any]) -> None:
+        encoded = encode_json(message)
+        for channel in self._clients.values():
+            channel.offer(encoded)
 
     async def unregister(self, websocket: WebSocket) -> None:
-        async with self._lock:
-            self._clients.discard(websocket)
+        channel = self._clients.get(websocket)
+        if channel:
+            await channel.close()
 
-    async def update(self, payload: Dict[str, Any], source_device: str) -> None:
+    def subscribe(self, callback: Callable[[Dict[str, Any], str], Awaitable[None]]) -> None:
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[Dict[str, Any], str], Awaitable[None]]) -> None:
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    async def start(self) -> None:
+        self._broadcast_stage.start()
+        self._persist_stage.start()
+
+    async def stop(self) -> None:
+        await self._broadcast_stage.stop()
+        await self._persist_stage.stop()
+        for channel in list(self._clients.values()):
+            await channel.close()
+
+    def _attach(self, channel: ClientChannel) -> None:
+        subscription = channel.subscription
+        tier = self._tiers.get(subscription.tier)
+        if tier is None:
+            tier = RateTier(*subscription.tier)
+            self._tiers[subscription.tier] = tier
+        group = self._groups.get(subscription)
+        if group is None:
+            group = SubscriptionGroup(subscription, self._channel_config.keyframe_interval)
+            self._groups[subscription] = group
+            tier.groups.add(group)
+        latest = tier.latest_by_source if tier.rate > 0 else self._latest_by_source
+        group.join(channel, latest)
+        if subscription.is_default and self._latest:
+            channel.offer(encode_json(self._latest))
+
+    def _detach(self, channel: ClientChannel) -> None:
+        subscription = channel.subscription
+        group = self._groups.get(subscription)
+        if group is None:
+            return
+        group.channels.discard(channel)
+        if group.channels:
+            return
+        del self._groups[subscription]
+        tier = self._tiers.get(subscription.tier)
+        if tier:
+            tier.groups.discard(group)
+            if not tier.groups:
+                del self._tiers[subscription.tier]
+
+    async def _on_channel_closed(self, channel: ClientChannel) -> None:
+        if self._clients.pop(channel.websocket, None) is None:
+            return
+        self._dropped_closed += channel.dropped
+        if channel.dropped and self._channel_config.slow_client_policy == "disconnect":
+            self._slow_disconnects += 1
+        self._detach(channel)
+
+    async def update(self, payload: Dict[str, Any], source_device: str, persist: bool = True) -> None:
+        payload = {**payload, "source": source_device}
         self._latest = payload
+        self._state.update(payload, source_device)
+        for callback in list(self._subscribers):
+            try:
+                await callback(payload, source_device)
+            except Exception:
+                continue
+        if self._ring is not None:
+            self._ring.append(payload, source_device)
+        await self._broadcast_stage.put((payload, source_device))
+        if persist:
+            await self._persist_stage.put((payload, source_device))
+
+    async def _broadcast_item(self, item: Tuple[Dict[str, Any], str]) -> None:
+        await self._broadcast(*item)
+
+    async def _persist_item(self, item: Tuple[Dict[str, Any], str]) -> None:
+        payload, source_device = item
         fan_values = payload.get("fan") or []
         fan1 = fan_values[0] if len(fan_values) > 0 else None
         fan2 = fan_values[1] if len(fan_values) > 1 else None
@@ -55,85 +210,201 @@ class TelemetryService:
                 source_device=source_device,
             )
         )
-        await self._broadcast(payload)
 
-    async def _broadcast(self, payload: Dict[str, Any]) -> None:
-        async with self._lock:
-            clients = list(self._clients)
-        if not clients:
-            return
-        for ws in clients:
-            try:
-                await ws.send_json(payload)
-            except Exception:
-                await self.unregister(ws)
+    async def _broadcast(self, payload: Dict[str, Any], source_device: str = "") -> None:
+        self._frames += 1
+        self._latest_by_source[source_device] = payload
+        for tier in list(self._tiers.values()):
+            output = tier.push(payload, source_device)
+            if output is None:
+                continue
+            for group in list(tier.groups):
+                group.publish(output, source_device)
+
+    def stats(self) -> Dict[str, Any]:
+        channels = list(self._clients.values())
+        depths = [channel.depth for channel in channels]
+        return {
+            "clients": len(channels),
+            "frames": self._frames,
+            "queue_depth_max": max(depths, default=0),
+            "queue_depth_total": sum(depths),
+            "dropped_frames": self._dropped_closed + sum(channel.dropped for channel in channels),
+            "slow_disconnects": self._slow_disconnects,
+            "policy": self._channel_config.slow_client_policy,
+            "subscription_groups": len(self._groups),
+            "rate_tiers": [tier.stats() for tier in self._tiers.values()],
+            "pipeline": {
+                "broadcast": self._broadcast_stage.stats(),
+                "persist": self._persist_stage.stats(),
+            },
+        }
 
 
 class TelemetrySimulator:
-    def __init__(self, telemetry: TelemetryService) -> None:
+    def __init__(
+        self,
+        telemetry: TelemetryService,
+        stands: int = 1,
+        rate_hz: float = 5.0,
+        seed: int | None = None,
+        clock: Clock | None = None,
+        physics_hz: float | None = None,
+    ) -> None:
         self._telemetry = telemetry
         self._task: asyncio.Task | None = None
-        self._heater = 0
-        self._pump = 0
-        self._fan = [0, 0, 0]
-        self._t1 = 23.0
-        self._t2 = 25.0
-        self._t3 = 24.0
-        self._p1 = 1.0
-        self._p2 = 1.0
-        self._flow = 2.0
-        self._phase = 0.0
-        self._drain_valve = 0
-
-    def set_heater(self, power: int) -> None:
-        self._heater = max(0, min(100, int(power)))
-
-    def set_actuators(self, pump: int, fan: list[int]) -> None:
-        self._pump = max(0, min(255, int(pump)))
-        self._fan = [max(0, min(255, int(v))) for v in fan]
-
-    def set_drain_valve(self, open_state: bool) -> None:
-        self._drain_valve = 1 if open_state else 0
+        self._clock = clock or Clock()
+        self.stands = max(1, stands)
+        self.rate_hz = rate_hz
+        self.physics_hz = physics_hz or rate_hz
+        self._rng = np.random.default_rng(seed)
+        n = self.stands
+        self._heater = np.zeros(n, dtype=np.int64)
+        self._pump = np.zeros(n, dtype=np.int64)
+        self._fan = np.zeros((n, 3), dtype=np.int64)
+        self._drain_valve = np.zeros(n, dtype=np.int64)
+        self._t1 = np.full(n, 23.0)
+        self._t2 = np.full(n, 25.0)
+        self._t3 = np.full(n, 24.0)
+        self._p1 = np.ones(n)
+        self._p2 = np.ones(n)
+        self._flow = np.full(n, 2.0)
+        self._phase = np.zeros(n)
+        self._sources = ["simulator"] + [f"simulator-{i}" for i in range(1, n)]
+        self._tick = LatencyStats()
+        self._step = LatencyStats()
+        self._emit = LatencyStats()
+        self.ticks = 0
+        self.physics_steps = 0
+        self.overruns = 0
+        self.skipped = 0
+
+    def set_heater(self, power: int, stand: int = 0) -> None:
+        self._heater[stand] = max(0, min(100, int(power)))
+
+    def set_actuators(self, pump: int, fan: list[int], stand: int = 0) -> None:
+        self._pump[stand] = max(0, min(255, int(pump)))
+        self._fan[stand] = [max(0, min(255, int(v))) for v in fan]
+
+    def set_drain_valve(self, open_state: bool, stand: int = 0) -> None:
+        self._drain_valve[stand] = 1 if open_state else 0
 
     async def start(self) -> None:
         if self._task:
             return
         self._task = asyncio.create_task(self._loop())
 
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def step(self, dt: float) -> None:
+        k = dt / 0.2
+        self._phase += dt
+        heater_effect = (self._heater / 100.0) * 0.3
+        cooling = (self._pump / 255.0) * 0.2 + (self._fan.sum(axis=1) / 765.0) * 0.2
+        ambient = 23.0 + np.sin(self._phase / 10) * 0.4
+        self._t1 += (heater_effect - cooling * 0.8) * k
+        self._t2 += (heater_effect * 0.6 - cooling) * k
+        np.clip(self._t1, 18.0, 80.0, out=self._t1)
+        np.clip(self._t2, 18.0, 85.0, out=self._t2)
+        self._t1 += (ambient - self._t1) * 0.02 * k
+        self._t2 += (ambient - self._t2) * 0.01 * k
+        n = self.stands
+        self._t3 = (self._t1 + self._t2) / 2.0 + self._rng.uniform(-0.3, 0.3, n)
+        self._p1 = 1.0 + self._rng.uniform(-0.05, 0.05, n)
+        self._p2 = 1.0 + self._rng.uniform(-0.05, 0.05, n)
+        self._flow = 2.0 + (self._pump / 255.0) * 3.0 + self._rng.uniform(-0.2, 0.2, n)
+
+    def frames(self, ts: int) -> List[Tuple[Dict[str, Any], str]]:
+        columns = zip(
+            np.round(self._t1, 2).tolist(),
+            np.round(self._t2, 2).tolist(),
+            np.round(self._t3, 2).tolist(),
+            np.round(self._p1, 2).tolist(),
+            np.round(self._p2, 2).tolist(),
+            np.round(self._flow, 2).tolist(),
+            self._heater.tolist(),
+            self._pump.tolist(),
+            self._fan.tolist(),
+            self._drain_valve.tolist(),
+            self._sources,
+        )
+        return [
+            (
+                {
+                    "type": "telemetry",
+                    "ver": "0.1",
+                    "ts": ts,
+                    "t1": t1,
+                    "t2": t2,
+                    "t3": t3,
+                    "p1": p1,
+                    "p2": p2,
+                    "flow": flow,
+                    "heater": heater,
+                    "pump": pump,
+                    "fan": fan,
+                    "drain_valve": drain_valve,
+                    "fault": 0,
+                },
+                source,
+            )
+            for t1, t2, t3, p1, p2, flow, heater, pump, fan, drain_valve, source in columns
+        ]
+
+    def advance(self, elapsed_s: float) -> int:
+        target = int(elapsed_s * self.physics_hz + 1e-9)
+        steps = target - self.physics_steps
+        dt = 1.0 / self.physics_hz
+        for _ in range(steps):
+            self.step(dt)
+        self.physics_steps = max(target, self.physics_steps)
+        return max(0, steps)
+
     async def _loop(self) -> None:
+        clock = self._clock
+        interval = 1.0 / self.rate_hz
+        origin = clock.monotonic()
+        scheduled = 0
+        self.physics_steps = 0
         while True:
-            self._phase += 0.2
-            heater_effect = (self._heater / 100.0) * 0.3
-            pump_cool = (self._pump / 255.0) * 0.2
-            fan_cool = (sum(self._fan) / 765.0) * 0.2
-            ambient = 23.0 + math.sin(self._phase / 10) * 0.4
-            self._t1 += heater_effect - (pump_cool + fan_cool) * 0.8
-            self._t2 += heater_effect * 0.6 - (pump_cool + fan_cool)
-            self._t1 = max(18.0, min(80.0, self._t1))
-            self._t2 = max(18.0, min(85.0, self._t2))
-            self._t1 += (ambient - self._t1) * 0.02
-            self._t2 += (ambient - self._t2) * 0.01
-            self._t3 = ((self._t1 + self._t2) / 2.0) + random.uniform(-0.3, 0.3)
-
-            self._p1 = 1.0 + random.uniform(-0.05, 0.05)
-            self._p2 = 1.0 + random.uniform(-0.05, 0.05)
-            self._flow = 2.0 + (self._pump / 255.0) * 3.0 + random.uniform(-0.2, 0.2)
-
-            payload = {
-                "type": "telemetry",
-                "ver": "0.1",
-                "ts": int(time.time() * 1000),
-                "t1": round(self._t1, 2),
-                "t2": round(self._t2, 2),
-                "t3": round(self._t3, 2),
-                "p1": round(self._p1, 2),
-                "p2": round(self._p2, 2),
-                "flow": round(self._flow, 2),
-                "heater": self._heater,
-                "pump": self._pump,
-                "fan": self._fan,
-                "drain_valve": self._drain_valve,
-                "fault": 0,
-            }
-            await self._telemetry.update(payload, "simulator")
-            await asyncio.sleep(0.2)
+            started = time.perf_counter()
+            self.advance(scheduled * interval)
+            stepped = time.perf_counter()
+            for payload, source in self.frames(int(clock.time() * 1000)):
+                await self._telemetry.update(payload, source)
+            finished = time.perf_counter()
+            self.ticks += 1
+            self._step.add((stepped - started) * 1000)
+            self._emit.add((finished - stepped) * 1000)
+            self._tick.add((finished - started) * 1000)
+            scheduled += 1
+            now = clock.monotonic()
+            deadline = origin + scheduled * interval
+            if now > deadline:
+                self.overruns += 1
+                missed = int((now - deadline) / interval)
+                self.skipped += missed
+                scheduled += missed
+            await clock.sleep(max(0.0, origin + scheduled * interval - now))
+
+    def stats(self) -> Dict[str, Any]:
+        budget_ms = 1000.0 / self.rate_hz
+        return {
+            "stands": self.stands,
+            "rate_hz": self.rate_hz,
+            "physics_hz": self.physics_hz,
+            "physics_steps": self.physics_steps,
+            "budget_ms": round(budget_ms, 3),
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "skipped_ticks": self.skipped,
+            "budget_used_avg": round(self._tick.total_ms / self._tick.count / budget_ms, 4) if self._tick.count else 0.0,
+            "budget_used_max": round(self._tick.max_ms / budget_ms, 4),
+            "tick": self._tick.as_dict(),
+            "step": self._step.as_dict(),
+            "emit": self._emit.as_dict(),
+            "clock": self._clock.stats(),
+        }
@@ -0,0 +1,211 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, Iterator, List, Mapping, Sequence, Tuple
+
+from app.services.ingest_pipeline import LatencyStats
+from app.services.sim_clock import Clock
+
+ACTUATOR_LIMITS = {"heater": (0, 100), "pump": (0, 255), "fan": (0, 255), "drain_valve": (0, 1)}
+
+
+@dataclass(frozen=True)
+class Setpoint:
+    at: float
+    actuator: str
+    value: int
+
+
+def _clamp(actuator: str, value: float) -> int:
+    low, high = ACTUATOR_LIMITS[actuator]
+    return max(low, min(high, int(round(value))))
+
+
+def compile_timeline(actuator: str, steps: Sequence[Mapping[str, Any]]) -> List[Setpoint]:
+    if actuator not in ACTUATOR_LIMITS:
+        raise ValueError(f"unknown actuator: {actuator}")
+    points: List[Setpoint] = []
+    current = 0.0
+    for step in sorted(steps, key=lambda item: float(item.get("at", 0))):
+        at = float(step.get("at", 0))
+        if at < 0:
+            raise ValueError("step time must be >= 0")
+        if step.get("value") is not None:
+            current = float(step["value"])
+            points.append(Setpoint(at, actuator, _clamp(actuator, current)))
+        if step.get("ramp_to") is None:
+            continue
+        start = current
+        target = float(step["ramp_to"])
+        duration = float(step.get("duration") or 0)
+        every = float(step.get("every") or 1)
+        if duration < 0 or every <= 0:
+            raise ValueError("ramp duration must be >= 0 and every > 0")
+        count = max(1, math.ceil(duration / every - 1e-9))
+        for index in range(1, count + 1):
+            fraction = min(1.0, index * every / duration) if duration else 1.0
+            value = _clamp(actuator, start + (target - start) * fraction)
+            points.append(Setpoint(at + fraction * duration, actuator, value))
+        current = target
+    return points
+
+
+class TimelineRun:
+    def __init__(self, run_id: int, name: str, actuators: Iterable[str], origin: float) -> None:
+        self.id = run_id
+        self.name = name
+        self.actuators = frozenset(actuators)
+        self.origin = origin
+        self.active = 0
+        self.fired = 0
+        self.status = "running"
+        self.jitter = LatencyStats()
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "actuators": sorted(self.actuators),
+            "timelines": self.active,
+            "fired": self.fired,
+            "jitter": self.jitter.as_dict(),
+        }
+
+
+class TimelineScheduler:
+    def __init__(
+        self,
+        clock: Clock,
+        apply: Callable[[Setpoint], Awaitable[None]],
+        history: int = 100,
+    ) -> None:
+        self._clock = clock
+        self._apply = apply
+        self._heap: List[Tuple[float, int, TimelineRun, Setpoint, Iterator[Setpoint]]] = []
+        self._order = itertools.count()
+        self._ids = itertools.count(1)
+        self._runs: Dict[int, TimelineRun] = {}
+        self._finished: Deque[TimelineRun] = deque(maxlen=20)
+        self._task: asyncio.Task | None = None
+        self._waiting_until: float | None = None
+        self._jitter = LatencyStats()
+        self._apply_stats = LatencyStats()
+        self.steps: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self.fired = 0
+        self.wakeups = 0
+
+    def start(self, name: str, timelines: Sequence[Iterable[Setpoint]], actuators: Iterable[str]) -> TimelineRun:
+        run = TimelineRun(next(self._ids), name, actuators, self._clock.monotonic())
+        self._runs[run.id] = run
+        for timeline in timelines:
+            self._push(run, iter(timeline))
+        if not run.active:
+            self._finish(run, "done")
+        return run
+
+    def cancel(self, run_id: int | None = None, actuator: str | None = None) -> List[TimelineRun]:
+        cancelled = [
+            run
+            for run in list(self._runs.values())
+            if (run_id is None or run.id == run_id) and (actuator is None or actuator in run.actuators)
+        ]
+        for run in cancelled:
+            self._finish(run, "cancelled")
+        self._heap = [entry for entry in self._heap if entry[2].status == "running"]
+        heapq.heapify(self._heap)
+        return cancelled
+
+    async def stop(self) -> None:
+        self.cancel()
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def _finish(self, run: TimelineRun, status: str) -> None:
+        if self._runs.pop(run.id, None) is None:
+            return
+        run.status = status
+        run.active = 0
+        self._finished.append(run)
+
+    def _push(self, run: TimelineRun, timeline: Iterator[Setpoint]) -> None:
+        setpoint = next(timeline, None)
+        if setpoint is None:
+            return
+        run.active += 1
+        deadline = run.origin + setpoint.at
+        heapq.heappush(self._heap, (deadline, next(self._order), run, setpoint, timeline))
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        elif self._waiting_until is not None and deadline < self._waiting_until:
+            self._task.cancel()
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        clock = self._clock
+        while self._heap:
+            delay = self._heap[0][0] - clock.monotonic()
+            if delay > 0:
+                self._waiting_until = self._heap[0][0]
+                try:
+                    await clock.sleep(delay)
+                finally:
+                    self._waiting_until = None
+                self.wakeups += 1
+                continue
+            now = clock.monotonic()
+            while self._heap and self._heap[0][0] <= now:
+                deadline, _, run, setpoint, timeline = heapq.heappop(self._heap)
+                if run.status != "running":
+                    continue
+                run.active -= 1
+                await self._fire(run, setpoint, (clock.monotonic() - deadline) * 1000)
+                if run.status != "running":
+                    continue
+                self._push(run, timeline)
+                if not run.active:
+                    self._finish(run, "done")
+        if self._task is asyncio.current_task():
+            self._task = None
+
+    async def _fire(self, run: TimelineRun, setpoint: Setpoint, jitter_ms: float) -> None:
+        started = time.perf_counter()
+        try:
+            await self._apply(setpoint)
+        except Exception:
+            ok = False
+        else:
+            ok = True
+        self._apply_stats.add((time.perf_counter() - started) * 1000)
+        self._jitter.add(jitter_ms)
+        run.jitter.add(jitter_ms)
+        run.fired += 1
+        self.fired += 1
+        self.steps.append(
+            {
+                "run": run.id,
+                "at": setpoint.at,
+                "actuator": setpoint.actuator,
+                "value": setpoint.value,
+                "jitter_ms": round(jitter_ms, 3),
+                "ok": ok,
+            }
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._heap),
+            "timers": 1 if self._waiting_until is not None else 0,
+            "fired": self.fired,
+            "wakeups": self.wakeups,
+            "jitter": self._jitter.as_dict(),
+            "apply": self._apply_stats.as_dict(),
+            "runs": [run.as_dict() for run in self._runs.values()],
+            "finished": [run.as_dict() for run in self._finished],
+            "steps": list(self.steps),
+        }
@@ -0,0 +1,142 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Set
+
+from fastapi import WebSocket
+
+from app.services.ws_protocol import FrameEncoder, Subscription
+
+SLOW_CLIENT_POLICIES = {"drop_oldest", "disconnect"}
+
+
+@dataclass
+class ChannelConfig:
+    queue_size: int = 64
+    slow_client_policy: str = "drop_oldest"
+    keyframe_interval: int = 50
+
+    def __post_init__(self) -> None:
+        if self.slow_client_policy not in SLOW_CLIENT_POLICIES:
+            raise ValueError(f"unknown slow client policy: {self.slow_client_policy}")
+
+
+class ClientChannel:
+    def __init__(
+        self,
+        websocket: WebSocket,
+        config: ChannelConfig,
+        on_close: Callable[["ClientChannel"], Awaitable[None]],
+        subscription: Subscription | None = None,
+    ) -> None:
+        self.websocket = websocket
+        self.subscription = subscription or Subscription()
+        self._config = config
+        self._on_close = on_close
+        self._queue: asyncio.Queue[str | bytes] = asyncio.Queue(maxsize=max(1, config.queue_size))
+        self._task: asyncio.Task | None = None
+        self._closed = False
+        self.sent = 0
+        self.dropped = 0
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._sender())
+
+    def offer(
+        self,
+        message: str | bytes,
+        resync: Callable[[], List[str | bytes]] | None = None,
+    ) -> bool:
+        if self._closed:
+            return False
+        try:
+            self._queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            pass
+        if self._config.slow_client_policy == "disconnect":
+            self.dropped += 1
+            asyncio.create_task(self.close(code=1013))
+            return False
+        if resync is None:
+            self.dropped += 1
+            self._queue.get_nowait()
+            self._queue.put_nowait(message)
+            return True
+        while not self._queue.empty():
+            self._queue.get_nowait()
+            self.dropped += 1
+        for item in resync()[: self._queue.maxsize]:
+            self._queue.put_nowait(item)
+        return True
+
+    async def _sender(self) -> None:
+        try:
+            while True:
+                message = await self._queue.get()
+                if isinstance(message, bytes):
+                    await self.websocket.send_bytes(message)
+                else:
+                    await self.websocket.send_text(message)
+                self.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            await self.close()
+
+    async def close(self, code: int | None = None) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        if self._task and self._task is not asyncio.current_task():
+            self._task.cancel()
+        if code is not None:
+            try:
+                await self.websocket.close(code=code)
+            except Exception:
+                pass
+        await self._on_close(self)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"depth": self.depth, "sent": self.sent, "dropped": self.dropped}
+
+
+class SubscriptionGroup:
+    def __init__(self, subscription: Subscription, keyframe_interval: int) -> None:
+        self.subscription = subscription
+        self.encoder = FrameEncoder(subscription, keyframe_interval)
+        self.channels: Set[ClientChannel] = set()
+
+    def join(self, channel: ClientChannel, latest: Mapping[str, Mapping[str, Any]]) -> None:
+        self.channels.add(channel)
+        if self.subscription.is_default:
+            return
+        for source, payload in latest.items():
+            if not self.encoder.has_state(source):
+                self.encoder.announce(source)
+                self.encoder.encode(payload, source)
+        channel.offer(self.encoder.schema())
+        for source in self.encoder.sources():
+            keyframe = self.encoder.keyframe(source)
+            if keyframe is not None:
+                channel.offer(keyframe)
+
+    def publish(self, payload: Mapping[str, Any], source: str) -> None:
+        announcement = self.encoder.announce(source)
+        message, keyframe = self.encoder.encode(payload, source)
+        resync = None
+        if self.subscription.delta:
+            def resync() -> List[str | bytes]:
+                return [self.encoder.schema(), keyframe()]
+        for channel in list(self.channels):
+            if announcement:
+                channel.offer(announcement)
+            channel.offer(message, resync)
@@ -0,0 +1,230 @@
+import json
+import math
+import struct
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Mapping, Tuple
+
+from app.services.db import TELEMETRY_FIELDS
+
+PROTOCOLS = {"json", "f32"}
+
+KIND_KEY = 1
+KIND_DELTA = 2
+
+DECIMATION_MODES = ("latest", "mean", "minmax")
+
+MAX_RATE_HZ = 1000.0
+
+F32_HEADER = struct.Struct("<BBHqQ")
+F32_LAYOUT = "header <BBHqQ (kind, source_id, seq, ts_ms, field_mask) + float32 per set mask bit"
+
+
+def encode_json(payload: Mapping[str, Any]) -> str:
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+
+
+def flatten(payload: Mapping[str, Any]) -> Dict[str, Any]:
+    values = dict(payload)
+    fan = values.get("fan")
+    if isinstance(fan, (list, tuple)):
+        for i, value in enumerate(fan[:3]):
+            values[f"fan{i + 1}"] = value
+    return values
+
+
+@dataclass(frozen=True)
+class Subscription:
+    proto: str = "json"
+    fields: Tuple[str, ...] = ()
+    delta: bool = False
+    rate: float = 0.0
+    mode: str = "latest"
+
+    @property
+    def is_default(self) -> bool:
+        return self.proto == "json" and not self.fields and not self.delta and self.rate <= 0
+
+    @property
+    def tier(self) -> Tuple[float, str]:
+        if self.rate <= 0:
+            return 0.0, "latest"
+        return self.rate, self.mode
+
+    @property
+    def resolved_fields(self) -> Tuple[str, ...]:
+        fields = self.fields or TELEMETRY_FIELDS
+        if self.rate > 0 and self.mode == "minmax":
+            return tuple(name for field in fields for name in (field, f"{field}_min", f"{field}_max"))
+        return fields
+
+    @classmethod
+    def from_message(cls, message: Mapping[str, Any]) -> "Subscription":
+        fields = message.get("fields")
+        if isinstance(fields, list):
+            fields = ",".join(str(field) for field in fields)
+        delta = message.get("delta")
+        rate = message.get("rate")
+        return cls.parse(
+            message.get("proto"),
+            fields,
+            None if delta is None else str(delta),
+            None if rate is None else str(rate),
+            message.get("mode"),
+        )
+
+    @classmethod
+    def parse(
+        cls,
+        proto: str | None,
+        fields: str | None,
+        delta: str | None,
+        rate: str | None = None,
+        mode: str | None = None,
+    ) -> "Subscription":
+        proto = (proto or "json").lower()
+        if proto not in PROTOCOLS:
+            raise ValueError(f"unknown protocol: {proto}")
+        field_list = tuple(field.strip() for field in (fields or "").split(",") if field.strip())
+        unknown = [field for field in field_list if field not in TELEMETRY_FIELDS]
+        if unknown:
+            raise ValueError(f"unknown fields: {', '.join(unknown)}")
+        if len(field_list) != len(set(field_list)):
+            raise ValueError("duplicate fields")
+        try:
+            rate_hz = float(rate) if rate else 0.0
+        except ValueError as exc:
+            raise ValueError("rate must be a number") from exc
+        if rate_hz < 0 or rate_hz > MAX_RATE_HZ or math.isnan(rate_hz):
+            raise ValueError(f"rate must be between 0 and {MAX_RATE_HZ:g} Hz")
+        mode = (mode or "latest").lower()
+        if mode not in DECIMATION_MODES:
+            raise ValueError(f"unknown decimation mode: {mode}")
+        return cls(
+            proto=proto,
+            fields=field_list,
+            delta=(delta or "").lower() in {"1", "true", "yes", "on"},
+            rate=rate_hz,
+            mode=mode if rate_hz > 0 else "latest",
+        )
+
+
+class FrameEncoder:
+    def __init__(self, subscription: Subscription, keyframe_interval: int = 50) -> None:
+        self._sub = subscription
+        self._fields = subscription.resolved_fields
+        self._keyframe_interval = max(1, keyframe_interval)
+        self._state: Dict[str, Dict[str, Any]] = {}
+        self._last_ts: Dict[str, int] = {}
+        self._since_key: Dict[str, int] = {}
+        self._sources: Dict[str, int] = {}
+        self._seq = 0
+
+    def schema(self) -> str:
+        message: Dict[str, Any] = {
+            "type": "schema",
+            "proto": self._sub.proto,
+            "fields": list(self._fields),
+            "delta": self._sub.delta,
+            "sources": {name: index for name, index in self._sources.items()},
+        }
+        if self._sub.rate > 0:
+            message["rate"] = self._sub.rate
+            message["mode"] = self._sub.mode
+        if self._sub.proto == "f32":
+            message["layout"] = F32_LAYOUT
+            message["kinds"] = {"key": KIND_KEY, "delta": KIND_DELTA}
+        return encode_json(message)
+
+    def announce(self, source: str) -> str | None:
+        if self._sub.proto != "f32":
+            return None
+        source_id, created = self.source_id(source)
+        if not created:
+            return None
+        return encode_json({"type": "source", "id": source_id, "name": source})
+
+    def has_state(self, source: str) -> bool:
+        return source in self._state
+
+    def sources(self) -> List[str]:
+        return list(self._state)
+
+    def source_id(self, source: str) -> Tuple[int, bool]:
+        if source in self._sources:
+            return self._sources[source], False
+        self._sources[source] = len(self._sources) % 256
+        return self._sources[source], True
+
+    def encode(self, payload: Mapping[str, Any], source: str) -> Tuple[str | bytes, Callable[[], str | bytes]]:
+        if self._sub.is_default:
+            message = encode_json(payload)
+            return message, lambda: message
+        values = flatten(payload)
+        current = {field: values.get(field) for field in self._fields}
+        ts = int(payload.get("ts") or 0)
+        previous = self._state.get(source)
+        since_key = self._since_key.get(source, self._keyframe_interval)
+        self._state[source] = current
+        self._last_ts[source] = ts
+        self._seq = (self._seq + 1) % 65536
+        seq = self._seq
+        if not self._sub.delta or previous is None or since_key >= self._keyframe_interval:
+            self._since_key[source] = 1
+            message = self._pack(KIND_KEY, source, seq, ts, current, self._fields)
+            return message, lambda: message
+        self._since_key[source] = since_key + 1
+        changed = [field for field in self._fields if current[field] != previous[field]]
+        message = self._pack(KIND_DELTA, source, seq, ts, current, changed)
+        cache: List[str | bytes] = []
+
+        def keyframe() -> str | bytes:
+            if not cache:
+                cache.append(self._pack(KIND_KEY, source, seq, ts, current, self._fields))
+            return cache[0]
+
+        return message, keyframe
+
+    def keyframe(self, source: str) -> str | bytes | None:
+        current = self._state.get(source)
+        if current is None:
+            return None
+        return self._pack(KIND_KEY, source, self._seq, self._last_ts[source], current, self._fields)
+
+    def _pack(
+        self,
+        kind: int,
+        source: str,
+        seq: int,
+        ts: int,
+        values: Mapping[str, Any],
+        fields: Tuple[str, ...] | List[str],
+    ) -> str | bytes:
+        if self._sub.proto == "json":
+            message: Dict[str, Any] = {
+                "type": "telemetry",
+                "kind": "key" if kind == KIND_KEY else "delta",
+                "seq": seq,
+                "ts": ts,
+                "source": source,
+            }
+            for field in fields:
+                message[field] = values[field]
+            return encode_json(message)
+        source_id, _ = self.source_id(source)
+        mask = 0
+        numbers = []
+        for index, field in enumerate(self._fields):
+            if field in fields:
+                mask |= 1 << index
+                value = values[field]
+                numbers.append(math.nan if value is None else float(value))
+        return F32_HEADER.pack(kind, source_id, seq, ts, mask) + struct.pack(f"<{len(numbers)}f", *numbers)
+
+
+def decode_f32(frame: bytes, fields: Tuple[str, ...] | List[str]) -> Dict[str, Any]:
+    kind, source_id, seq, ts, mask = F32_HEADER.unpack_from(frame)
+    selected = [field for index, field in enumerate(fields) if mask & (1 << index)]
+    numbers = struct.unpack_from(f"<{len(selected)}f", frame, F32_HEADER.size)
+    result: Dict[str, Any] = {"kind": kind, "source_id": source_id, "seq": seq, "ts": ts}
+    result.update(zip(selected, numbers))
+    return result
@@ -12,6 +12,7 @@
     ws.onmessage = (event) => {
       try {
         const payload = JSON.parse(event.data);
+        if (payload.type === "backfill" || payload.type === "event") return;
         telemetryEl.textContent = JSON.stringify(payload, null, 2);
         updateTelemetryFields(payload);
       } catch {
@@ -184,6 +185,26 @@
       });
     }
 
+    function streamBuild(jobId, status) {
+      const lines = [];
+      let header = `job ${jobId}: queued`;
+      const render = () => {
+        status.textContent = [header, ...lines].join("\n");
+      };
+      const ws = new WebSocket(`${location.protocol === "https:" ? "wss" : "ws"}://${location.host}/ws/build/${jobId}`);
+      ws.onmessage = (event) => {
+        const message = JSON.parse(event.data);
+        if (message.type === "log") {
+          lines.push(message.line);
+        } else if (message.type === "status") {
+          const position = message.position ? ` (#${message.position} in line)` : "";
+          const cached = message.cached ? ", cached build" : "";
+          header = `job ${jobId}: ${message.status}${position}${cached}${message.message ? ` - ${message.message}` : ""}`;
+        }
+        render();
+      };
+    }
+
     if (firmwareForm) {
       firmwareForm.addEventListener("submit", async (e) => {
         e.preventDefault();
@@ -204,7 +225,11 @@
         status.textContent = "uploading...";
         const resp = await fetch("/api/student/firmware/upload", { method: "POST", body: data });
         const json = await resp.json();
-        status.textContent = JSON.stringify(json, null, 2);
+        if (!json.job) {
+          status.textContent = JSON.stringify(json, null, 2);
+          return;
+        }
+        streamBuild(json.job.id, status);
       });
     }
   });
@@ -0,0 +1,317 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import pty
+import random
+import signal
+import time
+import tty
+from pathlib import Path
+from typing import Any, Dict, List
+
+from app.services.serial_protocol import ACK_BODY, KIND_ACK, StreamDecoder, encode_frame, encode_telemetry
+
+SAFETY_FIELDS = ("t1", "t2", "t3", "p1", "p2", "flow", "heater", "drain_valve", "fault")
+STUDENT_FIELDS = ("pump", "fan")
+
+
+class StandModel:
+    def __init__(self, seed: int | None = None) -> None:
+        self._rng = random.Random(seed)
+        self._started = time.monotonic()
+        self._last = self._started
+        self.heater = 0
+        self.pump = 0
+        self.fan = [0, 0, 0]
+        self.drain_valve = 0
+        self.t1 = 23.0
+        self.t2 = 25.0
+
+    def apply(self, values: Dict[str, Any]) -> None:
+        if "heater" in values:
+            self.heater = int(values["heater"])
+        if "pump" in values:
+            self.pump = int(values["pump"])
+        if "fan" in values:
+            self.fan = [int(value) for value in values["fan"]][:3]
+        if "drain_valve" in values:
+            self.drain_valve = int(values["drain_valve"])
+
+    def sample(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        dt = now - self._last
+        self._last = now
+        phase = now - self._started
+        cooling = (self.pump / 255.0 + sum(self.fan) / 765.0) * 0.5
+        self.t1 += ((self.heater / 100.0) * 1.5 - cooling + (23.0 - self.t1) * 0.02) * dt
+        self.t2 += ((self.heater / 100.0) * 0.9 - cooling + (23.0 - self.t2) * 0.01) * dt
+        return {
+            "t1": round(self.t1, 2),
+            "t2": round(self.t2, 2),
+            "t3": round((self.t1 + self.t2) / 2 + math.sin(phase) * 0.2, 2),
+            "p1": round(1.0 + self._rng.uniform(-0.05, 0.05), 3),
+            "p2": round(1.0 + self._rng.uniform(-0.05, 0.05), 3),
+            "flow": round(2.0 + self.pump / 255.0 * 3.0, 2),
+            "heater": self.heater,
+            "pump": self.pump,
+            "fan": list(self.fan),
+            "drain_valve": self.drain_valve,
+            "fault": 0,
+        }
+
+
+class EmulatedBoard:
+    def __init__(
+        self,
+        name: str,
+        fields: tuple,
+        model: StandModel,
+        rate_hz: float = 50.0,
+        protocol: str = "0.1",
+        garbage: float = 0.0,
+        partial: float = 0.0,
+        ack_delay_ms: float = 0.0,
+        seed: int | None = None,
+    ) -> None:
+        self.name = name
+        self.fields = fields
+        self.model = model
+        self.rate_hz = rate_hz
+        self.protocol = protocol
+        self.garbage = garbage
+        self.partial = partial
+        self.ack_delay_ms = ack_delay_ms
+        self._rng = random.Random(seed)
+        self._decoder = StreamDecoder()
+        self._master: int | None = None
+        self._slave: int | None = None
+        self._task: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._seq = 0
+        self.path = ""
+        self.frames = 0
+        self.garbage_frames = 0
+        self.partial_frames = 0
+        self.overruns = 0
+        self.commands = 0
+        self.acks = 0
+
+    def open(self) -> str:
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        os.set_blocking(self._master, False)
+        self.path = os.ttyname(self._slave)
+        return self.path
+
+    async def start(self) -> None:
+        if self._master is None:
+            self.open()
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(self._master, self._on_readable)
+        self._task = asyncio.create_task(self._emit_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._master is not None:
+            self._loop.remove_reader(self._master)
+            os.close(self._master)
+            os.close(self._slave)
+            self._master = None
+            self._slave = None
+
+    def frame(self) -> bytes:
+        sample = self.model.sample()
+        payload: Dict[str, Any] = {"type": "telemetry", "ver": self.protocol, "ts": int(time.time() * 1000)}
+        payload.update((field, sample[field]) for field in self.fields)
+        self._seq = (self._seq + 1) % 65536
+        if self.protocol == "0.2":
+            return encode_telemetry(payload, self._seq)
+        return (json.dumps(payload, separators=(",", ":")) + "\n").encode()
+
+    def _next_chunk(self) -> bytes:
+        data = self.frame()
+        roll = self._rng.random()
+        if roll < self.garbage:
+            self.garbage_frames += 1
+            noise = bytes(self._rng.randrange(1, 256) for _ in range(self._rng.randrange(4, 40)))
+            return noise.replace(b"\n", b"") + (b"\x00" if self.protocol == "0.2" else b"\n") + data
+        if roll < self.garbage + self.partial:
+            self.partial_frames += 1
+            return data[: self._rng.randrange(1, len(data) - 1)]
+        return data
+
+    async def _emit_loop(self) -> None:
+        interval = 1.0 / self.rate_hz
+        started = time.monotonic()
+        emitted = 0
+        while True:
+            due = int((time.monotonic() - started) / interval) + 1 - emitted
+            if due > 0:
+                chunk = b"".join(self._next_chunk() for _ in range(due))
+                emitted += due
+                self._write(chunk, due)
+            await asyncio.sleep(max(0.0, started + emitted * interval - time.monotonic()))
+
+    def _write(self, data: bytes, frames: int) -> None:
+        try:
+            written = os.write(self._master, data)
+        except (BlockingIOError, OSError):
+            self.overruns += frames
+            return
+        if written < len(data):
+            self.overruns += 1
+        self.frames += frames
+
+    def _on_readable(self) -> None:
+        try:
+            data = os.read(self._master, 4096)
+        except (BlockingIOError, OSError):
+            return
+        for command in self._decoder.feed(data):
+            if command.get("type") != "cmd":
+                continue
+            self.commands += 1
+            self.model.apply(command.get("set") or {})
+            seq = command.get("seq")
+            if self._decoder.protocol == "0.2":
+                message = encode_frame(KIND_ACK, int(seq or 0), int(time.time() * 1000), ACK_BODY.pack(1))
+            else:
+                ack = {"type": "ack", "ver": "0.1", "seq": seq, "ok": True}
+                message = (json.dumps(ack, separators=(",", ":")) + "\n").encode()
+            if self.ack_delay_ms > 0:
+                self._loop.call_later(self.ack_delay_ms / 1000, self._send_ack, message)
+            else:
+                self._send_ack(message)
+
+    def _send_ack(self, message: bytes) -> None:
+        if self._master is None:
+            return
+        self._write(message, 0)
+        self.acks += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "frames": self.frames,
+            "garbage": self.garbage_frames,
+            "partial": self.partial_frames,
+            "overruns": self.overruns,
+            "commands": self.commands,
+            "bad_commands": self._decoder.parse_errors,
+            "acks": self.acks,
+        }
+
+
+class PtyEmulator:
+    def __init__(
+        self,
+        rate_hz: float = 50.0,
+        student_rate_hz: float | None = None,
+        protocol: str = "0.1",
+        garbage: float = 0.0,
+        partial: float = 0.0,
+        ack_delay_ms: float = 0.0,
+        link_dir: str | None = None,
+        seed: int | None = None,
+    ) -> None:
+        self.model = StandModel(seed)
+        common = {"protocol": protocol, "garbage": garbage, "partial": partial, "ack_delay_ms": ack_delay_ms}
+        self.boards: Dict[str, EmulatedBoard] = {
+            "safety": EmulatedBoard("safety", SAFETY_FIELDS, self.model, rate_hz, seed=seed, **common),
+            "student": EmulatedBoard(
+                "student",
+                STUDENT_FIELDS,
+                self.model,
+                student_rate_hz or rate_hz,
+                seed=None if seed is None else seed + 1,
+                **common,
+            ),
+        }
+        self._link_dir = Path(link_dir) if link_dir else None
+        self.paths: Dict[str, str] = {}
+
+    async def start(self) -> Dict[str, str]:
+        for name, board in self.boards.items():
+            path = board.open()
+            if self._link_dir:
+                self._link_dir.mkdir(parents=True, exist_ok=True)
+                link = self._link_dir / name
+                if link.is_symlink() or link.exists():
+                    link.unlink()
+                link.symlink_to(path)
+                path = str(link)
+            self.paths[name] = path
+            await board.start()
+        return self.paths
+
+    async def stop(self) -> None:
+        for name, board in self.boards.items():
+            await board.stop()
+            if self._link_dir:
+                link = self._link_dir / name
+                if link.is_symlink():
+                    link.unlink()
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: board.stats() for name, board in self.boards.items()}
+
+
+async def _run(args: argparse.Namespace) -> None:
+    emulator = PtyEmulator(
+        rate_hz=args.rate,
+        student_rate_hz=args.student_rate,
+        protocol=args.protocol,
+        garbage=args.garbage,
+        partial=args.partial,
+        ack_delay_ms=args.ack_delay_ms,
+        link_dir=args.link_dir,
+        seed=args.seed,
+    )
+    paths = await emulator.start()
+    print(f"SAFETY_PORT={paths['safety']} STUDENT_PORT={paths['student']} SIM_MODE=false", flush=True)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    previous: Dict[str, int] = {}
+    try:
+        while not stop.is_set():
+            try:
+                await asyncio.wait_for(stop.wait(), args.report_s)
+                break
+            except asyncio.TimeoutError:
+                pass
+            parts: List[str] = []
+            for name, stats in emulator.stats().items():
+                rate = (stats["frames"] - previous.get(name, 0)) / args.report_s
+                previous[name] = stats["frames"]
+                parts.append(
+                    f"{name}: {rate:.0f} fps, cmds {stats['commands']}, acks {stats['acks']}, "
+                    f"overruns {stats['overruns']}"
+                )
+            print(" | ".join(parts), flush=True)
+    finally:
+        await emulator.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Emulate the safety and student boards on pseudo-terminals.")
+    parser.add_argument("--rate", type=float, default=50.0, help="safety telemetry rate, Hz")
+    parser.add_argument("--student-rate", type=float, default=None, help="student telemetry rate, Hz")
+    parser.add_argument("--protocol", choices=("0.1", "0.2"), default="0.1")
+    parser.add_argument("--garbage", type=float, default=0.0, help="share of frames preceded by a garbage line")
+    parser.add_argument("--partial", type=float, default=0.0, help="share of frames cut short")
+    parser.add_argument("--ack-delay-ms", type=float, default=0.0)
+    parser.add_argument("--link-dir", default=None, help="create stable safety/student symlinks here")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--report-s", type=float, default=5.0)
+    args = parser.parse_args()
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
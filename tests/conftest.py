@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+os.environ.setdefault("SIM_MODE", "true")
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="lab-stand-tests-"))
+os.environ.setdefault("ARDUINO_CLI_PATH", "/bin/true")
+os.environ.setdefault("UPLOAD_ENABLED", "false")
@@ -0,0 +1,196 @@
+import asyncio
+import dataclasses
+import stat
+import time
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.services import flashing_service
+from app.services.build_jobs import BuildQueue
+from app.services.compile_cache import CompileCache
+from app.services.flashing_service import FlashingService
+
+FAKE_CLI = """#!/bin/sh
+log="{log}"
+echo "start $1 $(date +%s.%N)" >> "$log"
+if [ "$1" = "compile" ]; then
+  for arg in "$@"; do last="$arg"; done
+  name=$(basename "$last")
+  echo "compiling $name"
+  echo "warning in $name" >&2
+  case "$name" in slow*) sleep 30;; esac
+  sleep {compile_s}
+  echo "done $name"
+else
+  sleep {upload_s}
+  echo "uploaded"
+fi
+echo "end $1 $(date +%s.%N)" >> "$log"
+"""
+
+
+def _install_cli(tmp_path: Path, monkeypatch, compile_s: float = 0.3, upload_s: float = 0.2) -> Path:
+    log = tmp_path / "cli.log"
+    script = tmp_path / "arduino-cli"
+    script.write_text(FAKE_CLI.format(log=log, compile_s=compile_s, upload_s=upload_s))
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    patched = dataclasses.replace(
+        settings,
+        arduino_cli_path=str(script),
+        upload_enabled=True,
+        data_dir=str(tmp_path / "data"),
+        student_port="/dev/ttyFAKE",
+    )
+    monkeypatch.setattr(flashing_service, "settings", patched)
+    return log
+
+
+def _sketch(tmp_path: Path, name: str) -> Path:
+    path = tmp_path / f"{name}.ino"
+    path.write_text(f"// {name}\nvoid setup(){{}} void loop(){{}}")
+    return path
+
+
+def _intervals(log: Path, command: str) -> list[tuple[float, float]]:
+    starts, ends = [], []
+    for line in log.read_text().splitlines():
+        kind, name, ts = line.split()
+        if name == command:
+            (starts if kind == "start" else ends).append(float(ts))
+    return list(zip(sorted(starts), sorted(ends)))
+
+
+def test_compiles_run_in_parallel_and_uploads_are_serialized(tmp_path: Path, monkeypatch) -> None:
+    log = _install_cli(tmp_path, monkeypatch)
+
+    async def run():
+        builds = BuildQueue(FlashingService(), workers=2)
+        jobs = [builds.submit(_sketch(tmp_path, f"s{i}"), "arduino:avr:uno", None) for i in range(3)]
+        await asyncio.sleep(0.1)
+        snapshot = [(job.status, job.position) for job in jobs]
+        await asyncio.gather(*(job.task for job in jobs))
+        return builds, jobs, snapshot
+
+    builds, jobs, snapshot = asyncio.run(run())
+    assert snapshot == [("compiling", None), ("compiling", None), ("queued", 1)]
+    assert [job.status for job in jobs] == ["done", "done", "done"]
+    assert all(job.result.message == "uploaded" for job in jobs)
+    compiles = _intervals(log, "compile")
+    assert compiles[1][0] < compiles[0][1]
+    uploads = _intervals(log, "upload")
+    assert len(uploads) == 3
+    for previous, current in zip(uploads, uploads[1:]):
+        assert current[0] >= previous[1]
+    stats = builds.stats()
+    assert stats["done"] == 3 and stats["submitted"] == 3
+    assert not list((tmp_path / "data" / "uploads" / "student").glob("*.ino"))
+
+
+def test_log_streams_to_subscribers(tmp_path: Path, monkeypatch) -> None:
+    _install_cli(tmp_path, monkeypatch, compile_s=0.2, upload_s=0.05)
+
+    async def run():
+        builds = BuildQueue(FlashingService(), workers=1)
+        job = builds.submit(_sketch(tmp_path, "blink"), "arduino:avr:uno", None)
+        queue = job.subscribe()
+        messages = []
+        while (message := await queue.get()) is not None:
+            messages.append(message)
+        return job, messages
+
+    job, messages = asyncio.run(run())
+    lines = [(message["stream"], message["line"]) for message in messages if message["type"] == "log"]
+    assert ("stdout", "compiling blink") in lines
+    assert ("stderr", "warning in blink") in lines
+    assert ("stdout", "uploaded") in lines
+    statuses = [message["status"] for message in messages if message["type"] == "status"]
+    assert statuses == ["queued", "compiling", "waiting_upload", "uploading", "done"]
+    assert "compiling blink" in job.result.compile_stdout
+    assert job.as_dict()["compile_ms"] >= 150
+
+
+def test_cancel_kills_compile_and_releases_slot(tmp_path: Path, monkeypatch) -> None:
+    log = _install_cli(tmp_path, monkeypatch, compile_s=0.05, upload_s=0.05)
+
+    async def run():
+        cache = CompileCache(tmp_path / "cache", 10_000_000)
+        builds = BuildQueue(FlashingService(cache), workers=1)
+        slow = builds.submit(_sketch(tmp_path, "slow"), "arduino:avr:uno", None)
+        fast = builds.submit(_sketch(tmp_path, "fast"), "arduino:avr:uno", None)
+        await asyncio.sleep(0.2)
+        assert (fast.status, fast.position) == ("queued", 1)
+        started = time.monotonic()
+        builds.cancel(slow.id)
+        await slow.task
+        cancelled_in = time.monotonic() - started
+        await fast.task
+        return builds, slow, fast, cancelled_in, cache
+
+    builds, slow, fast, cancelled_in, cache = asyncio.run(run())
+    assert slow.status == "cancelled"
+    assert cancelled_in < 2
+    assert fast.status == "done"
+    assert builds.stats()["cancelled"] == 1
+    assert len(_intervals(log, "compile")) == 1
+    assert cache.stats()["pinned"] == 0
+    assert not list((tmp_path / "cache").glob(".build-*"))
+
+
+def test_pinned_entry_survives_eviction(tmp_path: Path) -> None:
+    cache = CompileCache(tmp_path / "cache", max_bytes=2500)
+
+    def build(name: str) -> None:
+        build_dir = cache.staging_dir()
+        (build_dir / f"{name}.ino.hex").write_bytes(b"\0" * 1000)
+        cache.store(name, build_dir, {"sketch": name})
+
+    build("a")
+    cache.pin("a")
+    build("b")
+    build("c")
+    assert (tmp_path / "cache" / "a").exists()
+    assert not (tmp_path / "cache" / "b").exists()
+    cache.pin("c")
+    build("d")
+    assert cache.stats()["entries"] == 3
+    cache.unpin("a")
+    assert not (tmp_path / "cache" / "a").exists()
+    assert cache.stats()["entries"] == 2
+
+
+@pytest.fixture
+def client(tmp_path: Path, monkeypatch):
+    monkeypatch.setenv("SIM_MODE", "true")
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    from app.main import app
+
+    with TestClient(app) as client:
+        client.post("/api/teacher/student_mode", json={"mode": "student"})
+        yield client
+
+
+def test_job_api_and_websocket(client: TestClient) -> None:
+    files = {"file": ("sketch.ino", b"void setup(){}", "text/plain")}
+    resp = client.post("/api/student/firmware/upload", data={"board_fqbn": "arduino:avr:uno"}, files=files)
+    assert resp.status_code == 200
+    job_id = resp.json()["job"]["id"]
+
+    with client.websocket_connect(f"/ws/build/{job_id}") as ws:
+        status = None
+        while status not in {"done", "failed", "cancelled"}:
+            message = ws.receive_json()
+            if message["type"] == "status":
+                status = message["status"]
+    assert status == "done"
+
+    job = client.get(f"/api/student/firmware/jobs/{job_id}").json()["job"]
+    assert job["message"] == "upload disabled by configuration"
+    assert job["compile"] == {"stdout": "", "stderr": ""}
+    listing = client.get("/api/student/firmware/jobs").json()
+    assert listing["jobs"][0]["id"] == job_id
+    assert client.delete(f"/api/student/firmware/jobs/{job_id}").status_code == 409
+    assert client.delete("/api/student/firmware/jobs/9999").status_code == 404
+    assert client.get("/api/metrics").json()["builds"]["done"] >= 1
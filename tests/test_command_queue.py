@@ -0,0 +1,137 @@
+import asyncio
+
+from app.services.command_queue import CommandQueue, QueueConfig
+from app.services.command_tracker import AckConfig, CommandTracker
+from tests.test_command_tracker import FakeSerial
+
+
+def test_setpoints_coalesce_and_critical_keys_stay_ordered() -> None:
+    async def run():
+        serial = FakeSerial()
+        tracker = CommandTracker(AckConfig(timeout_ms=1000, retries=0))
+        queue = CommandQueue(serial, tracker, QueueConfig(coalesce_ms=30))
+        await queue.start()
+        await queue.submit({"heater": 10})
+        await asyncio.sleep(0.005)
+        for power in range(11, 30):
+            await queue.submit({"heater": power})
+        await queue.submit({"drain_valve": 1})
+        await queue.submit({"heater": 40})
+        await queue.submit({"drain_valve": 0})
+        await queue.submit({"drain_valve": 1})
+        await asyncio.sleep(0.1)
+        await queue.stop()
+        await tracker.stop()
+        return serial.sent, queue.stats()
+
+    sent, stats = asyncio.run(run())
+    assert [cmd["set"] for cmd in sent] == [
+        {"heater": 10},
+        {"heater": 29},
+        {"drain_valve": 1},
+        {"heater": 40},
+        {"drain_valve": 0},
+        {"drain_valve": 1},
+    ]
+    assert [cmd["seq"] for cmd in sent] == [1, 2, 3, 4, 5, 6]
+    assert stats["submitted"] == 24
+    assert stats["frames"] == 6
+    assert stats["coalesced"] == 18
+    assert stats["critical"] == 3
+
+
+def test_critical_command_skips_coalesce_window_and_waits_for_ack() -> None:
+    async def run():
+        serial = FakeSerial()
+        tracker = CommandTracker(AckConfig(timeout_ms=500, retries=0))
+        serial.on_send = lambda cmd: tracker.on_ack({"type": "ack", "seq": cmd["seq"]}, "safety")
+        queue = CommandQueue(serial, tracker, QueueConfig(coalesce_ms=1000))
+        await queue.start()
+        await queue.submit({"heater": 1})
+        await asyncio.sleep(0)
+        await queue.submit({"pump": 5})
+        result = await asyncio.wait_for(queue.submit({"drain_valve": 1}, wait=True), 0.5)
+        await queue.stop()
+        return serial.sent, result
+
+    sent, result = asyncio.run(run())
+    assert result.status == "acked"
+    assert result.seq == 3
+    assert [cmd["set"] for cmd in sent] == [{"heater": 1}, {"pump": 5}, {"drain_valve": 1}]
+
+
+def test_lost_ack_is_not_retried_after_newer_value_for_same_key() -> None:
+    async def run():
+        serial = FakeSerial()
+        tracker = CommandTracker(AckConfig(timeout_ms=30, retries=2))
+        serial.on_send = lambda cmd: (
+            tracker.on_ack({"type": "ack", "seq": cmd["seq"]}, "safety") if cmd["set"].get("drain_valve") == 0 else None
+        )
+        queue = CommandQueue(serial, tracker, QueueConfig(coalesce_ms=10))
+        await queue.start()
+        opened = asyncio.ensure_future(queue.submit({"drain_valve": 1, "heater": 20}, wait=True))
+        await asyncio.sleep(0)
+        closed = await queue.submit({"drain_valve": 0}, wait=True)
+        await asyncio.sleep(0.2)
+        await queue.stop()
+        return serial.sent, await opened, closed, tracker.stats()
+
+    sent, opened, closed, stats = asyncio.run(run())
+    assert closed.status == "acked"
+    assert [(cmd["seq"], cmd["set"]) for cmd in sent] == [
+        (1, {"drain_valve": 1, "heater": 20}),
+        (2, {"drain_valve": 0}),
+        (1, {"heater": 20}),
+        (1, {"heater": 20}),
+    ]
+    assert opened.status == "timeout"
+    assert stats["safety"]["superseded"] == 0
+
+
+def test_fully_superseded_frame_stops_retrying() -> None:
+    async def run():
+        serial = FakeSerial()
+        tracker = CommandTracker(AckConfig(timeout_ms=30, retries=2))
+        serial.on_send = lambda cmd: (
+            tracker.on_ack({"type": "ack", "seq": cmd["seq"]}, "safety") if cmd["set"]["drain_valve"] == 0 else None
+        )
+        queue = CommandQueue(serial, tracker, QueueConfig(coalesce_ms=10))
+        await queue.start()
+        opened = asyncio.ensure_future(queue.submit({"drain_valve": 1}, wait=True))
+        await asyncio.sleep(0)
+        closed = await queue.submit({"drain_valve": 0}, wait=True)
+        await asyncio.sleep(0.2)
+        await queue.stop()
+        return serial.sent, await opened, closed, tracker.stats()
+
+    sent, opened, closed, stats = asyncio.run(run())
+    assert [(cmd["seq"], cmd["set"]) for cmd in sent] == [(1, {"drain_valve": 1}), (2, {"drain_valve": 0})]
+    assert closed.status == "acked"
+    assert opened.status == "superseded"
+    assert stats["safety"]["superseded"] == 1
+    assert stats["safety"]["inflight"] == 0
+
+
+def test_latest_value_submissions_replace_instead_of_piling_up() -> None:
+    async def run():
+        serial = FakeSerial()
+        tracker = CommandTracker(AckConfig(timeout_ms=30, retries=2))
+        queue = CommandQueue(serial, tracker, QueueConfig(coalesce_ms=1000))
+        await queue.start()
+        for power in range(10):
+            await queue.submit({"heater": power}, latest=True)
+        await asyncio.sleep(0.01)
+        for power in (20, 30):
+            await queue.submit({"heater": power}, latest=True)
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.2)
+        await queue.stop()
+        return serial.sent, queue.stats(), tracker.stats()
+
+    sent, stats, tracker_stats = asyncio.run(run())
+    assert [cmd["set"] for cmd in sent] == [{"heater": 9}, {"heater": 20}, {"heater": 30}]
+    assert stats["critical"] == 0
+    assert stats["replaced"] == 9
+    assert tracker_stats["safety"]["retries"] == 0
+    assert tracker_stats["safety"]["superseded"] == 2
+    assert tracker_stats["safety"]["inflight"] == 0
@@ -0,0 +1,77 @@
+import asyncio
+from typing import Any, Dict, List
+
+from app.services.command_tracker import AckConfig, CommandTracker, LatencyHistogram
+
+
+class FakeSerial:
+    def __init__(self, name: str = "safety", connected: bool = True, simulated: bool = False) -> None:
+        self.name = name
+        self.connected = connected
+        self.simulated = simulated
+        self.sent: List[Dict[str, Any]] = []
+        self.on_send = None
+
+    async def send_command(self, payload: Dict[str, Any]) -> None:
+        self.sent.append(payload)
+        if self.on_send:
+            self.on_send(payload)
+
+
+def test_ack_resolves_waiting_command_with_latency() -> None:
+    async def run():
+        tracker = CommandTracker(AckConfig(timeout_ms=200, retries=1))
+        serial = FakeSerial()
+        loop = asyncio.get_running_loop()
+        serial.on_send = lambda cmd: loop.call_later(0.01, tracker.on_ack, {"type": "ack", "seq": cmd["seq"]}, "safety")
+        result = await tracker.send(serial, {"seq": 5, "set": {"drain_valve": 1}}, wait=True)
+        return result, serial, tracker.stats()
+
+    result, serial, stats = asyncio.run(run())
+    assert result.status == "acked"
+    assert result.ok
+    assert result.attempts == 1
+    assert 5 <= result.latency_ms < 200
+    assert len(serial.sent) == 1
+    assert stats["safety"]["acked"] == 1
+    assert stats["safety"]["inflight"] == 0
+    assert stats["safety"]["latency"]["count"] == 1
+
+
+def test_retries_then_times_out_and_counts_nacks() -> None:
+    async def run():
+        tracker = CommandTracker(AckConfig(timeout_ms=20, retries=2))
+        serial = FakeSerial()
+        timeout = await tracker.send(serial, {"seq": 1}, wait=True)
+        serial.on_send = lambda cmd: tracker.on_ack({"type": "ack", "seq": cmd["seq"], "ok": False}, "safety")
+        nack = await tracker.send(serial, {"seq": 2}, wait=True)
+        tracker.on_ack({"type": "ack", "seq": 99}, "safety")
+        offline = await tracker.send(FakeSerial("student", connected=False), {"seq": 1}, wait=True)
+        simulated = await tracker.send(FakeSerial(simulated=True), {"seq": 3}, wait=True)
+        return timeout, nack, offline, simulated, serial, tracker.stats()
+
+    timeout, nack, offline, simulated, serial, stats = asyncio.run(run())
+    assert timeout.status == "timeout"
+    assert timeout.attempts == 3
+    assert [cmd["seq"] for cmd in serial.sent] == [1, 1, 1, 2]
+    assert nack.status == "nack"
+    assert not nack.ok
+    assert offline.status == "offline"
+    assert simulated.ok
+    assert stats["safety"]["timeouts"] == 1
+    assert stats["safety"]["retries"] == 2
+    assert stats["safety"]["nacked"] == 1
+    assert stats["safety"]["unmatched_acks"] == 1
+    assert stats["student"]["offline"] == 1
+
+
+def test_latency_histogram_percentiles() -> None:
+    histogram = LatencyHistogram()
+    for value in [0.5] * 90 + [30] * 9 + [4000]:
+        histogram.add(value)
+    stats = histogram.as_dict()
+    assert stats["p50_ms"] == 1
+    assert stats["p95_ms"] == 50
+    assert stats["p99_ms"] == 50
+    assert stats["buckets"]["le_5000"] == 1
+    assert stats["max_ms"] == 4000
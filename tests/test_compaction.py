@@ -0,0 +1,99 @@
+import asyncio
+import json
+import sqlite3
+from pathlib import Path
+
+from app.services.compaction import CompactionConfig, CompactionService
+from app.services.db import Database, TelemetryRecord
+from app.services.telemetry_history import HistoryQuery, TelemetryHistory
+
+
+def _record(ts: int, t1: float) -> TelemetryRecord:
+    return TelemetryRecord(
+        ts=ts,
+        t1=t1,
+        t2=None,
+        t3=None,
+        p1=None,
+        p2=None,
+        flow=None,
+        heater=10,
+        pump=None,
+        fan1=None,
+        fan2=None,
+        fan3=None,
+        fault=0,
+        drain_valve=None,
+        source_device="safety",
+    )
+
+
+def test_compaction_rolls_up_and_prunes(tmp_path: Path) -> None:
+    db_path = tmp_path / "db.sqlite"
+    span_ms = 10 * 60 * 1000
+
+    async def run() -> tuple[dict, dict]:
+        db = Database(str(db_path))
+        await db.start()
+        for ts in range(0, span_ms, 200):
+            await db.insert_telemetry(_record(ts, float((ts // 1000) % 60)))
+        await db.flush()
+        config = CompactionConfig(raw_retention_s=60, agg_1s_retention_s=3600, interval_s=60, batch_rows=500)
+        service = CompactionService(db, config)
+        await service.run_once(now_ms=span_ms + 10000)
+        history = TelemetryHistory(db)
+        query = HistoryQuery(start_ms=0, end_ms=span_ms, fields=["t1", "heater"], max_points=10)
+        plan = await history.plan(query)
+        body = "".join([chunk async for chunk in history.stream_json(query)])
+        await db.stop()
+        return {"plan": plan, "stats": service.stats()}, json.loads(body)
+
+    info, result = asyncio.run(run())
+    assert info["plan"][0][0] == "telemetry_1m"
+    assert info["stats"]["pruned_rows"]["telemetry"] > 0
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM telemetry_1s").fetchone()[0] == 600
+    assert conn.execute("SELECT COUNT(*) FROM telemetry_1m").fetchone()[0] == 10
+    assert conn.execute("SELECT MIN(ts) FROM telemetry").fetchone()[0] >= span_ms + 10000 - 60000
+
+    points = result["points"]
+    assert len(points) == 10
+    assert sum(point["n"] for point in points) == span_ms // 200
+    assert points[0]["t1_min"] == 0.0
+    assert points[0]["t1_max"] == 59.0
+    assert points[0]["t1"] == 29.5
+    assert points[0]["heater"] == 10.0
+
+
+def test_history_falls_back_to_coarser_tier_past_retention(tmp_path: Path) -> None:
+    span_ms = 10 * 60 * 1000
+
+    async def run(agg_1s_retention_s: int, max_points: int) -> tuple[list, dict]:
+        db = Database(str(tmp_path / f"db-{agg_1s_retention_s}.sqlite"))
+        await db.start()
+        for ts in range(0, span_ms, 200):
+            await db.insert_telemetry(_record(ts, float((ts // 1000) % 60)))
+        await db.flush()
+        config = CompactionConfig(
+            raw_retention_s=60,
+            agg_1s_retention_s=agg_1s_retention_s,
+            interval_s=60,
+            batch_rows=500,
+        )
+        await CompactionService(db, config).run_once(now_ms=2 * 24 * 3600 * 1000)
+        history = TelemetryHistory(db)
+        query = HistoryQuery(start_ms=0, end_ms=span_ms, fields=["t1"], max_points=max_points)
+        plan = await history.plan(query)
+        body = "".join([chunk async for chunk in history.stream_json(query)])
+        await db.stop()
+        return plan, json.loads(body)
+
+    plan, result = asyncio.run(run(agg_1s_retention_s=3600, max_points=1500))
+    assert [segment[0] for segment in plan] == ["telemetry_1m"]
+    assert len(result["points"]) == 10
+    assert sum(point["n"] for point in result["points"]) == span_ms // 200
+
+    plan, result = asyncio.run(run(agg_1s_retention_s=30 * 24 * 3600, max_points=6000))
+    assert [segment[0] for segment in plan] == ["telemetry_1s"]
+    assert len(result["points"]) == 600
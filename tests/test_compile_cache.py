@@ -0,0 +1,155 @@
+import asyncio
+import dataclasses
+import json
+import stat
+from pathlib import Path
+
+import pytest
+
+from app.config import settings
+from app.services import flashing_service
+from app.services.compile_cache import CompileCache, sketch_key
+from app.services.flashing_service import FlashingService
+
+FAKE_CLI = """#!/bin/sh
+echo "$@" >> "{log}"
+if [ "$1" = "compile" ]; then
+  out=""
+  prev=""
+  for arg in "$@"; do
+    if [ "$prev" = "--output-dir" ]; then out="$arg"; fi
+    prev="$arg"
+  done
+  name=$(basename "$prev")
+  if [ -n "$out" ]; then head -c 1500 /dev/zero > "$out/$name.ino.hex"; fi
+  echo "compiled $name"
+fi
+"""
+
+
+@pytest.fixture
+def fake_cli(tmp_path: Path, monkeypatch) -> Path:
+    log = tmp_path / "cli.log"
+    script = tmp_path / "arduino-cli"
+    script.write_text(FAKE_CLI.format(log=log))
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    patched = dataclasses.replace(
+        settings,
+        arduino_cli_path=str(script),
+        upload_enabled=True,
+        data_dir=str(tmp_path / "data"),
+        student_port="/dev/ttyFAKE",
+    )
+    monkeypatch.setattr(flashing_service, "settings", patched)
+    return log
+
+
+def _sketch(tmp_path: Path, name: str, body: str) -> Path:
+    path = tmp_path / f"{name}.ino"
+    path.write_text(body)
+    return path
+
+
+def test_repeated_upload_skips_compile(tmp_path: Path, fake_cli: Path) -> None:
+    async def run():
+        service = FlashingService(CompileCache(tmp_path / "cache", 10_000_000))
+        sketch = _sketch(tmp_path, "blink", "void setup(){} void loop(){}")
+        first = await service.flash_sketch(sketch, "arduino:avr:uno", None)
+        second = await service.flash_sketch(sketch, "arduino:avr:uno", None)
+        other_board = await service.flash_sketch(sketch, "arduino:avr:nano", None)
+        sketch.write_text("void setup(){} void loop(){ delay(1); }")
+        changed = await service.flash_sketch(sketch, "arduino:avr:uno", None)
+        return first, second, other_board, changed, service.cache.stats()
+
+    first, second, other_board, changed, stats = asyncio.run(run())
+    assert first.ok and not first.cached
+    assert "compiled blink" in first.compile_stdout
+    assert second.ok and second.cached
+    assert second.message == "uploaded"
+    assert not other_board.cached
+    assert not changed.cached
+    calls = fake_cli.read_text().splitlines()
+    assert sum(call.startswith("compile") for call in calls) == 3
+    uploads = [call for call in calls if call.startswith("upload")]
+    assert len(uploads) == 4
+    assert uploads[0].split()[6] == uploads[1].split()[6]
+    assert "--input-dir " + str(tmp_path / "cache") in uploads[1]
+    assert stats["hits"] == 1
+    assert stats["misses"] == 3
+    assert stats["entries"] == 3
+
+
+def test_baseline_is_precompiled(tmp_path: Path, fake_cli: Path, monkeypatch) -> None:
+    baseline = _sketch(tmp_path, "baseline", "void setup(){} void loop(){}")
+    monkeypatch.setattr(FlashingService, "_find_baseline_file", lambda self: baseline)
+
+    async def run():
+        service = FlashingService(CompileCache(tmp_path / "cache", 10_000_000))
+        warm = await service.precompile_baseline()
+        flashed = await service.flash_baseline()
+        return warm, flashed
+
+    warm, flashed = asyncio.run(run())
+    assert warm.ok and warm.message == "baseline precompiled"
+    assert flashed.ok and flashed.cached
+    calls = fake_cli.read_text().splitlines()
+    assert [call.split()[0] for call in calls] == ["compile", "upload"]
+
+
+def test_lru_eviction_by_size_and_reload(tmp_path: Path) -> None:
+    cache = CompileCache(tmp_path / "cache", max_bytes=3000)
+
+    def build(name: str) -> Path:
+        build_dir = cache.staging_dir()
+        (build_dir / f"{name}.ino.hex").write_bytes(b"\0" * 1000)
+        return cache.store(name, build_dir, {"sketch": name})
+
+    build("a")
+    build("b")
+    assert cache.lookup("a") is not None
+    build("c")
+    assert cache.stats()["evictions"] == 1
+    assert cache.lookup("b") is None
+    assert not (tmp_path / "cache" / "b").exists()
+    assert json.loads((tmp_path / "cache" / "c" / "meta.json").read_text())["sketch"] == "c"
+
+    reopened = CompileCache(tmp_path / "cache", max_bytes=3000)
+    assert reopened.stats()["entries"] == 2
+    assert reopened.lookup("a") is not None
+
+
+def test_key_depends_on_contents_and_fqbn(tmp_path: Path) -> None:
+    sketch_dir = tmp_path / "blink"
+    sketch_dir.mkdir()
+    (sketch_dir / "blink.ino").write_text("void setup(){}")
+    key = sketch_key(sketch_dir, "arduino:avr:uno")
+    assert key == sketch_key(sketch_dir, "arduino:avr:uno")
+    assert key != sketch_key(sketch_dir, "arduino:avr:nano")
+    (sketch_dir / "util.h").write_text("#define X 1")
+    assert key != sketch_key(sketch_dir, "arduino:avr:uno")
+
+
+def test_parallel_compiles_keep_index_consistent(tmp_path: Path, fake_cli: Path) -> None:
+    async def run():
+        cache = CompileCache(tmp_path / "cache", max_bytes=4000)
+        service = FlashingService(cache)
+        sketch_dirs = []
+        for index in range(8):
+            sketch_dirs.append(service.prepare(_sketch(tmp_path, f"s{index}", f"// {index}"), None))
+        builds = await asyncio.gather(*(service.compile(path, "arduino:avr:uno") for path in sketch_dirs))
+        pinned = [build.input_dir.exists() for build in builds]
+        for build in builds:
+            service.release(build)
+        cache.purge()
+        return cache, pinned
+
+    cache, pinned = asyncio.run(run())
+    assert all(pinned)
+    stats = cache.stats()
+    assert stats["stores"] == 8
+    assert stats["pinned"] == 0
+    assert stats["bytes"] <= 4000
+    assert stats["evictions"] == 8 - stats["entries"]
+    on_disk = list((tmp_path / "cache").iterdir())
+    assert len(on_disk) == stats["entries"]
+    assert all((path / "meta.json").exists() for path in on_disk)
@@ -0,0 +1,79 @@
+import asyncio
+import sqlite3
+from pathlib import Path
+
+from app.services.db import Database, TelemetryRecord
+
+
+def _record(ts: int) -> TelemetryRecord:
+    return TelemetryRecord(
+        ts=ts,
+        t1=20.0,
+        t2=21.0,
+        t3=22.0,
+        p1=1.0,
+        p2=1.0,
+        flow=2.0,
+        heater=0,
+        pump=0,
+        fan1=0,
+        fan2=0,
+        fan3=0,
+        fault=0,
+        drain_valve=0,
+        source_device="test",
+    )
+
+
+def test_group_commit_writer(tmp_path: Path) -> None:
+    db_path = tmp_path / "db.sqlite"
+
+    async def run() -> dict:
+        db = Database(str(db_path), batch_size=50, flush_interval_ms=1000)
+        await db.start()
+        for i in range(120):
+            await db.insert_telemetry(_record(i))
+        await db.insert_event("teacher", "heater_manual", {"power": 10})
+        await db.flush()
+        stats = db.stats()
+        await db.stop()
+        return stats
+
+    stats = asyncio.run(run())
+    assert stats["rows_written"] == 120
+    assert stats["events_written"] == 1
+    assert stats["max_batch_size"] <= 50
+    assert stats["batches"] >= 3
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("SELECT COUNT(*) FROM telemetry").fetchone()[0] == 120
+    assert conn.execute("SELECT action FROM events").fetchone()[0] == "heater_manual"
+
+
+def test_reader_pool_runs_alongside_writer(tmp_path: Path) -> None:
+    async def run() -> tuple[dict, int]:
+        db = Database(str(tmp_path / "db.sqlite"), readers=2)
+        await db.start()
+        for i in range(2000):
+            await db.insert_telemetry(_record(i))
+        await db.flush()
+        first = db.iter_query("SELECT ts FROM telemetry ORDER BY ts", chunk_size=100, label="scan")
+        second = db.iter_query("SELECT ts FROM telemetry ORDER BY ts", chunk_size=100, label="scan")
+        await first.__anext__()
+        await second.__anext__()
+        busy = db.stats()["readers"]["busy"]
+        for i in range(2000, 2100):
+            await db.insert_telemetry(_record(i))
+        await db.flush()
+        await first.aclose()
+        await second.aclose()
+        stats = db.stats()
+        await db.stop()
+        return stats, busy
+
+    stats, busy = asyncio.run(run())
+    assert busy == 2
+    assert stats["rows_written"] == 2100
+    assert stats["readers"]["busy"] == 0
+    assert stats["readers"]["queries"]["scan"]["count"] == 2
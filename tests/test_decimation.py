@@ -0,0 +1,56 @@
+import asyncio
+import json
+
+from app.services.decimation import RateTier
+from app.services.telemetry_service import TelemetryService
+from app.services.ws_clients import ChannelConfig
+from app.services.ws_protocol import Subscription
+from tests.test_ws_fanout import FakeWebSocket
+
+
+def test_rate_tier_modes() -> None:
+    mean = RateTier(1.0, "mean")
+    envelope = RateTier(1.0, "minmax")
+    latest = RateTier(1.0, "latest")
+    outputs: dict = {"mean": [], "minmax": [], "latest": []}
+    for i in range(50):
+        payload = {"type": "telemetry", "ts": i * 100, "t1": float(i), "fan": [i, 0, 0]}
+        now = i * 0.1
+        for name, tier in (("mean", mean), ("minmax", envelope), ("latest", latest)):
+            output = tier.push(payload, "safety", now=now)
+            if output is not None:
+                outputs[name].append(output)
+    assert [o["ts"] for o in outputs["latest"]] == [0, 1000, 2000, 3000, 4000]
+    assert outputs["mean"][1]["t1"] == 5.5
+    assert outputs["mean"][1]["window"] == 10
+    assert outputs["mean"][1]["fan"] == [5.5, 0.0, 0.0]
+    assert outputs["minmax"][1]["t1_min"] == 1.0
+    assert outputs["minmax"][1]["t1_max"] == 10.0
+    assert outputs["minmax"][1]["t1"] == 10.0
+
+
+def test_decimation_computed_once_per_tier() -> None:
+    async def run() -> tuple[dict, FakeWebSocket, FakeWebSocket]:
+        telemetry = TelemetryService(None, ChannelConfig(queue_size=256))
+        viewers = [FakeWebSocket() for _ in range(10)]
+        for ws in viewers:
+            await telemetry.register(ws, Subscription.parse("json", "t1", None, "2", "mean"))
+        logger = FakeWebSocket()
+        await telemetry.register(logger, Subscription.parse("f32", "t1", None, "2", "mean"))
+        control = FakeWebSocket()
+        await telemetry.register(control)
+        for i in range(20):
+            await telemetry._broadcast({"type": "telemetry", "ts": i, "t1": float(i)}, "safety")
+        await asyncio.sleep(0.01)
+        stats = telemetry.stats()
+        await telemetry.stop()
+        return stats, viewers[0], control
+
+    stats, viewer, control = asyncio.run(run())
+    tiers = {(tier["rate"], tier["mode"]): tier for tier in stats["rate_tiers"]}
+    assert tiers[(2.0, "mean")]["groups"] == 2
+    assert tiers[(2.0, "mean")]["frames_in"] == 20
+    assert tiers[(2.0, "mean")]["frames_out"] == 1
+    assert tiers[(0.0, "latest")]["frames_out"] == 20
+    assert len(control.messages) == 20
+    assert json.loads(viewer.messages[0])["mode"] == "mean"
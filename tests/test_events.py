@@ -0,0 +1,50 @@
+import asyncio
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from app.services.db import Database
+from app.services.event_log import EventLog, EventQuery
+
+
+def test_event_log_keyset_pagination_and_filters(tmp_path: Path) -> None:
+    async def run() -> tuple[list, dict, dict]:
+        db = Database(str(tmp_path / "db.sqlite"))
+        await db.start()
+        for i in range(25):
+            await db.insert_event("teacher", "heater_manual", {"power": i})
+        await db.insert_event("system", "fault", {"code": 7, "detail": {"sensor": "t1"}})
+        await db.flush()
+        log = EventLog(db)
+        pages = []
+        cursor = None
+        while True:
+            page = await log.query(EventQuery(action="heater_manual", cursor=cursor, limit=10))
+            pages.append(page["events"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        faults = await log.query(EventQuery(action="fault", path="$.detail.sensor", value="t1"))
+        power = await log.query(EventQuery(role="teacher", path="$.power", value="3"))
+        await db.stop()
+        return pages, faults, power
+
+    pages, faults, power = asyncio.run(run())
+    seen = [event["payload"]["power"] for page in pages for event in page]
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert seen == sorted(seen, reverse=True)
+    assert len(set(seen)) == 25
+    assert faults["events"][0]["payload"]["code"] == 7
+    assert [event["payload"]["power"] for event in power["events"]] == [3]
+
+    conn = sqlite3.connect(tmp_path / "db.sqlite")
+    sql, params = EventLog(None).build_sql(EventQuery(action="fault", cursor="10:5"))
+    plan = " ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+    assert "USING INDEX idx_events_" in plan
+    assert "SCAN events" not in plan
+
+
+def test_event_log_rejects_bad_json_path() -> None:
+    with pytest.raises(ValueError):
+        EventLog(None).build_sql(EventQuery(path="$.a'); DROP TABLE events; --"))
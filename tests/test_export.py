@@ -0,0 +1,62 @@
+import asyncio
+import io
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from app.services.db import Database, TelemetryRecord
+from app.services.telemetry_export import ExportQuery, TelemetryExporter
+
+
+def _record(ts: int, source_device: str) -> TelemetryRecord:
+    return TelemetryRecord(
+        ts=ts,
+        t1=ts / 10.0,
+        t2=None,
+        t3=None,
+        p1=None,
+        p2=None,
+        flow=None,
+        heater=ts % 100,
+        pump=None,
+        fan1=None,
+        fan2=None,
+        fan3=None,
+        fault=0,
+        drain_valve=None,
+        source_device=source_device,
+    )
+
+
+def _export(tmp_path: Path, fmt: str) -> bytes:
+    async def run() -> bytes:
+        db = Database(str(tmp_path / "db.sqlite"))
+        await db.start()
+        for ts in range(5000):
+            await db.insert_telemetry(_record(ts, "safety" if ts % 2 else "student"))
+        await db.flush()
+        exporter = TelemetryExporter(db, chunk_rows=700)
+        query = ExportQuery(start_ms=0, end_ms=4000)
+        data = b"".join([chunk async for chunk in exporter.stream(query, fmt)])
+        await db.stop()
+        return data
+
+    return asyncio.run(run())
+
+
+def test_export_npz_columns(tmp_path: Path) -> None:
+    archive = np.load(io.BytesIO(_export(tmp_path, "npz")))
+    assert archive["ts"].shape == (4000,)
+    assert archive["ts"][-1] == 3999
+    assert np.isnan(archive["t2"]).all()
+    assert archive["heater"][123] == 23
+    labels = archive["source_device_labels"]
+    assert labels[archive["source_device"][1]] == "safety"
+
+
+def test_export_arrow_stream(tmp_path: Path) -> None:
+    pa = pytest.importorskip("pyarrow")
+    table = pa.ipc.open_stream(_export(tmp_path, "arrow")).read_all()
+    assert table.num_rows == 4000
+    assert table.column("t1").to_pylist()[10] == 1.0
@@ -0,0 +1,61 @@
+import asyncio
+import json
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app.services.db import Database, TelemetryRecord
+from app.services.telemetry_history import HistoryQuery, TelemetryHistory
+
+
+def _record(ts: int, t1: float) -> TelemetryRecord:
+    return TelemetryRecord(
+        ts=ts,
+        t1=t1,
+        t2=None,
+        t3=None,
+        p1=None,
+        p2=None,
+        flow=None,
+        heater=0,
+        pump=None,
+        fan1=None,
+        fan2=None,
+        fan3=None,
+        fault=0,
+        drain_valve=None,
+        source_device="safety",
+    )
+
+
+def test_history_downsamples_into_buckets(tmp_path: Path) -> None:
+    async def run() -> dict:
+        db = Database(str(tmp_path / "db.sqlite"))
+        await db.start()
+        for i in range(10000):
+            await db.insert_telemetry(_record(i * 10, float(i % 100)))
+        await db.flush()
+        history = TelemetryHistory(db)
+        query = HistoryQuery(start_ms=0, end_ms=100000, fields=["t1"], max_points=100)
+        body = "".join([chunk async for chunk in history.stream_json(query)])
+        await db.stop()
+        return json.loads(body)
+
+    result = asyncio.run(run())
+    assert result["bucket_ms"] == 1000
+    assert len(result["points"]) == 100
+    point = result["points"][0]
+    assert point["n"] == 100
+    assert point["t1_min"] == 0.0
+    assert point["t1_max"] == 99.0
+    assert point["t1"] == 49.5
+
+
+def test_history_endpoint_rejects_unknown_fields() -> None:
+    from app.main import app
+
+    with TestClient(app) as client:
+        assert client.get("/api/telemetry/history", params={"fields": "bogus"}).status_code == 400
+        resp = client.get("/api/telemetry/history", params={"fields": "t1,t2", "format": "csv"})
+        assert resp.status_code == 200
+        assert resp.text.splitlines()[0].startswith("ts,source_device,n,t1,t1_min,t1_max")
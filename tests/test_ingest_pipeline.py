@@ -0,0 +1,39 @@
+import asyncio
+import time
+
+from app.services.ingest_pipeline import StageConfig
+from app.services.telemetry_service import TelemetryService
+from tests.test_ws_fanout import FakeWebSocket
+
+
+class SlowDatabase:
+    def __init__(self) -> None:
+        self.records: list = []
+
+    async def insert_telemetry(self, record) -> None:
+        await asyncio.sleep(0.05)
+        self.records.append(record)
+
+
+def test_update_broadcasts_without_waiting_for_persist() -> None:
+    async def run() -> tuple[float, FakeWebSocket, SlowDatabase, dict]:
+        db = SlowDatabase()
+        telemetry = TelemetryService(db, persist_stage=StageConfig(maxsize=4, overflow="drop_newest"))
+        await telemetry.start()
+        ws = FakeWebSocket()
+        await telemetry.register(ws)
+        started = time.perf_counter()
+        for i in range(20):
+            await telemetry.update({"type": "telemetry", "ts": i, "t1": 20.0}, "safety")
+        elapsed = time.perf_counter() - started
+        await asyncio.sleep(0.01)
+        stats = telemetry.stats()["pipeline"]
+        await telemetry.stop()
+        return elapsed, ws, db, stats
+
+    elapsed, ws, db, stats = asyncio.run(run())
+    assert elapsed < 0.05
+    assert len(ws.messages) == 20
+    assert stats["broadcast"]["processed"] == 20
+    assert stats["persist"]["dropped"] > 0
+    assert len(db.records) + stats["persist"]["dropped"] == 20
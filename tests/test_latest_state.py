@@ -0,0 +1,67 @@
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+from app.services.latest_state import LatestState
+
+
+def test_latest_state_merges_sources_with_field_timestamps() -> None:
+    state = LatestState()
+    state.update({"ts": 1000, "t1": 21.5, "drain_valve": 0}, "safety")
+    state.update({"ts": 1200, "pump": 120, "fan": [1, 2, 3]}, "student")
+    state.update({"ts": 1300, "t1": 22.0}, "safety")
+    snapshot = state.snapshot()
+    assert snapshot["values"]["t1"] == 22.0
+    assert snapshot["values"]["pump"] == 120
+    assert snapshot["values"]["fan2"] == 2
+    assert snapshot["field_ts"]["drain_valve"] == 1000
+    assert snapshot["field_source"]["pump"] == "student"
+    assert snapshot["ts"] == 1300
+    assert snapshot["sources"]["safety"]["frames"] == 2
+    student = state.snapshot(fields=["t1", "pump"], source="student")
+    assert student["values"] == {"pump": 120}
+
+
+def test_latest_state_wait_wakes_on_update() -> None:
+    async def run() -> tuple[bool, bool]:
+        state = LatestState()
+        etag = state.etag
+        timed_out = await state.wait(etag, 0.01)
+        waiter = asyncio.create_task(state.wait(etag, 1))
+        await asyncio.sleep(0)
+        state.update({"ts": 1, "t1": 1.0}, "safety")
+        return timed_out, await waiter
+
+    timed_out, woke = asyncio.run(run())
+    assert timed_out is False
+    assert woke is True
+
+
+def test_latest_endpoint_etag_and_long_poll() -> None:
+    from app.main import app
+
+    with TestClient(app) as client:
+        deadline = time.time() + 2
+        while time.time() < deadline:
+            response = client.get("/api/telemetry/latest", params={"fields": "t1,heater"})
+            if response.json()["values"]:
+                break
+            time.sleep(0.05)
+        body = response.json()
+        assert set(body["values"]) == {"t1", "heater"}
+        assert body["field_source"]["t1"] == "simulator"
+        etag = response.headers["etag"]
+        polled = client.get(
+            "/api/telemetry/latest",
+            params={"wait": 2},
+            headers={"If-None-Match": etag},
+        )
+        assert polled.status_code == 200
+        assert polled.headers["etag"] != etag
+        assert polled.json()["version"] > body["version"]
+        client.portal.call(app.state.simulator.stop)
+        time.sleep(0.05)
+        current = client.get("/api/telemetry/latest").headers["etag"]
+        cached = client.get("/api/telemetry/latest", headers={"If-None-Match": current})
+        assert cached.status_code == 304
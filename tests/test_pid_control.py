@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from app.services.command_queue import CommandQueue, QueueConfig
+from app.services.command_tracker import AckConfig, CommandTracker
+from app.services.pid_control import Pid, PidConfig
+from app.services.scenario_engine import ScenarioEngine
+from app.services.sim_clock import VirtualClock
+from app.services.telemetry_service import TelemetryService, TelemetrySimulator
+from tests.test_command_tracker import FakeSerial
+
+
+class NullDatabase:
+    async def insert_telemetry(self, record) -> None:
+        pass
+
+
+class InstantCommands:
+    def __init__(self) -> None:
+        self.sent: list = []
+
+    async def submit(self, values: dict, wait: bool = False, urgent: bool = False, on_sent=None, latest=False) -> None:
+        self.sent.append(dict(values))
+        if on_sent:
+            on_sent()
+
+
+def test_anti_windup_bounds_integral_during_saturation() -> None:
+    pid = Pid(PidConfig(setpoint=60, kp=5, ki=1.0))
+    for second in range(600):
+        assert pid.update(25.0, second) == 100
+    assert pid.saturated
+    assert pid.integral <= 100
+    output = pid.update(61.0, 600)
+    assert output < 100
+    with pytest.raises(ValueError):
+        PidConfig(field="p1")
+
+
+def test_closed_loop_holds_setpoint_on_simulator() -> None:
+    async def run():
+        clock = VirtualClock(warp=0, start=0)
+        telemetry = TelemetryService(NullDatabase())
+        await telemetry.start()
+        simulator = TelemetrySimulator(telemetry, rate_hz=5, seed=1, clock=clock, physics_hz=20)
+        commands = InstantCommands()
+        engine = ScenarioEngine(commands, simulator, clock, telemetry=telemetry)
+        control = engine.start_pid(PidConfig(field="t1", setpoint=33.0))
+        await simulator.start()
+        await clock.sleep(600)
+        stats = control.stats()
+        latest = telemetry.latest()
+        await engine.stop()
+        after = len(commands.sent)
+        await clock.sleep(1)
+        await simulator.stop()
+        await telemetry.stop()
+        await clock.stop()
+        return latest, commands.sent, stats, after
+
+    latest, sent, stats, after = asyncio.run(run())
+    assert latest["t1"] == pytest.approx(33.0, abs=0.5)
+    assert stats["frames"] == stats["commands"] == len(sent) - 1
+    assert stats["latency"]["count"] == stats["commands"]
+    assert 0 < sent[-2]["heater"] < 100
+    assert sent[-1] == {"heater": 0}
+    assert len(sent) == after
+
+
+def test_every_frame_bypasses_coalescing_window() -> None:
+    async def run():
+        serial = FakeSerial()
+        tracker = CommandTracker(AckConfig(timeout_ms=1000, retries=0))
+        queue = CommandQueue(serial, tracker, QueueConfig(coalesce_ms=200))
+        await queue.start()
+        telemetry = TelemetryService(NullDatabase())
+        await telemetry.start()
+        engine = ScenarioEngine(queue, None, telemetry=telemetry)
+        engine.start_pid(PidConfig(setpoint=40))
+        for index in range(10):
+            await telemetry.update({"type": "telemetry", "ts": index * 20, "t1": 30 + index}, "safety")
+            await telemetry.update({"type": "telemetry", "ts": index * 20, "t1": 10}, "student")
+            await asyncio.sleep(0.02)
+        stats = engine.stats()["pid"]
+        await engine.close()
+        await queue.stop()
+        await tracker.stop()
+        await telemetry.stop()
+        return serial.sent, stats
+
+    sent, stats = asyncio.run(run())
+    assert len(sent) == 10
+    assert sent[0]["set"]["heater"] == 80
+    assert stats["commands"] == 10
+    assert stats["latency"]["max_ms"] < 20
+
+
+def test_pid_api(tmp_path, monkeypatch) -> None:
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    from app.main import app
+
+    with TestClient(app) as client:
+        response = client.post("/api/teacher/heater/pid", json={"field": "t2", "setpoint": 30, "kp": 4})
+        assert response.status_code == 200
+        assert response.json()["pid"]["config"]["field"] == "t2"
+        assert client.post("/api/teacher/heater/pid", json={"field": "p1", "setpoint": 30}).status_code == 422
+        assert client.get("/api/metrics").json()["scenarios"]["pid"]["active"]
+        assert client.post("/api/teacher/heater/stop").status_code == 200
+        assert not client.get("/api/teacher/scenario").json()["pid"]["active"]
@@ -0,0 +1,79 @@
+import asyncio
+import json
+
+import pytest
+
+from app.services.command_queue import CommandQueue, QueueConfig
+from app.services.command_tracker import AckConfig, CommandTracker
+from app.services.serial_manager import SerialConfig, SerialManager
+from app.services.telemetry_service import TelemetryService
+from app.services.ws_protocol import Subscription
+from app.tools.pty_emulator import PtyEmulator
+from tests.test_ws_fanout import FakeWebSocket
+
+
+class NullDatabase:
+    async def insert_telemetry(self, record) -> None:
+        pass
+
+
+@pytest.mark.parametrize("protocol", ["0.1", "0.2"])
+def test_emulator_drives_serial_path_end_to_end(tmp_path, protocol: str) -> None:
+    async def run():
+        emulator = PtyEmulator(
+            rate_hz=500,
+            student_rate_hz=100,
+            protocol=protocol,
+            garbage=0.02,
+            partial=0.02,
+            link_dir=str(tmp_path),
+            seed=1,
+        )
+        paths = await emulator.start()
+        telemetry = TelemetryService(NullDatabase())
+        await telemetry.start()
+        ws = FakeWebSocket()
+        await telemetry.register(ws, Subscription(fields=("t1", "pump")))
+        tracker = CommandTracker(AckConfig(timeout_ms=500, retries=1))
+
+        async def on_message(payload: dict, source: str) -> None:
+            if payload.get("type") == "telemetry":
+                await telemetry.update(payload, source)
+            elif payload.get("type") == "ack":
+                tracker.on_ack(payload, source)
+
+        managers = {
+            name: SerialManager(SerialConfig(port=path, baudrate=115200, name=name), on_message, sim_mode=False)
+            for name, path in paths.items()
+        }
+        for manager in managers.values():
+            await manager.start()
+        queue = CommandQueue(managers["safety"], tracker, QueueConfig(coalesce_ms=10))
+        await queue.start()
+        while not all(manager.connected for manager in managers.values()):
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.5)
+        result = await queue.submit({"heater": 80}, wait=True)
+        await asyncio.sleep(0.05)
+        serial_stats = {name: manager.stats() for name, manager in managers.items()}
+        state = telemetry.state.snapshot()
+        await queue.stop()
+        for manager in managers.values():
+            await manager.stop()
+        await telemetry.stop()
+        emulator_stats = emulator.stats()
+        await emulator.stop()
+        return result, serial_stats, state, emulator_stats, ws
+
+    result, serial_stats, state, emulator_stats, ws = asyncio.run(run())
+    assert result.status == "acked"
+    assert emulator_stats["safety"]["commands"] == 1
+    assert state["values"]["heater"] == 80
+    assert state["field_source"]["pump"] == "student"
+    safety = serial_stats["safety"]
+    assert safety["protocol"] == protocol
+    assert safety["frames"] > 150
+    assert safety["parse_errors"] + safety["crc_errors"] > 0
+    assert serial_stats["student"]["frames"] > 30
+    sources = {json.loads(message).get("source") for message in ws.messages if isinstance(message, str)}
+    assert {"safety", "student"} <= sources
@@ -0,0 +1,177 @@
+import asyncio
+import time
+from pathlib import Path
+
+import pytest
+
+from app.services.db import Database, TelemetryRecord
+from app.services.replay import ReplayQuery, ReplaySource
+from app.services.sim_clock import VirtualClock
+from app.services.telemetry_service import TelemetryService
+
+
+def _record(ts: int, source_device: str) -> TelemetryRecord:
+    return TelemetryRecord(
+        ts=ts,
+        t1=ts / 10.0,
+        t2=None,
+        t3=None,
+        p1=None,
+        p2=None,
+        flow=None,
+        heater=ts % 100,
+        pump=None,
+        fan1=ts % 7 if source_device == "student" else None,
+        fan2=None,
+        fan3=None,
+        fault=0,
+        drain_valve=None,
+        source_device=source_device,
+    )
+
+
+class FakeSimulator:
+    def __init__(self) -> None:
+        self.calls: list = []
+
+    async def start(self) -> None:
+        self.calls.append("start")
+
+    async def stop(self) -> None:
+        self.calls.append("stop")
+
+
+async def _seed(db: Database, rows: int) -> None:
+    for ts in list(range(rows // 2, rows)) + list(range(rows // 2)):
+        await db.insert_telemetry(_record(ts, "safety" if ts % 2 else "student"))
+    await db.flush()
+
+
+def test_max_speed_replay_streams_range_in_order_without_persisting(tmp_path: Path) -> None:
+    async def run():
+        db = Database(str(tmp_path / "db.sqlite"))
+        await db.start()
+        await _seed(db, 5000)
+        await db.insert_event("teacher", "heater_manual", {"power": 40})
+        await db.run_write(
+            lambda conn: conn.execute(
+                "INSERT INTO events (ts, role, action, payload_json) VALUES (2000, 'system', 'fault', '{\"code\": 3}')"
+            )
+        )
+        await db.flush()
+        telemetry = TelemetryService(db)
+        await telemetry.start()
+        received = []
+
+        async def record(payload: dict, source: str) -> None:
+            received.append((payload, source))
+
+        telemetry.subscribe(record)
+        events = []
+
+        async def on_event(event: dict) -> None:
+            events.append(event)
+
+        simulator = FakeSimulator()
+        replay = ReplaySource(db, telemetry, simulator=simulator, chunk_rows=700, prefetch_chunks=2, on_event=on_event)
+        started = time.monotonic()
+        await replay.start(ReplayQuery(start_ms=100, end_ms=4100, speed=0, rebase=False))
+        await replay.wait()
+        elapsed = time.monotonic() - started
+        stats = replay.stats()
+        await telemetry.stop()
+        await db.flush()
+        count = await db.run_write(lambda conn: conn.execute("SELECT COUNT(*) FROM telemetry").fetchone()[0])
+        await db.stop()
+        return received, events, stats, count, simulator.calls, elapsed
+
+    received, events, stats, count, calls, elapsed = asyncio.run(run())
+    assert [payload["ts"] for payload, _ in received] == list(range(100, 4100))
+    first = {"type": "telemetry", "ver": "0.1", "ts": 100, "t1": 10.0, "heater": 0, "fault": 0, "fan": [2, None, None]}
+    assert received[0] == ({**first, "source": "student"}, "student")
+    assert "fan" not in received[1][0]
+    assert count == 5000
+    assert events == [{"ts": 2000, "role": "system", "action": "fault", "payload": {"code": 3}}]
+    assert stats["events"] == 1
+    assert stats["state"] == "done"
+    assert stats["frames"] == 4000
+    assert stats["chunks"] == 6 + 1
+    assert stats["progress"] == 1.0
+    assert calls == ["stop", "start"]
+    assert elapsed < 10
+
+
+def test_replay_follows_recorded_timing_at_speed(tmp_path: Path) -> None:
+    async def run(speed: float, clock=None):
+        db = Database(str(tmp_path / f"db-{speed}.sqlite"))
+        await db.start()
+        for ts in range(1_000_000, 1_002_000, 20):
+            await db.insert_telemetry(_record(ts, "safety"))
+        await db.flush()
+        telemetry = TelemetryService(db)
+        await telemetry.start()
+        replay = ReplaySource(db, telemetry, clock=clock, chunk_rows=16)
+        started = time.monotonic()
+        await replay.start(ReplayQuery(start_ms=1_000_000, end_ms=1_002_000, source_device="safety", speed=speed))
+        await replay.wait()
+        elapsed = time.monotonic() - started
+        latest = telemetry.latest()
+        virtual_now = clock.monotonic() if clock else None
+        await telemetry.stop()
+        await db.stop()
+        return elapsed, replay.stats(), latest, virtual_now
+
+    elapsed, stats, latest, _ = asyncio.run(run(10))
+    assert 0.15 < elapsed < 1.0
+    assert stats["frames"] == 100
+    assert abs(latest["ts"] - time.time() * 1000) < 1000
+
+    clock = VirtualClock(warp=0, start=5_000)
+    _, stats, latest, virtual_now = asyncio.run(run(1, clock))
+    assert virtual_now == pytest.approx(1.98)
+    assert latest["ts"] == 5_000_000 + 1980
+    assert stats["lag"]["max_ms"] == 0
+
+
+def test_replay_api(tmp_path: Path, monkeypatch) -> None:
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    from app.main import app
+
+    with TestClient(app) as client:
+        assert client.post("/api/telemetry/replay", params={"from": 10, "to": 5}).status_code == 400
+        started = client.post("/api/telemetry/replay", params={"from": 0, "to": 1000, "speed": 0})
+        assert started.status_code == 200
+        for _ in range(50):
+            if client.get("/api/telemetry/replay").json()["state"] == "done":
+                break
+            time.sleep(0.02)
+        assert client.get("/api/telemetry/replay").json()["state"] == "done"
+        assert client.delete("/api/telemetry/replay").json()["ok"]
+        assert client.get("/api/metrics").json()["replay"]["state"] == "done"
+
+
+def test_replayed_events_reach_websocket_clients(tmp_path: Path, monkeypatch) -> None:
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    from app.main import app
+
+    with TestClient(app) as client:
+        now_ms = int(time.time() * 1000)
+        assert client.post("/api/teacher/heater/stop").status_code == 200
+        for _ in range(50):
+            if client.get("/api/events", params={"action": "heater_stop", "since": now_ms}).json()["events"]:
+                break
+            time.sleep(0.02)
+        with client.websocket_connect("/ws/telemetry") as ws:
+            params = {"from": now_ms - 1000, "to": now_ms + 5000, "speed": 0}
+            assert client.post("/api/telemetry/replay", params=params).status_code == 200
+            for _ in range(1000):
+                message = ws.receive_json()
+                if message.get("type") == "event":
+                    break
+        assert message["replay"] is True
+        assert message["action"] == "heater_stop"
+        assert message["role"] == "teacher"
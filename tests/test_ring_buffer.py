@@ -0,0 +1,46 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from app.services.ring_buffer import TelemetryRing, TelemetryRingStore
+
+
+def test_ring_wraps_and_keeps_newest() -> None:
+    ring = TelemetryRing(capacity=5, fields=("t1", "heater"))
+    for i in range(8):
+        ring.append(i * 100, {"t1": float(i), "heater": None if i % 2 else i})
+    ts, values = ring.window()
+    assert ts.tolist() == [300, 400, 500, 600, 700]
+    assert values[0].tolist() == [3.0, 4.0, 5.0, 6.0, 7.0]
+    ts, _ = ring.window(since_ms=550)
+    assert ts.tolist() == [600, 700]
+
+
+def test_ring_store_snapshot_is_columnar_and_decimated() -> None:
+    store = TelemetryRingStore(seconds=60, max_rate_hz=10, max_points=50)
+    for i in range(500):
+        store.append({"ts": 1_000_000 + i * 100, "t1": float(i), "fan": [1, 2, 3]}, "safety")
+    snapshot = store.snapshot(fields=["t1", "fan2", "t2"], now_ms=1_000_000 + 500 * 100)
+    columns = snapshot["sources"]["safety"]
+    assert snapshot["type"] == "backfill"
+    assert len(columns["ts"]) == 50
+    assert columns["t1"][-1] == 499.0
+    assert columns["fan2"][0] == 2.0
+    assert columns["t2"][0] is None
+
+
+def test_recent_endpoint_and_ws_backfill() -> None:
+    from app.main import app
+
+    with TestClient(app) as client:
+        deadline = time.time() + 2
+        while time.time() < deadline:
+            body = client.get("/api/telemetry/recent", params={"seconds": 30, "fields": "t1,t3"}).json()
+            if body["sources"]:
+                break
+            time.sleep(0.05)
+        assert body["sources"]["simulator"]["t3"]
+        with client.websocket_connect("/ws/telemetry?proto=json&fields=t1&backfill=30") as ws:
+            messages = [ws.receive_json() for _ in range(3)]
+        backfill = [m for m in messages if m["type"] == "backfill"][0]
+        assert set(backfill["sources"]["simulator"]) == {"ts", "t1"}
@@ -0,0 +1,115 @@
+import json
+
+import pytest
+
+from app.services.serial_protocol import (
+    ACK_BODY,
+    KIND_ACK,
+    StreamDecoder,
+    cobs_decode,
+    cobs_encode,
+    decode_frame,
+    encode_command,
+    encode_frame,
+    encode_telemetry,
+)
+
+PAYLOAD = {
+    "type": "telemetry",
+    "ver": "0.1",
+    "ts": 1710000000000,
+    "t1": 23.4,
+    "t2": 25.1,
+    "t3": -4.25,
+    "p1": 1.02,
+    "p2": 0.98,
+    "flow": 3.4,
+    "heater": 0,
+    "pump": 120,
+    "fan": [80, 81, 82],
+    "drain_valve": 0,
+    "fault": 0,
+}
+
+
+@pytest.mark.parametrize("data", [b"", b"\x00", b"\x11\x00\x22", bytes(range(1, 255)), bytes(range(256)) * 2])
+def test_cobs_round_trip(data: bytes) -> None:
+    encoded = cobs_encode(data)
+    assert b"\x00" not in encoded
+    assert cobs_decode(encoded) == data
+
+
+def test_telemetry_frame_matches_json_payload() -> None:
+    frame = encode_telemetry(PAYLOAD, seq=7)
+    assert frame.endswith(b"\x00")
+    assert len(frame) < len(json.dumps(PAYLOAD)) / 4
+    decoded = decode_frame(frame[:-1])
+    assert decoded["type"] == "telemetry"
+    assert decoded["ver"] == "0.2"
+    assert decoded["seq"] == 7
+    for field in ("ts", "t1", "t2", "t3", "p1", "p2", "flow", "heater", "pump", "fan", "drain_valve", "fault"):
+        assert decoded[field] == PAYLOAD[field]
+
+
+def test_partial_frames_omit_missing_fields() -> None:
+    decoded = decode_frame(encode_telemetry({"ts": 5, "pump": 10, "fan": [1, 2, 3]})[:-1])
+    assert "t1" not in decoded
+    assert decoded["pump"] == 10
+    assert decoded["fan"] == [1, 2, 3]
+    command = decode_frame(encode_command({"seq": 3, "ts": 9, "set": {"drain_valve": 1}})[:-1])
+    assert command["type"] == "cmd"
+    assert command["set"] == {"drain_valve": 1}
+
+
+def test_stream_decoder_detects_binary_and_counts_errors() -> None:
+    decoder = StreamDecoder()
+    good = encode_telemetry(PAYLOAD, seq=1)
+    corrupt = bytearray(encode_telemetry(PAYLOAD, seq=2))
+    corrupt[5] ^= 0x01
+    ack = encode_frame(KIND_ACK, 3, 10, ACK_BODY.pack(1))
+    stream = b"\x05\x99\x00" + good + bytes(corrupt) + good[:10]
+    payloads = decoder.feed(stream)
+    payloads += decoder.feed(good[10:] + ack)
+    assert decoder.protocol == "0.2"
+    assert [payload["type"] for payload in payloads] == ["telemetry", "telemetry", "ack"]
+    assert payloads[2]["ok"] is True
+    assert decoder.crc_errors == 1
+    assert decoder.resyncs == 1
+    assert decoder.encode_command({"seq": 1, "set": {"heater": 5}}).endswith(b"\x00")
+
+
+def test_stream_decoder_keeps_json_lines() -> None:
+    decoder = StreamDecoder()
+    payloads = decoder.feed((json.dumps(PAYLOAD) + "\n").encode() + b"{bad\n")
+    assert decoder.protocol == "0.1"
+    assert payloads == [PAYLOAD]
+    assert decoder.parse_errors == 1
+    assert decoder.encode_command({"seq": 1}) == b'{"seq": 1}\n'
+
+
+def test_stray_zero_byte_does_not_switch_json_port_to_binary() -> None:
+    decoder = StreamDecoder()
+    line = (json.dumps(PAYLOAD) + "\n").encode()
+    payloads = decoder.feed(line)
+    payloads += decoder.feed(b"\xf0\x00")
+    for _ in range(5):
+        payloads += decoder.feed(line)
+    assert decoder.protocol == "0.1"
+    assert len(payloads) == 5
+    assert decoder.encode_command({"seq": 1}) == b'{"seq": 1}\n'
+
+
+def test_binary_port_falls_back_to_json() -> None:
+    decoder = StreamDecoder()
+    decoder.feed(encode_telemetry(PAYLOAD, seq=1))
+    assert decoder.protocol == "0.2"
+    payloads = decoder.feed((json.dumps(PAYLOAD) + "\n").encode())
+    assert decoder.protocol == "0.1"
+    assert payloads == [PAYLOAD]
+
+    decoder = StreamDecoder()
+    decoder.feed(encode_telemetry(PAYLOAD, seq=1))
+    for _ in range(8):
+        decoder.feed(b"\x03\x01\x02\x00")
+    assert decoder.protocol == "0.1"
+    assert decoder.resyncs == 9
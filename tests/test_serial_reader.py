@@ -0,0 +1,67 @@
+import asyncio
+import json
+import os
+import pty
+import time
+import tty
+
+from app.services.serial_manager import SerialConfig, SerialManager
+from app.services.serial_protocol import LineFramer
+
+
+def test_line_framer_handles_split_and_batched_lines() -> None:
+    framer = LineFramer(max_line=32)
+    assert framer.feed(b'{"a":') == []
+    assert framer.feed(b'1}\n{"b":2}\n\n{"c"') == [b'{"a":1}', b'{"b":2}']
+    assert framer.feed(b":3}\r\n") == [b'{"c":3}']
+    assert framer.feed(b"x" * 40) == []
+    assert framer.overflows == 1
+    assert framer.feed(b'{"d":4}\n') == [b'{"d":4}']
+
+
+def test_fd_reader_delivers_frames_and_writes_commands() -> None:
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    path = os.ttyname(slave)
+
+    async def run() -> tuple[list, list, SerialManager, bytes]:
+        received: list = []
+        latencies: list = []
+        arrived = asyncio.Event()
+
+        async def on_message(payload: dict, source: str) -> None:
+            latencies.append(time.perf_counter() - payload.pop("_sent"))
+            received.append((payload, source))
+            if len(received) == 3:
+                arrived.set()
+
+        manager = SerialManager(SerialConfig(port=path, baudrate=115200, name="safety"), on_message, sim_mode=False)
+        await manager.start()
+        while not manager.connected:
+            await asyncio.sleep(0.005)
+        loop = asyncio.get_running_loop()
+        for i in range(3):
+            os.write(master, b'{"type":"telemetry",')
+            await asyncio.sleep(0.01)
+            os.write(master, f'"t1":{i},"_sent":{time.perf_counter()}}}\n'.encode())
+        os.write(master, b"garbage\n")
+        await asyncio.wait_for(arrived.wait(), 2)
+        await manager.send_command(manager.build_cmd(1, {"heater": 10}))
+        command = await loop.run_in_executor(None, os.read, master, 4096)
+        await asyncio.sleep(0.01)
+        await manager.stop()
+        return received, latencies, manager, command
+
+    try:
+        received, latencies, manager, command = asyncio.run(run())
+    finally:
+        os.close(master)
+        os.close(slave)
+    assert manager.mode == "off"
+    assert manager.state == "idle"
+    assert [payload["t1"] for payload, _ in received] == [0, 1, 2]
+    assert received[0][1] == "safety"
+    assert manager.stats()["parse_errors"] >= 1
+    assert manager.stats()["protocol"] == "0.1"
+    assert max(latencies) < 0.05
+    assert json.loads(command)["set"] == {"heater": 10}
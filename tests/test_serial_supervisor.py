@@ -0,0 +1,125 @@
+import asyncio
+import os
+import pty
+import time
+import tty
+from pathlib import Path
+
+from app.services.serial_manager import SerialConfig, SerialManager
+
+
+def _plug(link: Path, pair: tuple[int, int] | None = None) -> tuple[int, int]:
+    master, slave = pair or pty.openpty()
+    tty.setraw(slave)
+    tmp = link.with_suffix(".tmp")
+    os.symlink(os.ttyname(slave), tmp)
+    os.replace(tmp, link)
+    return master, slave
+
+
+async def _until(predicate, timeout: float = 2.0) -> float:
+    started = time.monotonic()
+    while not predicate():
+        if time.monotonic() - started > timeout:
+            raise AssertionError("condition not reached")
+        await asyncio.sleep(0.005)
+    return time.monotonic() - started
+
+
+def test_supervisor_reconnects_after_unplug_and_late_plug(tmp_path: Path) -> None:
+    link = tmp_path / "ttyACM0"
+
+    async def run():
+        received = []
+        states = []
+
+        async def on_message(payload: dict, source: str) -> None:
+            received.append(payload["n"])
+
+        async def on_state(device: str, transition: dict) -> None:
+            states.append(transition["to"])
+
+        manager = SerialManager(
+            SerialConfig(port=str(link), baudrate=115200, name="safety", reconnect_min_ms=20, reconnect_max_ms=200),
+            on_message,
+            sim_mode=False,
+            on_state=on_state,
+        )
+        await manager.start()
+        await _until(lambda: manager.open_failures >= 2)
+        assert manager.state == "disconnected"
+
+        master, slave = _plug(link)
+        await _until(lambda: manager.connected)
+        os.write(master, b'{"n":1}\n')
+        await _until(lambda: received == [1])
+
+        replacement = pty.openpty()
+        os.close(master)
+        os.close(slave)
+        await _until(lambda: manager.state == "disconnected")
+        link.unlink()
+        await asyncio.sleep(0.1)
+        master, slave = _plug(link, replacement)
+        recovery = await _until(lambda: manager.connected)
+        os.write(master, b'{"n":2}\n')
+        await _until(lambda: received == [1, 2])
+
+        async with manager.released():
+            assert manager.state == "released"
+            assert not manager.connected
+            await manager.send_command({"seq": 1})
+        await _until(lambda: manager.connected)
+        await asyncio.sleep(0)
+        stats = manager.stats()
+        await manager.stop()
+        os.close(master)
+        os.close(slave)
+        return recovery, stats, states
+
+    recovery, stats, states = asyncio.run(run())
+    assert recovery < 0.5
+    assert stats["connects"] == 3
+    assert stats["disconnects"] == 2
+    assert stats["reenumerations"] == 1
+    assert stats["downtime_ms"] > 100
+    assert states[:4] == ["disconnected", "connected", "disconnected", "connected"]
+    assert "released" in states
+
+
+def test_release_waits_for_open_in_progress(tmp_path: Path) -> None:
+    async def run():
+        manager = SerialManager(
+            SerialConfig(port=str(tmp_path / "missing"), baudrate=115200, name="student", reconnect_min_ms=10),
+            lambda payload, source: asyncio.sleep(0),
+            sim_mode=False,
+        )
+        opening = []
+        overlaps = []
+        released = asyncio.Event()
+
+        async def slow_open():
+            opening.append(True)
+            if released.is_set():
+                overlaps.append("open during release")
+            await asyncio.sleep(0.1)
+            if released.is_set():
+                overlaps.append("open finished during release")
+            opening.pop()
+            return None
+
+        manager._open = slow_open
+        await manager.start()
+        await _until(lambda: manager.open_failures >= 1 and opening)
+        assert manager.state == "disconnected"
+        async with manager.released():
+            released.set()
+            assert not opening
+            await asyncio.sleep(0.2)
+            released.clear()
+        failures = manager.open_failures
+        await _until(lambda: manager.open_failures > failures)
+        await manager.stop()
+        return overlaps
+
+    assert asyncio.run(run()) == []
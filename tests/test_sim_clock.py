@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+from app.services.scenario_engine import RandomScenarioConfig, ScenarioEngine
+from app.services.sim_clock import VirtualClock
+from app.services.telemetry_service import TelemetrySimulator
+
+
+class RecordingTelemetry:
+    def __init__(self) -> None:
+        self.frames: list = []
+
+    async def update(self, payload: dict, source: str) -> None:
+        self.frames.append((payload, source))
+
+
+class RecordingCommands:
+    def __init__(self) -> None:
+        self.sent: list = []
+
+    async def submit(self, values: dict, wait: bool = False) -> None:
+        self.sent.append(dict(values))
+
+
+def test_virtual_clock_orders_sleepers_by_deadline() -> None:
+    async def run():
+        clock = VirtualClock(warp=0, start=0)
+        order = []
+
+        async def sleeper(name: str, delay: float) -> None:
+            await clock.sleep(delay)
+            order.append((name, clock.monotonic()))
+
+        await asyncio.gather(sleeper("late", 3600), sleeper("early", 1.5), sleeper("tie", 1.5))
+        await clock.stop()
+        return order
+
+    started = time.monotonic()
+    order = asyncio.run(run())
+    assert time.monotonic() - started < 1
+    assert order == [("early", 1.5), ("tie", 1.5), ("late", 3600)]
+
+
+def test_time_warp_scales_wall_time() -> None:
+    async def run():
+        clock = VirtualClock(warp=20, start=0)
+        started = time.monotonic()
+        await clock.sleep(2.0)
+        elapsed = time.monotonic() - started
+        await clock.stop()
+        return elapsed
+
+    elapsed = asyncio.run(run())
+    assert 0.08 < elapsed < 0.5
+
+
+def _run_scenario(seed: int, minutes: float) -> tuple:
+    async def run():
+        clock = VirtualClock(warp=0, start=1_700_000_000)
+        telemetry = RecordingTelemetry()
+        commands = RecordingCommands()
+        simulator = TelemetrySimulator(telemetry, rate_hz=5, seed=seed, clock=clock, physics_hz=20)
+        engine = ScenarioEngine(commands, simulator, clock, seed=seed)
+        await simulator.start()
+        await engine.start_random(RandomScenarioConfig(20, 100, 30, 120, 30, 120))
+        await clock.sleep(minutes * 60)
+        engine.cancel()
+        await simulator.stop()
+        await clock.stop()
+        return telemetry.frames, commands.sent, simulator.stats()
+
+    return asyncio.run(run())
+
+
+def test_long_scenario_runs_fast_and_reproduces() -> None:
+    started = time.monotonic()
+    frames, commands, stats = _run_scenario(seed=42, minutes=30)
+    assert time.monotonic() - started < 20
+    assert len(frames) == 30 * 60 * 5
+    assert frames[-1][0]["ts"] - frames[0][0]["ts"] == (30 * 60 * 5 - 1) * 200
+    assert stats["physics_steps"] == (30 * 60 * 5 - 1) * 4
+    assert stats["overruns"] == 0
+    assert len(commands) > 10
+    assert max(payload["t1"] for payload, _ in frames) > 30
+
+    again = _run_scenario(seed=42, minutes=30)
+    assert again[0] == frames
+    assert again[1] == commands
+    other = _run_scenario(seed=43, minutes=1)[0]
+    assert other != frames[: len(other)]
+
+
+def test_physics_step_is_decoupled_from_publish_rate() -> None:
+    simulator = TelemetrySimulator(RecordingTelemetry(), rate_hz=1, physics_hz=50, seed=1)
+    assert simulator.advance(1.0) == 50
+    assert simulator.advance(1.0) == 0
+    assert simulator.advance(2.5) == 75
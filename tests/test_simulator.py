@@ -0,0 +1,61 @@
+import asyncio
+
+from app.services.telemetry_service import TelemetrySimulator
+
+
+class RecordingTelemetry:
+    def __init__(self) -> None:
+        self.frames: list = []
+
+    async def update(self, payload: dict, source: str) -> None:
+        self.frames.append((payload, source))
+
+
+def test_vectorized_step_matches_per_stand_controls() -> None:
+    simulator = TelemetrySimulator(RecordingTelemetry(), stands=20, rate_hz=50, seed=7)
+    simulator.set_heater(100, stand=3)
+    simulator.set_actuators(255, [255, 255, 255], stand=4)
+    for _ in range(500):
+        simulator.step(0.02)
+    frames = simulator.frames(1000)
+    assert len(frames) == 20
+    assert frames[0][1] == "simulator"
+    assert frames[19][1] == "simulator-19"
+    by_source = {source: payload for payload, source in frames}
+    idle = by_source["simulator-1"]
+    heated = by_source["simulator-3"]
+    cooled = by_source["simulator-4"]
+    assert heated["t1"] > idle["t1"] + 5
+    assert cooled["t1"] < idle["t1"]
+    assert cooled["flow"] > 4.5
+    assert cooled["fan"] == [255, 255, 255]
+    assert isinstance(heated["heater"], int)
+
+
+def test_step_is_rate_independent() -> None:
+    coarse = TelemetrySimulator(RecordingTelemetry(), stands=1, seed=1)
+    fine = TelemetrySimulator(RecordingTelemetry(), stands=1, seed=1)
+    coarse.set_heater(60)
+    fine.set_heater(60)
+    for _ in range(50):
+        coarse.step(0.2)
+    for _ in range(500):
+        fine.step(0.02)
+    assert abs(coarse.frames(0)[0][0]["t1"] - fine.frames(0)[0][0]["t1"]) < 0.5
+
+
+def test_loop_emits_all_stands_and_reports_budget() -> None:
+    async def run():
+        telemetry = RecordingTelemetry()
+        simulator = TelemetrySimulator(telemetry, stands=20, rate_hz=50, seed=3)
+        await simulator.start()
+        await asyncio.sleep(0.2)
+        await simulator.stop()
+        return telemetry, simulator.stats()
+
+    telemetry, stats = asyncio.run(run())
+    assert stats["ticks"] >= 5
+    assert len(telemetry.frames) == stats["ticks"] * 20
+    assert stats["budget_ms"] == 20.0
+    assert 0 < stats["budget_used_avg"] < 1
+    assert stats["step"]["max_ms"] > 0
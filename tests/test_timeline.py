@@ -0,0 +1,142 @@
+import asyncio
+import time
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.services.scenario_engine import RandomScenarioConfig, ScenarioEngine
+from app.services.sim_clock import Clock, VirtualClock
+from app.services.timeline import Setpoint, TimelineScheduler, compile_timeline
+
+
+class RecordingCommands:
+    def __init__(self, clock) -> None:
+        self.clock = clock
+        self.sent: list = []
+
+    async def submit(self, values: dict, wait: bool = False) -> None:
+        self.sent.append((self.clock.monotonic(), dict(values)))
+
+
+def test_compile_ramp_reaches_target_and_clamps() -> None:
+    points = compile_timeline(
+        "heater",
+        [{"at": 0, "value": 10}, {"at": 10, "ramp_to": 150, "duration": 25, "every": 10}],
+    )
+    assert [(p.at, p.value) for p in points] == [(0, 10), (20, 66), (30, 100), (35, 100)]
+    with pytest.raises(ValueError):
+        compile_timeline("valve", [{"at": 0, "value": 1}])
+
+
+def test_hundreds_of_setpoints_share_one_timer() -> None:
+    async def run():
+        clock = VirtualClock(warp=0, start=0)
+        applied = []
+
+        async def apply(setpoint: Setpoint) -> None:
+            applied.append((clock.monotonic(), setpoint))
+
+        scheduler = TimelineScheduler(clock, apply)
+        timelines = [
+            compile_timeline("heater", [{"at": 0, "value": 0}, {"at": 0, "ramp_to": 100, "duration": 300, "every": 1}]),
+            compile_timeline("pump", [{"at": 5, "value": 0}, {"at": 5, "ramp_to": 255, "duration": 255, "every": 1}]),
+            compile_timeline("drain_valve", [{"at": 100, "value": 1}, {"at": 130, "value": 0}]),
+        ]
+        run = scheduler.start("profile", timelines, {"heater", "pump", "drain_valve"})
+        await clock.sleep(1.5)
+        mid = scheduler.stats()
+        sleepers = clock.stats()["sleepers"]
+        await clock.sleep(398.5)
+        await scheduler.stop()
+        await clock.stop()
+        return applied, scheduler.stats(), mid, sleepers, run
+
+    applied, stats, mid, sleepers, run = asyncio.run(run())
+    assert len(applied) == 301 + 256 + 2
+    assert all(now == pytest.approx(setpoint.at) for now, setpoint in applied)
+    assert [now for now, _ in applied] == sorted(now for now, _ in applied)
+    assert mid["pending"] == 3
+    assert sleepers == 1
+    assert mid["timers"] == 1
+    assert stats["jitter"]["max_ms"] == 0
+    assert run.status == "done"
+    assert stats["finished"][0]["fired"] == len(applied)
+
+
+def test_deadlines_do_not_drift_with_slow_commands() -> None:
+    async def run():
+        applied = []
+
+        async def apply(setpoint: Setpoint) -> None:
+            applied.append(time.monotonic())
+            await asyncio.sleep(0.004)
+
+        scheduler = TimelineScheduler(Clock(), apply)
+        points = [Setpoint(i * 0.01, "heater", i) for i in range(30)]
+        started = time.monotonic()
+        scheduler.start("steps", [points], {"heater"})
+        await asyncio.sleep(0.4)
+        return started, applied, scheduler.stats()
+
+    started, applied, stats = asyncio.run(run())
+    assert len(applied) == 30
+    assert applied[-1] - started < 0.29 + 0.05
+    assert stats["jitter"]["max_ms"] < 50
+    assert len(stats["steps"]) == 30
+    assert all("jitter_ms" in step for step in stats["steps"])
+
+
+def test_engine_runs_concurrent_timelines_and_manual_cancels_heater_only() -> None:
+    async def run():
+        clock = VirtualClock(warp=0, start=0)
+        safety = RecordingCommands(clock)
+        student = RecordingCommands(clock)
+        engine = ScenarioEngine(safety, None, clock, seed=1, student_commands=student)
+        profile = engine.start_scenario(
+            "profile",
+            [
+                {"actuator": "pump", "steps": [{"at": 0, "value": 50}, {"at": 60, "value": 200}]},
+                {"actuator": "fan", "steps": [{"at": 30, "value": 90}]},
+                {"actuator": "drain_valve", "steps": [{"at": 45, "value": 1}]},
+            ],
+        )
+        random_run = await engine.start_random(RandomScenarioConfig(10, 20, 5, 5, 5, 5))
+        await clock.sleep(20)
+        await engine.set_manual(70)
+        await clock.sleep(100)
+        await engine.close()
+        await clock.stop()
+        return safety.sent, student.sent, profile, random_run
+
+    safety, student, profile, random_run = asyncio.run(run())
+    assert random_run.status == "cancelled"
+    assert profile.status == "done"
+    assert student == [(0, {"pump": 50}), (30, {"fan": [90, 90, 90]}), (60, {"pump": 200})]
+    heater_after = [values for now, values in safety if now > 20 and "heater" in values]
+    assert heater_after == []
+    assert (45, {"drain_valve": 1}) in safety
+    assert (20, {"heater": 70}) in safety
+
+
+def test_scenario_api(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    from app.main import app
+
+    with TestClient(app) as client:
+        body = {
+            "name": "ramp",
+            "timelines": [
+                {"actuator": "heater", "steps": [{"at": 0, "value": 0}, {"at": 0, "ramp_to": 60, "duration": 600}]},
+                {"actuator": "fan", "steps": [{"at": 0, "value": 100}]},
+            ],
+        }
+        started = client.post("/api/teacher/scenario", json=body)
+        assert started.status_code == 200
+        run_id = started.json()["run"]["id"]
+        status = client.get("/api/teacher/scenario").json()
+        assert [run["id"] for run in status["runs"]] == [run_id]
+        assert client.post("/api/teacher/scenario", json={"timelines": [{"actuator": "x", "steps": []}]}).status_code == 422
+        assert client.delete(f"/api/teacher/scenario/{run_id}").json()["run"]["status"] == "cancelled"
+        assert client.delete(f"/api/teacher/scenario/{run_id}").status_code == 404
+        assert "scenarios" in client.get("/api/metrics").json()
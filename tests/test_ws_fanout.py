@@ -0,0 +1,119 @@
+import asyncio
+import json
+
+from app.services.telemetry_service import TelemetryService
+from app.services.ws_clients import ChannelConfig
+from app.services.ws_protocol import F32_HEADER, KIND_DELTA, KIND_KEY, Subscription, decode_f32
+
+
+class FakeWebSocket:
+    def __init__(self, blocked: bool = False) -> None:
+        self.messages: list = []
+        self.closed_with: int | None = None
+        self.gate = asyncio.Event()
+        if not blocked:
+            self.gate.set()
+
+    async def accept(self) -> None:
+        return None
+
+    async def send_text(self, message: str) -> None:
+        await self.gate.wait()
+        self.messages.append(message)
+
+    async def send_bytes(self, message: bytes) -> None:
+        await self.gate.wait()
+        self.messages.append(message)
+
+    async def close(self, code: int = 1000) -> None:
+        self.closed_with = code
+
+
+async def _broadcast_frames(telemetry: TelemetryService, count: int) -> None:
+    for i in range(count):
+        await telemetry._broadcast({"type": "telemetry", "ts": i, "t1": 20.0})
+        await asyncio.sleep(0)
+
+
+def test_slow_client_drops_stale_frames_without_stalling_others() -> None:
+    async def run() -> tuple[FakeWebSocket, FakeWebSocket, dict]:
+        telemetry = TelemetryService(None, ChannelConfig(queue_size=4))
+        fast, slow = FakeWebSocket(), FakeWebSocket(blocked=True)
+        await telemetry.register(fast)
+        await telemetry.register(slow)
+        await _broadcast_frames(telemetry, 50)
+        stats = telemetry.stats()
+        slow.gate.set()
+        await asyncio.sleep(0.01)
+        await telemetry.stop()
+        return fast, slow, stats
+
+    fast, slow, stats = asyncio.run(run())
+    assert [json.loads(m)["ts"] for m in fast.messages] == list(range(50))
+    assert stats["dropped_frames"] > 0
+    assert stats["queue_depth_max"] == 4
+    assert json.loads(slow.messages[-1])["ts"] == 49
+
+
+def test_slow_client_disconnect_policy() -> None:
+    async def run() -> tuple[FakeWebSocket, dict]:
+        telemetry = TelemetryService(None, ChannelConfig(queue_size=2, slow_client_policy="disconnect"))
+        slow = FakeWebSocket(blocked=True)
+        await telemetry.register(slow)
+        await _broadcast_frames(telemetry, 10)
+        await asyncio.sleep(0)
+        return slow, telemetry.stats()
+
+    slow, stats = asyncio.run(run())
+    assert slow.closed_with == 1013
+    assert stats["clients"] == 0
+    assert stats["slow_disconnects"] == 1
+
+
+def test_f32_delta_subscription_encodes_once_per_group() -> None:
+    async def run() -> tuple[FakeWebSocket, FakeWebSocket, dict]:
+        telemetry = TelemetryService(None, ChannelConfig(queue_size=64, keyframe_interval=10))
+        subscription = Subscription.parse("f32", "t1,t2,fan2", "1")
+        first, second = FakeWebSocket(), FakeWebSocket()
+        await telemetry.register(first, subscription)
+        await telemetry.register(second, subscription)
+        for i in range(5):
+            payload = {"type": "telemetry", "ts": 1000 + i, "t1": 20.0 + i, "t2": 30.0, "fan": [1, 2, 3]}
+            await telemetry._broadcast(payload, "safety")
+        await asyncio.sleep(0.01)
+        stats = telemetry.stats()
+        await telemetry.stop()
+        return first, second, stats
+
+    first, second, stats = asyncio.run(run())
+    assert stats["subscription_groups"] == 1
+    assert first.messages == second.messages
+    schema = json.loads(first.messages[0])
+    assert schema["type"] == "schema"
+    assert schema["fields"] == ["t1", "t2", "fan2"]
+    assert json.loads(first.messages[1]) == {"type": "source", "id": 0, "name": "safety"}
+    frames = [decode_f32(message, schema["fields"]) for message in first.messages[2:]]
+    assert frames[0]["kind"] == KIND_KEY
+    assert frames[0]["fan2"] == 2.0
+    assert all(frame["kind"] == KIND_DELTA for frame in frames[1:])
+    assert set(frames[1]) == {"kind", "source_id", "seq", "ts", "t1"}
+    assert frames[4]["t1"] == 24.0
+    assert len(first.messages[3]) == F32_HEADER.size + 4
+
+
+def test_ws_rejects_unknown_protocol_fields() -> None:
+    from fastapi.testclient import TestClient
+    from starlette.websockets import WebSocketDisconnect
+
+    from app.main import app
+
+    with TestClient(app) as client:
+        with client.websocket_connect("/ws/telemetry?proto=f32&fields=t1,t3&delta=1") as ws:
+            schema = ws.receive_json()
+            assert schema["fields"] == ["t1", "t3"]
+        with client.websocket_connect("/ws/telemetry?fields=bogus") as ws:
+            try:
+                ws.receive_text()
+                raise AssertionError("expected close")
+            except WebSocketDisconnect as exc:
+                assert exc.code == 1008